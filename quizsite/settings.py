@@ -113,4 +113,46 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 # ✅ OpenAI Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# ✅ Cache (shared across workers when REDIS_URL is set, per-process otherwise)
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# ✅ Per-user entitlements (tutor flag, enrollments, quiz grants); signals invalidate on change
+ENTITLEMENT_CACHE_TTL = 300
+
+# ✅ Class joins are buffered in the cache and bulk-written by `flush_attendance`
+# (None = only when the cache is shared, i.e. REDIS_URL is set)
+ATTENDANCE_WRITE_BEHIND = None
+
+# ✅ Background question imports: a RUNNING job silent for this long lost its worker
+IMPORT_JOB_TIMEOUT = 60 * 15
+
+# ✅ AI request coalescing (identical prompts share one provider call)
+AI_SINGLE_FLIGHT_LOCK_TTL = 60      # seconds a leader may hold the lock
+AI_SINGLE_FLIGHT_RESULT_TTL = 30    # seconds the shared result stays readable
+AI_SINGLE_FLIGHT_POLL_INTERVAL = 0.2
+
+# ✅ AI circuit breaker (fail fast while the provider is slow or down)
+AI_REQUEST_TIMEOUT = 20             # seconds before a provider call is abandoned
+AI_BREAKER_FAILURE_RATE = 0.5       # share of failed/slow calls that trips the breaker
+AI_BREAKER_MIN_CALLS = 5            # calls needed in a window before tripping
+AI_BREAKER_SLOW_CALL_SECONDS = 8
+AI_BREAKER_WINDOW = 60
+AI_BREAKER_COOLDOWN = 30            # seconds open before a half-open probe
+AI_ANSWER_CACHE_TTL = 60 * 60 * 24  # last good answers served while the breaker is open
+AI_GENERATION_TIMEOUT = 90          # max wait for the first generated question
+AI_GENERATION_STALE_TIMEOUT = 60 * 5  # a quiz still generating after this long without a new question lost its worker
+AI_QUIZ_MONTHLY_LIMIT = 3           # AI quizzes a student may generate per month
+
 # Server forced reload for OpenAI restoration
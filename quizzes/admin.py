@@ -1,11 +1,25 @@
 from django.contrib import admin
-from .models import Quiz, Question, Choice, Attempt, Answer, QuizAccessGrant, Profile, College, Category, HackathonResult
+from .models import Quiz, Question, Choice, Attempt, Answer, QuizAccessGrant, Profile, College, Category, HackathonResult, AIQuizUsage, QuestionImportJob
 from django.urls import path
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse, Http404
+from django.core.exceptions import PermissionDenied
+from django.contrib.auth import get_permission_codename
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils.text import Truncator, slugify
+import json
 from django.contrib import messages
-from django.db.models import Avg
-import pandas as pd
-from .forms import QuestionImportForm
+from .forms import QuestionImportForm, RosterUploadForm
+from .importer import preview_import, start_import_job
+from .dedupe import index_questions, question_document, refresh_signatures
+from .cloning import clone_quizzes
+from .leaderboard import format_duration, leaderboard_page, leaderboard_stats
+from .exports import (
+    EXPORT_FORMATS, attempt_rows, csv_response, export_filename, hackathon_result_rows, xlsx_response,
+)
+from .onboarding import ADMIN_MAX_ROWS, RosterError, onboard_students, queue_activation_emails, read_roster
 from nested_admin import NestedModelAdmin, NestedTabularInline, NestedStackedInline
 
 class ChoiceInline(NestedTabularInline):
@@ -20,6 +34,11 @@ class QuestionAdmin(admin.ModelAdmin):
     def short_text(self, obj):
         return obj.text[:60]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # 🔁 Text or choices may have changed: re-sign the question for the duplicate index
+        index_questions(Question.objects.filter(pk=form.instance.pk).prefetch_related('choices'))
+
 
 class QuestionInline(NestedStackedInline):
     model = Question
@@ -39,6 +58,42 @@ class QuizAdmin(NestedModelAdmin):
         ('Access Control', {'fields': ('coupon_code', 'start_time', 'end_time')}),
     )
 
+    actions = ['clone_selected']
+
+    @admin.action(description="Clone selected quizzes (with questions)")
+    def clone_selected(self, request, queryset):
+        copies = clone_quizzes(queryset.order_by('id'), created_by=request.user)
+        messages.success(request, f"Created {len(copies)} inactive cop{'y' if len(copies) == 1 else 'ies'}: "
+                                  + ", ".join(q.title for q in copies))
+
+    # Quizzes with more questions than this skip the nested inlines and use the paged question editor
+    inline_question_limit = 30
+    editor_page_size = 25
+
+    def get_inlines(self, request, obj):
+        if obj is not None and obj.questions.count() > self.inline_question_limit:
+            return []
+        return super().get_inlines(request, obj)
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        extra_context = extra_context or {}
+        quiz = self.get_object(request, object_id)
+        if quiz is not None:
+            extra_context['questions_in_editor'] = not self.get_inlines(request, quiz)
+        return super().change_view(request, object_id, form_url, extra_context=extra_context)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if not formsets:
+            return  # large quiz: questions are saved (and indexed) by the question editor
+        # 🔁 Keep the duplicate index in step with new and edited questions/choices. Inlines only
+        # show up to inline_question_limit questions, and only changed signatures are rewritten.
+        questions = list(form.instance.questions.prefetch_related('choices'))
+        refresh_signatures(
+            [q.id for q in questions],
+            [question_document(q.text, [c.text for c in q.choices.all()]) for q in questions],
+        )
+
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
@@ -47,6 +102,41 @@ class QuizAdmin(NestedModelAdmin):
                 self.admin_site.admin_view(self.import_questions),
                 name='quiz-import-questions',
             ),
+            path(
+                '<int:object_id>/import-questions/<int:job_id>/',
+                self.admin_site.admin_view(self.import_preview),
+                name='quiz-import-preview',
+            ),
+            path(
+                '<int:object_id>/import-questions/<int:job_id>/status/',
+                self.admin_site.admin_view(self.import_status),
+                name='quiz-import-status',
+            ),
+            path(
+                '<int:object_id>/questions/',
+                self.admin_site.admin_view(self.question_editor),
+                name='quiz-question-editor',
+            ),
+            path(
+                '<int:object_id>/questions/list/',
+                self.admin_site.admin_view(self.question_list_json),
+                name='quiz-question-list',
+            ),
+            path(
+                '<int:object_id>/questions/new/',
+                self.admin_site.admin_view(self.question_json),
+                name='quiz-question-new',
+            ),
+            path(
+                '<int:object_id>/questions/<int:question_id>/',
+                self.admin_site.admin_view(self.question_json),
+                name='quiz-question-detail',
+            ),
+            path(
+                '<int:object_id>/questions/<int:question_id>/delete/',
+                self.admin_site.admin_view(self.question_delete_json),
+                name='quiz-question-delete',
+            ),
         ]
         return custom_urls + urls
 
@@ -55,59 +145,14 @@ class QuizAdmin(NestedModelAdmin):
         if request.method == 'POST':
             form = QuestionImportForm(request.POST, request.FILES)
             if form.is_valid():
-                file = request.FILES['file']
-                try:
-                    if file.name.endswith('.csv'):
-                        df = pd.read_csv(file)
-                    else:
-                        df = pd.read_excel(file)
-                    
-                    # Expected columns: Question, Option A, Option B, Option C, Option D, Correct Answer
-                    # Normalize headers
-                    df.columns = [c.strip() for c in df.columns]
-                    
-                    count = 0
-                    for index, row in df.iterrows():
-                        question_text = row.get('Question')
-                        if not question_text:
-                            continue
-                        
-                        # Create Question
-                        question = Question.objects.create(quiz=quiz, text=question_text)
-                        
-                        # Options
-                        options = {
-                            'A': row.get('Option A'),
-                            'B': row.get('Option B'),
-                            'C': row.get('Option C'),
-                            'D': row.get('Option D')
-                        }
-                        
-                        correct_ans = str(row.get('Correct Answer')).strip().upper()
-                        
-                        for key, text in options.items():
-                            if pd.isna(text):
-                                continue
-                            
-                            is_correct = False
-                            # Check if correct answer matches the option key (A, B, C, D) or the text itself
-                            if correct_ans == key:
-                                is_correct = True
-                            elif correct_ans == str(text).strip().upper():
-                                is_correct = True
-                                
-                            Choice.objects.create(
-                                question=question,
-                                text=text,
-                                is_correct=is_correct
-                            )
-                        count += 1
-                    
-                    messages.success(request, f"Successfully imported {count} questions.")
-                    return redirect('admin:quizzes_quiz_change', object_id)
-                    
-                except Exception as e:
-                    messages.error(request, f"Error importing file: {e}")
+                # Store the upload; parsing happens in the preview and the background job
+                job = QuestionImportJob.objects.create(
+                    quiz=quiz,
+                    file=request.FILES['file'],
+                    skip_duplicates=form.cleaned_data['skip_duplicates'],
+                    created_by=request.user,
+                )
+                return redirect('admin:quiz-import-preview', object_id, job.id)
         else:
             form = QuestionImportForm()
 
@@ -120,6 +165,190 @@ class QuizAdmin(NestedModelAdmin):
         }
         return render(request, 'admin/quizzes/quiz/import_questions.html', context)
 
+    def import_preview(self, request, object_id, job_id):
+        quiz = self.get_object(request, object_id)
+        job = get_object_or_404(QuestionImportJob, pk=job_id, quiz=quiz)
+
+        if request.method == 'POST' and job.status == QuestionImportJob.PREVIEW:
+            start_import_job(job)
+            messages.success(request, "Import started. You can leave this page; progress is saved.")
+            return redirect('admin:quiz-import-preview', object_id, job.id)
+
+        context = {
+            'job': job,
+            'object': quiz,
+            'opts': self.model._meta,
+            'object_id': object_id,
+            'title': f'Import Questions for {quiz.title}'
+        }
+        if job.status == QuestionImportJob.PREVIEW:
+            # 🔍 Dry run: parse the first rows without saving anything
+            try:
+                context['preview'], context['preview_errors'] = preview_import(job.file.path)
+            except Exception as e:
+                context['preview_failed'] = str(e)
+        return render(request, 'admin/quizzes/quiz/import_preview.html', context)
+
+    def import_status(self, request, object_id, job_id):
+        job = get_object_or_404(QuestionImportJob, pk=job_id, quiz_id=object_id)
+        return JsonResponse({
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'progress': job.progress,
+            'processed_rows': job.processed_rows,
+            'total_rows': job.total_rows,
+            'imported_count': job.imported_count,
+            'error_count': job.error_count,
+            'message': job.message,
+        })
+
+    # -------------------------------------------------------------------
+    #  PAGED QUESTION EDITOR (large quizzes)
+    # -------------------------------------------------------------------
+    def _editable_quiz(self, request, object_id):
+        quiz = self.get_object(request, object_id)
+        if quiz is None:
+            raise Http404
+        if not self.has_change_permission(request, quiz):
+            raise PermissionDenied
+        return quiz
+
+    def question_editor(self, request, object_id):
+        quiz = self._editable_quiz(request, object_id)
+        context = {
+            **self.admin_site.each_context(request),
+            'object': quiz,
+            'opts': self.model._meta,
+            'object_id': object_id,
+            'title': f'Questions of {quiz.title}',
+        }
+        return render(request, 'admin/quizzes/quiz/question_editor.html', context)
+
+    def question_list_json(self, request, object_id):
+        """One page of question summaries; cost depends on the page size, not the quiz size."""
+        quiz = self._editable_quiz(request, object_id)
+        questions = quiz.questions.order_by('id')
+        search = request.GET.get('q', '').strip()
+        if search:
+            questions = questions.filter(text__icontains=search)
+        page = Paginator(questions.values('id', 'text'), self.editor_page_size).get_page(request.GET.get('page'))
+        return JsonResponse({
+            'questions': [{'id': q['id'], 'text': Truncator(q['text']).chars(120)} for q in page],
+            'page': page.number,
+            'num_pages': page.paginator.num_pages,
+            'count': page.paginator.count,
+        })
+
+    def question_json(self, request, object_id, question_id=None):
+        """GET one question with its choices; POST saves it (or creates it, without question_id)."""
+        quiz = self._editable_quiz(request, object_id)
+        question = None
+        if question_id is not None:
+            question = get_object_or_404(Question.objects.prefetch_related('choices'), pk=question_id, quiz=quiz)
+
+        if request.method == 'POST':
+            try:
+                data = json.loads(request.body)
+            except ValueError:
+                return JsonResponse({'error': 'Invalid JSON.'}, status=400)
+            errors = validate_question_payload(data)
+            if errors:
+                return JsonResponse({'errors': errors}, status=400)
+            question = save_question_payload(quiz, question, data)
+        elif question is None:
+            return JsonResponse({'error': 'Invalid request'}, status=400)
+
+        return JsonResponse(question_payload(question))
+
+    def question_delete_json(self, request, object_id, question_id):
+        quiz = self._editable_quiz(request, object_id)
+        if request.method != 'POST':
+            return JsonResponse({'error': 'Invalid request'}, status=400)
+        # Changing the quiz isn't enough: deleting a question needs the Question delete permission too
+        opts = Question._meta
+        if not request.user.has_perm(f"{opts.app_label}.{get_permission_codename('delete', opts)}"):
+            raise PermissionDenied
+        get_object_or_404(Question, pk=question_id, quiz=quiz).delete()
+        return JsonResponse({'deleted': question_id})
+
+
+def question_payload(question):
+    return {
+        'id': question.id,
+        'text': question.text,
+        'choices': [{'id': c.id, 'text': c.text, 'is_correct': c.is_correct} for c in question.choices.all()],
+    }
+
+
+def validate_question_payload(data):
+    """Errors for a question posted by the editor; an empty list means save_question_payload can take it."""
+    if not isinstance(data, dict):
+        return ["Expected a JSON object."]
+    errors = []
+    text, choices = data.get('text'), data.get('choices')
+    if text is not None and not isinstance(text, str):
+        errors.append("Question text must be a string.")
+    elif not (text or '').strip():
+        errors.append("Question text is required.")
+    if not isinstance(choices, list) or not all(isinstance(c, dict) for c in choices):
+        return errors + ["Choices must be a list of objects."]
+    if any(c.get('text') is not None and not isinstance(c.get('text'), str) for c in choices):
+        return errors + ["Choice text must be a string."]
+    if any(c.get('id') is not None and (not isinstance(c.get('id'), int) or isinstance(c.get('id'), bool))
+           for c in choices):
+        return errors + ["Choice ids must be integers."]
+    if any(c.get('is_correct') is not None and not isinstance(c.get('is_correct'), bool) for c in choices):
+        # bool("false") is True: don't guess, make the client send true/false
+        return errors + ["is_correct must be true or false."]
+    texts = [(c.get('text') or '').strip() for c in choices]
+    if len([t for t in texts if t]) < 2:
+        errors.append("Add at least two choices.")
+    if any(len(t) > Choice._meta.get_field('text').max_length for t in texts):
+        errors.append(f"Choices can be at most {Choice._meta.get_field('text').max_length} characters.")
+    if not any(c.get('is_correct') and t for c, t in zip(choices, texts)):
+        errors.append("Mark at least one choice as correct.")
+    return errors
+
+
+@transaction.atomic
+def save_question_payload(quiz, question, data):
+    """Write one question and its choices: changed choices are updated, missing ones deleted, new ones added."""
+    if question is None:
+        question = Question(quiz=quiz)
+    question.text = data['text'].strip()
+    question.save()
+
+    existing = {c.id: c for c in question.choices.all()}
+    keep, updated, created = set(), [], []
+    for c in data['choices']:
+        text = (c.get('text') or '').strip()
+        if not text:
+            continue
+        choice = existing.get(c.get('id'))
+        if choice is None:
+            created.append(Choice(question=question, text=text, is_correct=bool(c.get('is_correct'))))
+            continue
+        keep.add(choice.id)
+        if choice.text != text or choice.is_correct != bool(c.get('is_correct')):
+            choice.text, choice.is_correct = text, bool(c.get('is_correct'))
+            updated.append(choice)
+
+    Choice.objects.filter(question=question).exclude(id__in=keep).delete()
+    Choice.objects.bulk_update(updated, ['text', 'is_correct'])
+    Choice.objects.bulk_create(created)
+
+    question = Question.objects.prefetch_related('choices').get(pk=question.pk)
+    index_questions([question])
+    return question
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 @admin.register(HackathonResult)
 class HackathonResultAdmin(admin.ModelAdmin):
     change_list_template = None # Use default list template
@@ -128,13 +357,50 @@ class HackathonResultAdmin(admin.ModelAdmin):
     search_fields = ('title',)
     ordering = ('-start_time',)
 
+    actions = ['export_results_csv', 'export_results_xlsx']
+
     def get_queryset(self, request):
-        # 🔍 Only show Hackathon Quizzes
-        return super().get_queryset(request).filter(quiz_type=Quiz.HACKATHON)
+        # 🔍 Only show Hackathon Quizzes (participants counted in the same query)
+        return super().get_queryset(request).filter(quiz_type=Quiz.HACKATHON).annotate(participant_count=Count('attempt'))
+
+    def get_urls(self):
+        custom_urls = [
+            path(
+                '<int:object_id>/export/<str:fmt>/',
+                self.admin_site.admin_view(self.export_results),
+                name='hackathon-results-export',
+            ),
+        ]
+        return custom_urls + super().get_urls()
+
+    # 📥 Exports stream rows chunk by chunk, so memory stays flat for any size
+    def _export(self, quiz_ids, fmt, name):
+        rows = hackathon_result_rows(list(quiz_ids))
+        filename = export_filename(name)
+        if fmt == 'xlsx':
+            return xlsx_response(rows, filename)
+        return csv_response(rows, filename)
+
+    def export_results(self, request, object_id, fmt):
+        if fmt not in EXPORT_FORMATS:
+            raise Http404
+        quiz = self.get_object(request, object_id)
+        if quiz is None:
+            raise Http404
+        return self._export([quiz.id], fmt, slugify(quiz.title) or 'results')
+
+    @admin.action(description="Export results (CSV)")
+    def export_results_csv(self, request, queryset):
+        return self._export(queryset.values_list('id', flat=True), 'csv', 'hackathon-results')
+
+    @admin.action(description="Export results (Excel)")
+    def export_results_xlsx(self, request, queryset):
+        return self._export(queryset.values_list('id', flat=True), 'xlsx', 'hackathon-results')
 
     def get_participant_count(self, obj):
-        return obj.attempt_set.count()
+        return obj.participant_count
     get_participant_count.short_description = "Participants"
+    get_participant_count.admin_order_field = 'participant_count'
 
     def has_add_permission(self, request):
         return False # 🚫 Read-only: Cannot create quizzes here
@@ -145,65 +411,49 @@ class HackathonResultAdmin(admin.ModelAdmin):
     def change_view(self, request, object_id, form_url='', extra_context=None):
         # 📊 Custom Logic for Dashboard View
         quiz = self.get_object(request, object_id)
-        
-        # 1. Fetch all attempts (passed only? or all? usually all for leaderboard but ranked by score)
-        # 1. Fetch COMPLETED attempts for Leaderboard
-        completed_attempts = Attempt.objects.filter(quiz=quiz, finished_at__isnull=False).select_related('user').order_by('-score', 'finished_at')
-        
-        # 2. Compute Stats (Total Participants = All Attempts, including incomplete)
-        all_attempts_count = Attempt.objects.filter(quiz=quiz).count()
-        
-        avg_score = completed_attempts.aggregate(Avg('score'))['score__avg'] or 0
-        top_scorer = completed_attempts.first()
-
-        # 3. Prepare Leaderboard Data
-        leaderboard = []
-        for index, attempt in enumerate(completed_attempts):
-            time_taken = "N/A"
-            if attempt.finished_at and attempt.created_at:
-                duration = attempt.finished_at - attempt.created_at
-                total_seconds = int(duration.total_seconds())
-                minutes = total_seconds // 60
-                seconds = total_seconds % 60
-                time_taken = f"{minutes}m {seconds}s"
-
-            # Safely get college (handle missing profile)
-            college_name = "-"
-            if hasattr(attempt.user, 'profile') and attempt.user.profile.college:
-                college_name = attempt.user.profile.college.name
-
-            percentage = 0
-            max_score = quiz.questions.count()
-            if max_score > 0:
-                percentage = round((attempt.score / max_score) * 100, 1)
-
-            leaderboard.append({
-                'rank': index + 1,
-                'user': attempt.user,
-                'score': attempt.score,
-                'max_score': max_score,
-                'percentage': percentage, # Added Percentage
-                'passed': attempt.passed,
-                'time_taken': time_taken,
-                'submitted_at': attempt.finished_at,
-                'college_name': college_name,
-            })
+        max_score = quiz.questions.count()
+
+        # 1. Stats in one aggregate (Total Participants = All Attempts, including incomplete)
+        stats = leaderboard_stats(quiz)
+
+        # 2. One page of the leaderboard; rank/percentage/time are computed in SQL
+        after = _int_or_none(request.GET.get('after'))
+        before = _int_or_none(request.GET.get('before'))
+        rows = leaderboard_page(quiz, after=after, before=before, max_score=max_score)
+        if rows and rows[0].rank == 1:
+            top_scorer = rows[0]
+        else:
+            top_scorer = next(iter(leaderboard_page(quiz, page_size=1, max_score=max_score)), None)
+
+        leaderboard = [{
+            'rank': attempt.rank,
+            'user': attempt.user,
+            'score': attempt.score,
+            'max_score': max_score,
+            'percentage': attempt.percentage,
+            'passed': attempt.passed,
+            'time_taken': format_duration(attempt.time_taken),
+            'submitted_at': attempt.finished_at,
+            'college_name': attempt.college_name or "-",
+        } for attempt in rows]
 
         extra_context = extra_context or {}
         extra_context['show_save_and_continue'] = False
         extra_context['show_save'] = False
         extra_context['title'] = f"Results: {quiz.title}"
-        
+
         # Pass data to template
         extra_context.update({
             'quiz': quiz,
-            'total_participants': all_attempts_count, # Show ALL attempts count
-            'completed_count': completed_attempts.count(),
-            'avg_score': round(avg_score, 1),
+            'max_score': max_score,
             'top_scorer': top_scorer,
             'leaderboard': leaderboard,
+            # ⏭️ Keyset pagination: the cursor is the first/last attempt on the page
+            'prev_before': rows[0].pk if rows and rows[0].rank > 1 else None,
+            'next_after': rows[-1].pk if rows and rows[-1].rank < stats['completed_count'] else None,
+            **stats,
         })
-        
+
         return super().change_view(
             request, object_id, form_url, extra_context=extra_context
         )
@@ -214,16 +464,107 @@ admin.site.register(Question, QuestionAdmin)
 @admin.register(Attempt)
 class AttemptAdmin(admin.ModelAdmin):
     list_display = ('user', 'get_college_name', 'quiz', 'score', 'passed', 'finished_at')
-    list_filter = ('quiz', 'passed', 'finished_at', 'user__profile__college')
+    list_filter = ('quiz', 'passed', 'finished_at', ('user__profile__college', admin.RelatedOnlyFieldListFilter))
+    list_select_related = ('user', 'quiz')
     date_hierarchy = 'finished_at'
     ordering = ('-score', 'finished_at')
+    actions = ['export_attempts_csv', 'export_attempts_xlsx']
+
+    @admin.action(description="Export selected attempts (CSV)")
+    def export_attempts_csv(self, request, queryset):
+        return csv_response(attempt_rows(queryset), export_filename('attempts'))
+
+    @admin.action(description="Export selected attempts (Excel)")
+    def export_attempts_xlsx(self, request, queryset):
+        return xlsx_response(attempt_rows(queryset), export_filename('attempts'), title='Attempts')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(college_name=F('user__profile__college__name'))
 
     def get_college_name(self, obj):
-        if hasattr(obj.user, 'profile') and obj.user.profile.college:
-            return obj.user.profile.college.name
-        return "-"
+        return obj.college_name or "-"
     get_college_name.short_description = 'College'
+    get_college_name.admin_order_field = 'college_name'
 admin.site.register(QuizAccessGrant)
 admin.site.register(Profile)
-admin.site.register(College)
 admin.site.register(Category)
+
+
+@admin.register(College)
+class CollegeAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/quizzes/college/change_list.html'
+    search_fields = ('name',)
+
+    def get_urls(self):
+        custom_urls = [
+            path(
+                'onboard-students/',
+                self.admin_site.admin_view(self.onboard_students),
+                name='college-onboard-students',
+            ),
+        ]
+        return custom_urls + super().get_urls()
+
+    # 🎓 Roster onboarding: inline hashing (no process pool in a web worker), bulk INSERTs, emails in the background
+    def onboard_students(self, request):
+        if not request.user.has_perm('auth.add_user'):
+            raise PermissionDenied
+        errors = []
+        if request.method == 'POST':
+            form = RosterUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                try:
+                    rows = read_roster(request.FILES['file'])
+                    if len(rows) > ADMIN_MAX_ROWS:
+                        # Hashing runs inline here; big rosters belong to the command's process pool
+                        raise RosterError(f"{len(rows)} rows is more than the {ADMIN_MAX_ROWS} this page takes; "
+                                          f"use `manage.py onboard_students` for large rosters.")
+                except Exception as e:  # unreadable file, missing column, too many rows
+                    form.add_error('file', str(e))
+                else:
+                    result = onboard_students(rows, default_college=form.cleaned_data['college'])
+                    errors = result.errors
+                    if result.users:
+                        note = f"✅ Created {len(result.users)} student accounts"
+                        if form.cleaned_data['send_emails']:
+                            queue_activation_emails(
+                                result.users, request.get_host(), 'https' if request.is_secure() else 'http'
+                            )
+                            note += "; activation emails are being sent"
+                        messages.success(request, note + ".")
+                    if not errors:
+                        return redirect('admin:auth_user_changelist')
+        else:
+            form = RosterUploadForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'form': form,
+            'errors': errors,
+            'opts': self.model._meta,
+            'title': 'Onboard Students',
+        }
+        return render(request, 'admin/quizzes/college/onboard_students.html', context)
+
+
+@admin.register(AIQuizUsage)
+class AIQuizUsageAdmin(admin.ModelAdmin):
+    list_display = ('user', 'month', 'count')
+    list_filter = ('month',)
+    search_fields = ('user__username', 'user__email')
+
+
+@admin.register(QuestionImportJob)
+class QuestionImportJobAdmin(admin.ModelAdmin):
+    list_display = ('quiz', 'status', 'progress_display', 'imported_count', 'error_count', 'created_by', 'created_at')
+    list_filter = ('status',)
+    list_select_related = ('quiz', 'created_by')
+    readonly_fields = ('quiz', 'file', 'status', 'total_rows', 'processed_rows', 'imported_count',
+                       'error_count', 'errors', 'message', 'created_by', 'created_at', 'finished_at')
+
+    def progress_display(self, obj):
+        return f"{obj.progress}%"
+    progress_display.short_description = 'Progress'
+
+    def has_add_permission(self, request):
+        return False # Jobs are created from the quiz's "Import Questions" page
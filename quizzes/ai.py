@@ -0,0 +1,428 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULT_MODEL = "gpt-4o"
+
+
+class AIUnavailable(Exception):
+    """The provider is failing or too slow; the circuit breaker is open."""
+
+
+def get_client(asynchronous=False):
+    """
+    Build an OpenAI client (AsyncOpenAI with asynchronous=True) with the
+    project's API key. A short timeout keeps a slow provider from tying up
+    worker processes.
+    """
+    from openai import AsyncOpenAI, OpenAI
+    return (AsyncOpenAI if asynchronous else OpenAI)(
+        api_key=settings.OPENAI_API_KEY,
+        timeout=getattr(settings, 'AI_REQUEST_TIMEOUT', 20),
+        max_retries=getattr(settings, 'AI_MAX_RETRIES', 0),
+    )
+
+
+def prompt_key(model, messages, **params):
+    """
+    Normalized key for a provider call.
+    Whitespace inside the prompts is collapsed so that the same question
+    rendered with different indentation still maps to one key.
+    """
+    normalized = [
+        {'role': m['role'], 'content': ' '.join(str(m['content']).split())}
+        for m in messages
+    ]
+    payload = json.dumps({'model': model, 'messages': normalized, 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# -------------------------------------------------------------------
+#  SINGLE-FLIGHT (Request Coalescing)
+# -------------------------------------------------------------------
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def single_flight(key, fn):
+    """
+    Run `fn` once per key, no matter how many callers ask at the same time.
+    Threads in this process wait on the leader's call; other worker processes
+    wait on a cache lock and pick the shared result up from the cache.
+    Threads waiting longer than the provider timeout give up with
+    AIUnavailable, like a call of their own would have.
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _calls[key] = _Call()
+
+    if not is_leader:
+        if not call.done.wait(timeout=getattr(settings, 'AI_REQUEST_TIMEOUT', 20)):
+            raise AIUnavailable("timed out waiting for an identical request")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _shared_flight(key, fn)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            _calls.pop(key, None)
+        call.done.set()
+
+
+def _lock_key(key):
+    return f"ai:lock:{key}"
+
+
+def _result_key(key):
+    return f"ai:result:{key}"
+
+
+def shared_result(key):
+    """Result a leader (streaming or not) published for this key in the last few seconds."""
+    return cache.get(_result_key(key))
+
+
+def acquire_flight(key):
+    """Try to become the leader for `key` across workers; returns a token, or None if taken."""
+    token = uuid.uuid4().hex
+    if cache.add(_lock_key(key), token, getattr(settings, 'AI_SINGLE_FLIGHT_LOCK_TTL', 60)):
+        return token
+    return None
+
+
+def release_flight(key, token, result=None):
+    """Publish the leader's result (if any) for the waiting callers, then drop the lock."""
+    if result is not None:
+        cache.set(_result_key(key), result, getattr(settings, 'AI_SINGLE_FLIGHT_RESULT_TTL', 30))
+    if cache.get(_lock_key(key)) == token:
+        cache.delete(_lock_key(key))
+
+
+def _shared_flight(key, fn):
+    lock_key = _lock_key(key)
+    lock_ttl = getattr(settings, 'AI_SINGLE_FLIGHT_LOCK_TTL', 60)
+    poll_interval = getattr(settings, 'AI_SINGLE_FLIGHT_POLL_INTERVAL', 0.2)
+
+    deadline = time.monotonic() + lock_ttl
+    while True:
+        result = shared_result(key)
+        if result is not None:
+            return result
+
+        token = acquire_flight(key)
+        if token is not None:
+            result = None
+            try:
+                result = fn()
+                return result
+            finally:
+                release_flight(key, token, result)
+
+        # Another worker holds the lock: wait for its result (or for the lock
+        # to go away, in which case we try to become the leader ourselves).
+        while cache.get(lock_key) is not None and time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            result = shared_result(key)
+            if result is not None:
+                return result
+
+        if time.monotonic() >= deadline:
+            # Leader is stuck; don't keep the student waiting forever.
+            return fn()
+
+
+# -------------------------------------------------------------------
+#  CIRCUIT BREAKER
+# -------------------------------------------------------------------
+class CircuitBreaker:
+    """
+    Cache-backed circuit breaker shared by all worker processes.
+
+    Calls are counted in fixed time windows. When enough calls in the current
+    window failed or were slower than `slow_call_seconds`, the breaker opens and
+    calls fail fast with AIUnavailable. After `cooldown` seconds it goes
+    half-open and lets a single probe call through: success closes it again,
+    failure re-opens it.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_rate=0.5, min_calls=5, slow_call_seconds=8,
+                 window=60, cooldown=30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.window = window
+        self.cooldown = cooldown
+
+    def _key(self, suffix):
+        return f"ai:breaker:{self.name}:{suffix}"
+
+    def _bucket(self):
+        return int(time.time() // self.window)
+
+    def _incr(self, suffix):
+        key = self._key(f"{suffix}:{self._bucket()}")
+        cache.add(key, 0, self.window * 2)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr(); start the count again.
+            cache.set(key, 1, self.window * 2)
+            return 1
+
+    @property
+    def state(self):
+        opened_at = cache.get(self._key('opened_at'))
+        if opened_at is None:
+            return self.CLOSED
+        if time.time() - opened_at < self.cooldown:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def trip(self):
+        cache.set(self._key('opened_at'), time.time(), None)
+        cache.delete(self._key('probe'))
+
+    def reset(self):
+        bucket = self._bucket()
+        cache.delete_many([
+            self._key('opened_at'),
+            self._key('probe'),
+            self._key(f"calls:{bucket}"),
+            self._key(f"bad:{bucket}"),
+        ])
+
+    def _record(self, bad):
+        calls = self._incr('calls')
+        if bad:
+            bad_calls = self._incr('bad')
+        else:
+            bad_calls = cache.get(self._key(f"bad:{self._bucket()}"), 0)
+        if calls >= self.min_calls and bad_calls / calls >= self.failure_rate:
+            self.trip()
+
+    def before_call(self):
+        """Raise AIUnavailable if the call must be skipped, else return the state it ran in."""
+        state = self.state
+        if state == self.OPEN:
+            raise AIUnavailable(f"{self.name} circuit is open")
+        if state == self.HALF_OPEN and not cache.add(self._key('probe'), 1, self.cooldown):
+            # Someone else is already probing the provider.
+            raise AIUnavailable(f"{self.name} circuit is half-open")
+        return state
+
+    def record_failure(self, state):
+        if state == self.HALF_OPEN:
+            self.trip()
+        else:
+            self._record(bad=True)
+
+    def record_success(self, state, elapsed):
+        slow = elapsed > self.slow_call_seconds
+        if state == self.HALF_OPEN:
+            if slow:
+                self.trip()
+            else:
+                self.reset()
+        else:
+            self._record(bad=slow)
+
+    def call(self, fn):
+        state = self.before_call()
+        started = time.monotonic()
+        try:
+            result = fn()
+        except Exception:
+            self.record_failure(state)
+            raise
+        self.record_success(state, time.monotonic() - started)
+        return result
+
+
+breaker = CircuitBreaker(
+    'openai',
+    failure_rate=getattr(settings, 'AI_BREAKER_FAILURE_RATE', 0.5),
+    min_calls=getattr(settings, 'AI_BREAKER_MIN_CALLS', 5),
+    slow_call_seconds=getattr(settings, 'AI_BREAKER_SLOW_CALL_SECONDS', 8),
+    window=getattr(settings, 'AI_BREAKER_WINDOW', 60),
+    cooldown=getattr(settings, 'AI_BREAKER_COOLDOWN', 30),
+)
+
+
+def cached_answer(key):
+    """Last good reply for a prompt key, used as a fallback while the breaker is open."""
+    return cache.get(f"ai:answer:{key}")
+
+
+def store_answer(key, text):
+    cache.set(f"ai:answer:{key}", text, getattr(settings, 'AI_ANSWER_CACHE_TTL', 60 * 60 * 24))
+
+
+def chat_completion(messages, model=DEFAULT_MODEL, **params):
+    """
+    Send a chat completion and return the reply text.
+    Identical concurrent prompts share a single provider call. While the
+    provider is unhealthy the last good reply for the same prompt is returned
+    instead; if there is none, AIUnavailable is raised straight away.
+    """
+    key = prompt_key(model, messages, **params)
+
+    def call_provider():
+        response = breaker.call(
+            lambda: get_client().chat.completions.create(model=model, messages=messages, **params)
+        )
+        text = response.choices[0].message.content
+        store_answer(key, text)
+        return text
+
+    try:
+        return single_flight(key, call_provider)
+    except AIUnavailable:
+        fallback = cached_answer(key)
+        if fallback is not None:
+            return fallback
+        raise
+
+
+# -------------------------------------------------------------------
+#  STREAMING
+# -------------------------------------------------------------------
+def _delta_text(chunk):
+    if not chunk.choices:
+        return None
+    return chunk.choices[0].delta.content
+
+
+def stream_chat_completion(messages, model=DEFAULT_MODEL, **params):
+    """
+    Yield the reply text piece by piece as the provider produces it.
+
+    Streams take part in the same single-flight as chat_completion(): the
+    caller that gets the prompt's lock streams from the provider, and anyone
+    asking for the same prompt meanwhile waits for the leader's reply and
+    gets it in one piece. The breaker judges latency by time-to-first-token;
+    while it is open the last good reply is yielded instead.
+    """
+    key = prompt_key(model, messages, **params)
+    shared = shared_result(key)
+    if shared is not None:
+        yield shared
+        return
+    token = acquire_flight(key)
+    if token is None:
+        # Someone is already asking: wait for their reply
+        yield chat_completion(messages, model=model, **params)
+        return
+
+    text = None
+    try:
+        try:
+            state = breaker.before_call()
+        except AIUnavailable:
+            fallback = cached_answer(key)
+            if fallback is None:
+                raise
+            yield fallback
+            return
+
+        started = time.monotonic()
+        first_token_after = None
+        parts = []
+        try:
+            stream = get_client().chat.completions.create(model=model, messages=messages, stream=True, **params)
+            for chunk in stream:
+                piece = _delta_text(chunk)
+                if not piece:
+                    continue
+                if first_token_after is None:
+                    first_token_after = time.monotonic() - started
+                parts.append(piece)
+                yield piece
+        except GeneratorExit:
+            # Browser went away; not the provider's fault.
+            raise
+        except Exception:
+            breaker.record_failure(state)
+            raise
+
+        breaker.record_success(state, first_token_after or (time.monotonic() - started))
+        text = ''.join(parts)
+        store_answer(key, text)
+    finally:
+        release_flight(key, token, text)
+
+
+async def astream_chat_completion(messages, model=DEFAULT_MODEL, **params):
+    """Async twin of stream_chat_completion() for requests served under ASGI."""
+    from asgiref.sync import sync_to_async
+
+    key = prompt_key(model, messages, **params)
+    shared = await sync_to_async(shared_result)(key)
+    if shared is not None:
+        yield shared
+        return
+    token = await sync_to_async(acquire_flight)(key)
+    if token is None:
+        yield await sync_to_async(chat_completion, thread_sensitive=False)(messages, model=model, **params)
+        return
+
+    text = None
+    try:
+        try:
+            state = await sync_to_async(breaker.before_call)()
+        except AIUnavailable:
+            fallback = await sync_to_async(cached_answer)(key)
+            if fallback is None:
+                raise
+            yield fallback
+            return
+
+        started = time.monotonic()
+        first_token_after = None
+        parts = []
+        try:
+            stream = await get_client(asynchronous=True).chat.completions.create(
+                model=model, messages=messages, stream=True, **params
+            )
+            async for chunk in stream:
+                piece = _delta_text(chunk)
+                if not piece:
+                    continue
+                if first_token_after is None:
+                    first_token_after = time.monotonic() - started
+                parts.append(piece)
+                yield piece
+        except GeneratorExit:
+            raise
+        except Exception:
+            await sync_to_async(breaker.record_failure)(state)
+            raise
+
+        await sync_to_async(breaker.record_success)(state, first_token_after or (time.monotonic() - started))
+        text = ''.join(parts)
+        await sync_to_async(store_answer)(key, text)
+    finally:
+        await sync_to_async(release_flight)(key, token, text)
@@ -0,0 +1,226 @@
+"""
+Quiz bundles: a portable JSON-lines format for moving quizzes between
+environments (e.g. staging -> production).
+
+    {"format": "quizmaster-bundle", "version": 1, "exported_at": "..."}
+    {"type": "category", "name": "Python", "description": "..."}
+    {"type": "quiz", "uid": "...", "title": "...", ..., "category": "Python",
+     "questions": [{"uid": "...", "text": "...", "choices": [["4", true], ["5", false]]}]}
+
+One record per line, so both sides can stream: the writer never holds more
+than one chunk of quizzes, the reader never more than one import batch.
+Quizzes and questions are matched on their `uid`, so importing the same
+bundle twice updates rather than duplicates.
+"""
+import json
+import uuid
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .dedupe import question_document, refresh_signatures
+from .models import Category, Quiz, Question, Choice, QuizAccessGrant
+
+BUNDLE_FORMAT = 'quizmaster-bundle'
+BUNDLE_VERSION = 1
+
+# Quiz fields carried in a bundle (ids, owners and timestamps are environment-specific)
+QUIZ_FIELDS = [
+    'title', 'description', 'quiz_type', 'duration_minutes', 'passing_percentage', 'is_active',
+    'difficulty', 'coupon_code', 'start_time', 'end_time', 'generate_certificate',
+]
+
+
+class BundleError(ValueError):
+    pass
+
+
+# -------------------------------------------------------------------
+#  WRITING
+# -------------------------------------------------------------------
+def _dump(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str) + '\n'
+
+
+def iter_bundle_lines(quizzes, chunk_size=200):
+    """Yield the lines of a bundle for `quizzes` (a queryset), reading them in id-ordered chunks."""
+    yield _dump({'format': BUNDLE_FORMAT, 'version': BUNDLE_VERSION, 'exported_at': timezone.now().isoformat()})
+
+    categories = Category.objects.filter(quizzes__in=quizzes).distinct().order_by('name')
+    for name, description in categories.values_list('name', 'description'):
+        yield _dump({'type': 'category', 'name': name, 'description': description or ''})
+
+    quizzes = quizzes.order_by('id')
+    last_id = 0
+    while True:
+        chunk = list(quizzes.filter(id__gt=last_id).values('id', 'uid', 'category__name', *QUIZ_FIELDS)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1]['id']
+        quiz_ids = [q['id'] for q in chunk]
+
+        choices = defaultdict(list)
+        for question_id, text, is_correct in (
+            Choice.objects.filter(question__quiz_id__in=quiz_ids).order_by('id')
+            .values_list('question_id', 'text', 'is_correct')
+        ):
+            choices[question_id].append([text, is_correct])
+        questions = defaultdict(list)
+        for question_id, quiz_id, uid, text in (
+            Question.objects.filter(quiz_id__in=quiz_ids).order_by('id').values_list('id', 'quiz_id', 'uid', 'text')
+        ):
+            questions[quiz_id].append({'uid': str(uid), 'text': text, 'choices': choices[question_id]})
+
+        for quiz in chunk:
+            record = {'type': 'quiz', 'uid': str(quiz['uid']), 'category': quiz['category__name']}
+            record.update({field: quiz[field] for field in QUIZ_FIELDS})
+            record['questions'] = questions[quiz['id']]
+            yield _dump(record)
+
+
+def write_bundle(quizzes, fh, chunk_size=200):
+    for line in iter_bundle_lines(quizzes, chunk_size=chunk_size):
+        fh.write(line)
+
+
+# -------------------------------------------------------------------
+#  READING
+# -------------------------------------------------------------------
+def read_bundle(lines):
+    """Parse bundle lines one at a time, checking the header first."""
+    lines = iter(lines)
+    try:
+        header = json.loads(next(lines))
+    except (StopIteration, ValueError):
+        raise BundleError("Not a quiz bundle: missing header line.")
+    if header.get('format') != BUNDLE_FORMAT:
+        raise BundleError("Not a quiz bundle.")
+    if header.get('version') != BUNDLE_VERSION:
+        raise BundleError(f"Unsupported bundle version {header.get('version')} (expected {BUNDLE_VERSION}).")
+
+    for number, line in enumerate(lines, start=2):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise BundleError(f"Line {number}: {e}")
+        if record.get('type') not in ('category', 'quiz'):
+            raise BundleError(f"Line {number}: unknown record type {record.get('type')!r}.")
+        yield record
+
+
+def _uuid(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def _upsert(model, objs, unique_fields, update_fields, batch_size):
+    """bulk_create with ON CONFLICT/ON DUPLICATE KEY UPDATE; MySQL infers the key itself."""
+    target = unique_fields if connection.features.supports_update_conflicts_with_target else None
+    model.objects.bulk_create(
+        objs, batch_size=batch_size, update_conflicts=True, unique_fields=target, update_fields=update_fields,
+    )
+
+
+class BundleImport:
+    """Counts from import_bundle()."""
+    def __init__(self):
+        self.categories = 0
+        self.quizzes = 0
+        self.questions = 0
+        self.choices = 0
+
+
+def _import_batch(records, category_ids, result, batch_size):
+    # 1. Quizzes, keyed on uid. The upsert skips the pre_save signal, so
+    #    revoke access here when a coupon changes, just like an admin edit would.
+    uids = [_uuid(r['uid']) for r in records]
+    old_codes = dict(Quiz.objects.filter(uid__in=uids).values_list('id', 'coupon_code'))
+    _upsert(Quiz, [
+        Quiz(uid=r['uid'], category_id=category_ids.get(r.get('category')), **{f: r.get(f) for f in QUIZ_FIELDS if f in r})
+        for r in records
+    ], ['uid'], ['category'] + QUIZ_FIELDS, batch_size)
+    quiz_ids = dict(Quiz.objects.filter(uid__in=uids).values_list('uid', 'id'))
+    changed = [
+        quiz_ids[_uuid(r['uid'])] for r in records
+        if quiz_ids[_uuid(r['uid'])] in old_codes
+        and (old_codes[quiz_ids[_uuid(r['uid'])]] or '').strip().lower() != (r.get('coupon_code') or '').strip().lower()
+    ]
+    QuizAccessGrant.objects.filter(quiz_id__in=changed).delete()
+
+    # 2. Questions, keyed on uid (a question moved between quizzes follows its uid)
+    bundle_questions = [(quiz_ids[_uuid(r['uid'])], q) for r in records for q in r.get('questions', [])]
+    _upsert(Question, [Question(uid=q['uid'], quiz_id=quiz_id, text=q['text']) for quiz_id, q in bundle_questions],
+            ['uid'], ['quiz', 'text'], batch_size)
+    question_ids = dict(Question.objects.filter(uid__in=[q['uid'] for _, q in bundle_questions]).values_list('uid', 'id'))
+
+    # 3. Choices have no identity of their own: match them by position
+    existing = defaultdict(list)
+    for choice in Choice.objects.filter(question_id__in=question_ids.values()).order_by('id'):
+        existing[choice.question_id].append(choice)
+
+    to_create, to_update, to_delete = [], [], []
+    for _, q in bundle_questions:
+        question_id = question_ids[_uuid(q['uid'])]
+        current = existing[question_id]
+        for position, (text, is_correct) in enumerate(q.get('choices', [])):
+            if position < len(current):
+                choice = current[position]
+                if choice.text != text or choice.is_correct != bool(is_correct):
+                    choice.text, choice.is_correct = text, bool(is_correct)
+                    to_update.append(choice)
+            else:
+                to_create.append(Choice(question_id=question_id, text=text, is_correct=bool(is_correct)))
+        to_delete.extend(c.id for c in current[len(q.get('choices', [])):])
+
+    Choice.objects.filter(id__in=to_delete).delete()
+    Choice.objects.bulk_update(to_update, ['text', 'is_correct'], batch_size=batch_size)
+    Choice.objects.bulk_create(to_create, batch_size=batch_size)
+
+    # Keep the duplicate index in step with the imported text
+    refresh_signatures(
+        [question_ids[_uuid(q['uid'])] for _, q in bundle_questions],
+        [question_document(q['text'], [text for text, _ in q.get('choices', [])]) for _, q in bundle_questions],
+    )
+
+    result.quizzes += len(records)
+    result.questions += len(bundle_questions)
+    result.choices += sum(len(q.get('choices', [])) for _, q in bundle_questions)
+
+
+def import_bundle(lines, batch_size=500):
+    """
+    Upsert every category, quiz, question and choice in a bundle with
+    set-based INSERT ... ON CONFLICT UPDATE statements, `batch_size` quizzes
+    per transaction. Questions missing from the bundle are left alone (they
+    may have student answers).
+    """
+    result = BundleImport()
+    category_ids = dict(Category.objects.values_list('name', 'id'))
+    pending_categories = []
+    batch = []
+
+    def flush_categories():
+        if pending_categories:
+            _upsert(Category, pending_categories, ['name'], ['description'], batch_size)
+            category_ids.update(Category.objects.filter(name__in=[c.name for c in pending_categories]).values_list('name', 'id'))
+            result.categories += len(pending_categories)
+            pending_categories.clear()
+
+    for record in read_bundle(lines):
+        if record['type'] == 'category':
+            pending_categories.append(Category(name=record['name'], description=record.get('description', '')))
+            continue
+        flush_categories()
+        batch.append(record)
+        if len(batch) >= batch_size:
+            with transaction.atomic():
+                _import_batch(batch, category_ids, result, batch_size)
+            batch = []
+
+    flush_categories()
+    if batch:
+        with transaction.atomic():
+            _import_batch(batch, category_ids, result, batch_size)
+    return result
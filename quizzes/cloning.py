@@ -0,0 +1,71 @@
+from django.db import transaction
+
+from .models import Quiz, Question, Choice, QuestionSignature, QuestionBucket
+from .utils import bulk_create_with_pks
+
+# Fields that belong to the original, not the copy
+_SKIP_FIELDS = {'id', 'created_at', 'uid'}
+
+
+@transaction.atomic
+def clone_quizzes(quizzes, title_suffix=" (Copy)", created_by=None, batch_size=1000):
+    """
+    Deep-copy quizzes with their questions and choices.
+
+    Questions and choices are read as plain values and written back with a
+    handful of bulk INSERTs; old question ids are mapped to new ones in
+    memory. Copies start inactive so a cloned hackathon doesn't go live
+    before it is reviewed. Returns the new quizzes in the order given.
+    """
+    sources = list(quizzes)
+    if not sources:
+        return []
+
+    copies = {}
+    for source in sources:
+        values = {
+            f.attname: getattr(source, f.attname)
+            for f in Quiz._meta.concrete_fields if f.attname not in _SKIP_FIELDS
+        }
+        values.update(title=f"{source.title}{title_suffix}"[:255], is_active=False)
+        if created_by is not None:
+            values['created_by_id'] = created_by.pk
+        copies[source.pk] = Quiz.objects.create(**values)
+
+    old_questions = list(
+        Question.objects.filter(quiz__in=sources).order_by('id').values_list('id', 'quiz_id', 'text')
+    )
+    new_questions = bulk_create_with_pks(
+        [Question(quiz=copies[quiz_id], text=text) for _, quiz_id, text in old_questions],
+        batch_size=batch_size,
+    )
+    question_map = {old[0]: new.pk for old, new in zip(old_questions, new_questions)}
+
+    Choice.objects.bulk_create(
+        [
+            Choice(question_id=question_map[question_id], text=text, is_correct=is_correct)
+            for question_id, text, is_correct in Choice.objects.filter(question__quiz__in=sources)
+            .order_by('id').values_list('question_id', 'text', 'is_correct')
+        ],
+        batch_size=batch_size * 4,
+    )
+
+    # Same text and choices, same signature: copy the duplicate index too
+    QuestionSignature.objects.bulk_create(
+        [
+            QuestionSignature(question_id=question_map[question_id], minhash=minhash)
+            for question_id, minhash in QuestionSignature.objects.filter(question__quiz__in=sources)
+            .values_list('question_id', 'minhash')
+        ],
+        batch_size=batch_size,
+    )
+    QuestionBucket.objects.bulk_create(
+        [
+            QuestionBucket(question_id=question_map[question_id], band=band, bucket=bucket)
+            for question_id, band, bucket in QuestionBucket.objects.filter(question__quiz__in=sources)
+            .values_list('question_id', 'band', 'bucket')
+        ],
+        batch_size=batch_size * 8,
+    )
+
+    return [copies[source.pk] for source in sources]
@@ -0,0 +1,217 @@
+import re
+
+import numpy as np
+from django.db import transaction
+
+from .models import QuestionSignature, QuestionBucket
+
+# 64 MinHash values split into 8 LSH bands of 8 rows: two questions sharing
+# any band are candidates. With 8x8 bands, pairs above ~0.8 similarity are
+# almost always caught while pairs below ~0.5 rarely collide.
+NUM_PERM = 64
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.8
+
+_MERSENNE = np.uint64((1 << 31) - 1)
+_rng = np.random.RandomState(20240601)  # Fixed seed: signatures must be stable across runs
+_PERM_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_BAND_COEFFS = _rng.randint(1, (1 << 62), size=ROWS, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+_SHINGLE_POWERS = (257 ** np.arange(SHINGLE_SIZE, dtype=np.uint64)) & np.uint64(0xFFFFFFFF)
+
+
+def normalize(text):
+    return ' '.join(re.sub(r'[^\w]+', ' ', str(text).lower()).split())
+
+
+def question_document(text, choices):
+    """Question text plus its options; option order doesn't matter."""
+    return normalize(text) + ' || ' + ' | '.join(sorted(normalize(c) for c in choices if c))
+
+
+def shingles(document):
+    """Hashed character 5-grams of a document, as a uint64 array."""
+    data = np.frombuffer(document.encode('utf-8'), dtype=np.uint8).astype(np.uint64)
+    if len(data) < SHINGLE_SIZE:
+        data = np.concatenate([data, np.zeros(SHINGLE_SIZE - len(data), dtype=np.uint64)])
+    windows = np.lib.stride_tricks.sliding_window_view(data, SHINGLE_SIZE)
+    return np.unique((windows * _SHINGLE_POWERS).sum(axis=1) & np.uint64(0xFFFFFFFF))
+
+
+def minhash_many(documents, batch_size=256):
+    """MinHash signatures for many documents at once: a (len(documents), NUM_PERM) uint32 array."""
+    result = np.zeros((len(documents), NUM_PERM), dtype=np.uint32)
+    for start in range(0, len(documents), batch_size):
+        parts = [shingles(doc) for doc in documents[start:start + batch_size]]
+        offsets = np.cumsum([0] + [len(p) for p in parts[:-1]])
+        values = np.concatenate(parts)
+        # (a*x + b) mod p for every permutation and shingle, then the minimum per document
+        hashed = (_PERM_A[:, None] * values[None, :] + _PERM_B[:, None]) % _MERSENNE
+        result[start:start + len(parts)] = np.minimum.reduceat(hashed, offsets, axis=1).T
+    return result
+
+
+def signature(text, choices):
+    return minhash_many([question_document(text, choices)])[0]
+
+
+def band_keys(signatures):
+    """One int64 bucket key per band: a (n, BANDS) array."""
+    signatures = np.asarray(signatures)
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    return (bands * _BAND_COEFFS).sum(axis=2).view(np.int64)
+
+
+def to_bytes(sig):
+    return sig.astype('<u4').tobytes()
+
+
+def from_bytes(data):
+    return np.frombuffer(bytes(data), dtype='<u4')
+
+
+# -------------------------------------------------------------------
+#  INDEX
+# -------------------------------------------------------------------
+def chunked(ids, size=1000):
+    """Slices of `ids`, so `__in` filters stay a bounded size on big indexes."""
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def index_signatures(question_ids, signatures, batch_size=1000, replace_all=False):
+    """
+    Store `signatures` as the index entries of `question_ids`, replacing any
+    old ones. With replace_all (rebuilding the whole bank) the old index is
+    cleared with two plain DELETEs instead of id lists.
+    """
+    keys = band_keys(signatures)
+    if replace_all:
+        QuestionSignature.objects.all().delete()
+        QuestionBucket.objects.all().delete()
+    else:
+        for chunk in chunked(question_ids, batch_size):
+            QuestionSignature.objects.filter(question_id__in=chunk).delete()
+            QuestionBucket.objects.filter(question_id__in=chunk).delete()
+    QuestionSignature.objects.bulk_create(
+        [QuestionSignature(question_id=qid, minhash=to_bytes(sig)) for qid, sig in zip(question_ids, signatures)],
+        batch_size=batch_size,
+    )
+    QuestionBucket.objects.bulk_create(
+        [QuestionBucket(question_id=qid, band=band, bucket=int(key))
+         for qid, row in zip(question_ids, keys) for band, key in enumerate(row)],
+        batch_size=batch_size * BANDS,
+    )
+
+
+def index_questions(questions):
+    """(Re)build the duplicate index for the given questions (choices should be prefetched)."""
+    questions = list(questions)
+    if not questions:
+        return
+    signatures = minhash_many([question_document(q.text, [c.text for c in q.choices.all()]) for q in questions])
+    with transaction.atomic():
+        index_signatures([q.id for q in questions], signatures)
+
+
+def refresh_signatures(question_ids, documents):
+    """Index questions from their documents, rewriting only the signatures that changed."""
+    if not question_ids:
+        return
+    signatures = minhash_many(documents)
+    stored = {}
+    for chunk in chunked(question_ids):
+        stored.update(QuestionSignature.objects.filter(question_id__in=chunk).values_list('question_id', 'minhash'))
+    changed = [i for i, (qid, sig) in enumerate(zip(question_ids, signatures))
+               if bytes(stored.get(qid) or b'') != to_bytes(sig)]
+    if changed:
+        index_signatures([question_ids[i] for i in changed], signatures[changed])
+
+
+def find_near_duplicates(signatures, queryset=None, threshold=DEFAULT_THRESHOLD):
+    """
+    For each signature return the id of the most similar indexed question
+    (optionally limited to `queryset`), or None. Candidates come from the
+    indexed LSH buckets in a single query, then are checked against their
+    stored signatures.
+    """
+    if len(signatures) == 0:
+        return []
+    keys = band_keys(signatures)
+    buckets = QuestionBucket.objects.filter(bucket__in={int(k) for k in keys.ravel()})
+    if queryset is not None:
+        buckets = buckets.filter(question__in=queryset)
+
+    by_band = {}
+    for question_id, band, bucket in buckets.values_list('question_id', 'band', 'bucket'):
+        by_band.setdefault((band, bucket), set()).add(question_id)
+
+    candidates = [set().union(*[by_band.get((band, int(k)), set()) for band, k in enumerate(row)]) for row in keys]
+    wanted = set().union(*candidates)
+    stored = {
+        qid: from_bytes(data)
+        for qid, data in QuestionSignature.objects.filter(question_id__in=wanted).values_list('question_id', 'minhash')
+    }
+
+    matches = []
+    for sig, ids in zip(signatures, candidates):
+        best, best_score = None, threshold
+        for qid in sorted(ids):
+            score = float(np.mean(stored[qid] == sig)) if qid in stored else 0.0
+            if score >= best_score:
+                best, best_score = qid, score
+        matches.append(best)
+    return matches
+
+
+def similar_pairs(signatures, threshold=DEFAULT_THRESHOLD):
+    """
+    All (i, j) pairs, i < j, of near-duplicate signatures in one array,
+    found by grouping on each band's bucket key instead of comparing
+    every pair.
+    """
+    keys = band_keys(signatures)
+    pairs = set()
+    for band in range(BANDS):
+        _, groups, counts = np.unique(keys[:, band], return_inverse=True, return_counts=True)
+        order = np.argsort(groups, kind='stable')
+        starts = np.cumsum(np.concatenate([[0], counts[:-1]]))
+        for start, count in zip(starts[counts > 1], counts[counts > 1]):
+            members = order[start:start + count]
+            sims = (signatures[members][:, None, :] == signatures[members][None, :, :]).mean(axis=2)
+            for a, b in zip(*np.nonzero(np.triu(sims >= threshold, k=1))):
+                pairs.add((int(members[a]), int(members[b])))
+    return sorted(pairs)
+
+
+def duplicate_of(signatures, threshold=DEFAULT_THRESHOLD):
+    """For each signature, the index of an earlier near-duplicate in the same array, or None."""
+    earliest = [None] * len(signatures)
+    for i, j in similar_pairs(signatures, threshold):
+        if earliest[j] is None or i < earliest[j]:
+            earliest[j] = i
+    return earliest
+
+
+def cluster(n, pairs):
+    """Group indices connected by `pairs` (union-find); only groups of 2+ are returned."""
+    parent = list(range(n))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        ri, rj = root(i), root(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(root(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
@@ -0,0 +1,151 @@
+import csv
+import tempfile
+
+from django.db.models import Count, DurationField, ExpressionWrapper, F
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .leaderboard import LEADERBOARD_ORDER, format_duration, ranked_after
+from .models import Attempt, Question
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+EXPORT_HEADER = [
+    'Quiz', 'Rank', 'Username', 'Name', 'Email', 'College', 'Score', 'Max Score',
+    'Percentage', 'Time Taken', 'Submitted At', 'Passed', 'Auto-submit Reason',
+]
+
+_FIELDS = (
+    'id', 'quiz_id', 'quiz__title', 'user__username', 'user__first_name', 'user__last_name', 'user__email',
+    'college_name', 'score', 'time_taken', 'finished_at', 'passed', 'auto_submit_reason',
+)
+
+
+def _export_values(attempts):
+    return attempts.annotate(
+        college_name=F('user__profile__college__name'),
+        time_taken=ExpressionWrapper(F('finished_at') - F('created_at'), output_field=DurationField()),
+    ).values(*_FIELDS)
+
+
+def _row(attempt, rank, max_scores):
+    max_score = max_scores.get(attempt['quiz_id'], 0)
+    percentage = round(attempt['score'] * 100 / max_score, 1) if max_score else 0
+    name = f"{attempt['user__first_name']} {attempt['user__last_name']}".strip()
+    return [
+        attempt['quiz__title'], rank, attempt['user__username'], name, attempt['user__email'],
+        attempt['college_name'] or '', attempt['score'], max_score, percentage,
+        format_duration(attempt['time_taken']) if attempt['finished_at'] else '',
+        attempt['finished_at'].strftime('%Y-%m-%d %H:%M:%S') if attempt['finished_at'] else '',
+        'Yes' if attempt['passed'] else 'No', attempt['auto_submit_reason'] or '',
+    ]
+
+
+def _max_scores(quiz_ids):
+    return dict(
+        Question.objects.filter(quiz_id__in=quiz_ids).values('quiz_id').annotate(n=Count('id')).values_list('quiz_id', 'n')
+    )
+
+
+# Rows are read in keyset chunks rather than with one big cursor: the MySQL
+# driver buffers a whole result set client-side even under .iterator(), so
+# this is what keeps memory flat for very large exports.
+def _ranked_chunks(quiz_id, chunk_size):
+    """
+    Completed attempts of one quiz in leaderboard order (score desc,
+    finished_at, id); each chunk is an index seek on the Attempt
+    (quiz, -score, finished_at, id) index.
+    """
+    base = _export_values(Attempt.objects.filter(quiz_id=quiz_id, finished_at__isnull=False)).order_by(
+        *LEADERBOARD_ORDER
+    )
+    last = None
+    while True:
+        chunk = base
+        if last is not None:
+            chunk = chunk.filter(ranked_after(last))
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last = rows[-1]
+
+
+def _id_chunks(attempts, chunk_size):
+    base = _export_values(attempts).order_by('id')
+    last_id = 0
+    while True:
+        rows = list(base.filter(id__gt=last_id)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def hackathon_result_rows(quiz_ids, chunk_size=EXPORT_CHUNK_SIZE):
+    """Header, then the ranked leaderboard of each quiz (completed attempts only)."""
+    yield EXPORT_HEADER
+    max_scores = _max_scores(quiz_ids)
+    for quiz_id in quiz_ids:
+        rank = 0
+        for rows in _ranked_chunks(quiz_id, chunk_size):
+            for attempt in rows:
+                rank += 1
+                yield _row(attempt, rank, max_scores)
+
+
+def attempt_rows(attempts, chunk_size=EXPORT_CHUNK_SIZE):
+    """Header, then every attempt in `attempts` (finished or not) in id order, without a rank."""
+    yield EXPORT_HEADER
+    max_scores = _max_scores(attempts.values('quiz_id').distinct())
+    for rows in _id_chunks(attempts, chunk_size):
+        for attempt in rows:
+            yield _row(attempt, '', max_scores)
+
+
+class Echo:
+    """File-like object whose write() just hands the line back, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+def csv_response(rows, filename):
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(rows, filename, title='Results'):
+    """
+    Write an XLSX with openpyxl's write-only mode and send the file back.
+
+    Unlike csv_response this is not streamed end to end: an XLSX is a zip
+    whose index is written last, so the whole workbook is built in a
+    temporary file before the response starts. Memory stays flat (rows go
+    to disk as they come), but the request takes as long as the export;
+    only the finished file is streamed from disk by FileResponse, which
+    closes (and so deletes) it afterwards.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    tmp = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        for row in rows:
+            sheet.append(row)
+        workbook.save(tmp)
+    except Exception:
+        tmp.close()
+        raise
+    tmp.seek(0)
+    return FileResponse(
+        tmp, as_attachment=True, filename=f"{filename}.xlsx",
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+def export_filename(prefix):
+    return f"{prefix}-{timezone.now():%Y%m%d-%H%M}"
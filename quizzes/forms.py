@@ -294,4 +294,24 @@ class QuestionImportForm(forms.Form):
         help_text='Supported formats: .xlsx, .xls, .csv',
         widget=forms.FileInput(attrs={'accept': '.xlsx, .xls, .csv'})
     )
+    skip_duplicates = forms.BooleanField(
+        required=False,
+        initial=True,
+        label='Skip near-duplicates',
+        help_text='Skip rows that nearly repeat a question already in this quiz or earlier in the file.'
+    )
+
 
+
+class RosterUploadForm(forms.Form):
+    file = forms.FileField(
+        label='Student Roster',
+        help_text='Columns: Email (required), Full Name, College, Password. Supported formats: .xlsx, .xls, .csv',
+        widget=forms.FileInput(attrs={'accept': '.xlsx, .xls, .csv'})
+    )
+    college = forms.ModelChoiceField(
+        queryset=College.objects.order_by('name'),
+        required=False,
+        help_text='Used for rows without a College.'
+    )
+    send_emails = forms.BooleanField(required=False, initial=True, label='Email activation links to the students')
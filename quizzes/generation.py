@@ -0,0 +1,352 @@
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import connection
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .ai import DEFAULT_MODEL, breaker, get_client
+from .dedupe import find_near_duplicates, index_signatures, signature
+from .models import Quiz, Question, Choice, Category, AIQuizUsage
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationCancelled(Exception):
+    """The view stopped waiting before the first question was saved."""
+
+
+REJECTED_TOPIC_MESSAGE = "This platform is designed mainly for study purposes. Please choose a polite and educational topic."
+
+
+class QuizStreamParser:
+    """
+    Incremental parser for the quiz JSON the model streams back.
+
+    Feed it text as it arrives; it returns every question object whose
+    closing brace has been seen, and collects top-level string fields
+    ("title", "error") on the way. Braces inside strings are ignored.
+    """
+    def __init__(self):
+        self.fields = {}
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._raw = []
+        self._key = None
+        self._expect_value = False
+        self._in_questions = False
+        self._capture = None
+
+    def feed(self, text):
+        completed = []
+        for ch in text:
+            if self._capture is not None:
+                self._capture.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._end_string()
+                    continue
+                self._raw.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._raw = []
+            elif ch in '{[':
+                self._depth += 1
+                if ch == '[' and self._depth == 2 and self._key == 'questions':
+                    self._in_questions = True
+                elif ch == '{' and self._depth == 3 and self._in_questions:
+                    self._capture = ['{']
+            elif ch in '}]':
+                if ch == '}' and self._depth == 3 and self._capture is not None:
+                    completed.append(json.loads(''.join(self._capture)))
+                    self._capture = None
+                elif ch == ']' and self._depth == 2:
+                    self._in_questions = False
+                self._depth -= 1
+            elif self._depth == 1 and ch == ':':
+                self._expect_value = True
+            elif self._depth == 1 and ch == ',':
+                self._key = None
+                self._expect_value = False
+        return completed
+
+    def _end_string(self):
+        if self._depth != 1:
+            return
+        value = json.loads('"' + ''.join(self._raw) + '"')
+        if self._expect_value:
+            self.fields[self._key] = value
+        else:
+            self._key = value
+
+
+def build_generation_prompt(topic, limit, difficulty):
+    return f"""
+            Analyze the topic: "{topic}".
+            Difficulty Level: {difficulty}.
+
+            STRICT CONTENT GUIDELINES:
+            This platform is for study and educational purposes only.
+            1. REJECT topics involving: profanity, sexual content, violence, hate speech, illegal acts, or inappropriate adult themes.
+            2. REJECT topics that are purely for inappropriate entertainment or "bad things".
+
+            If the topic violates these rules, return ONLY this JSON:
+            {{ "error": "{REJECTED_TOPIC_MESSAGE}" }}
+
+            If the topic is safe/educational, create a multiple-choice quiz about "{topic}".
+            Number of questions: {limit}.
+            Complexity: {difficulty} (Ensure questions are suitable for {difficulty} level).
+
+            Return ONLY raw JSON. No markdown formatting. No code blocks.
+            Put "title" before "questions".
+            Success Structure:
+            {{
+                "title": "Short Topic Title (Max 5 words)",
+                "questions": [
+                    {{
+                        "text": "Question text here?",
+                        "choices": [
+                            {{"text": "Choice 1", "is_correct": false}},
+                            {{"text": "Choice 2", "is_correct": true}},
+                            {{"text": "Choice 3", "is_correct": false}},
+                            {{"text": "Choice 4", "is_correct": false}}
+                        ]
+                    }}
+                ]
+            }}
+            """
+
+
+class QuizGeneration:
+    """
+    Generates an AI quiz in a background thread, saving each question as soon
+    as the model finishes writing it.
+
+    `ready` is set once the first question is saved (or generation failed), so
+    the view can hand the quiz to the student while the rest is still coming.
+    The view collects it with wait(): if that times out first, the generation
+    is cancelled and the thread stops without creating a quiz nobody sees.
+
+    The quiz's generation_status records how it went. Every saved question
+    refreshes generation_updated_at, so a quiz left GENERATING by a worker
+    that died mid-stream is found and failed by fail_stale_generations().
+    """
+    def __init__(self, user, topic, limit, difficulty, site_url, reserved_month=None):
+        self.user = user
+        self.reserved_month = reserved_month  # Quota slot to hand back on failure
+        self.topic = topic
+        self.limit = limit
+        self.difficulty = difficulty
+        self.site_url = site_url
+        self.ready = threading.Event()
+        self.quiz = None
+        self.question_count = 0
+        self.error = None           # Message safe to show the student
+        self.rejected = False       # Topic refused by the content guidelines
+        self.cancelled = False      # The view gave up waiting; don't create the quiz
+        self._lock = threading.Lock()  # Quiz creation vs. cancellation
+
+    def start(self):
+        threading.Thread(target=self._run_in_thread, daemon=True).start()
+
+    def _run_in_thread(self):
+        try:
+            self.run()
+        finally:
+            # Threads get their own DB connection; don't leave it open
+            connection.close()
+
+    def wait(self, timeout):
+        """
+        Wait for the first question; returns the quiz, or None after cancelling
+        the generation so a late first question can't create an orphan quiz.
+        """
+        self.ready.wait(timeout=timeout)
+        with self._lock:
+            if self.quiz is None:
+                self.cancelled = True
+            return self.quiz
+
+    def stream_text(self):
+        # Same breaker as the tutor chat: fail fast while the provider is down,
+        # and judge latency by time-to-first-token (see stream_chat_completion)
+        state = breaker.before_call()
+        started = time.monotonic()
+        first_token_after = None
+        try:
+            stream = get_client().chat.completions.create(
+                model=DEFAULT_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are a helpful and ethical AI tutor. You strictly enforce educational guidelines."},
+                    {"role": "user", "content": build_generation_prompt(self.topic, self.limit, self.difficulty)}
+                ],
+                response_format={"type": "json_object"},
+                stream=True,
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token_after is None:
+                        first_token_after = time.monotonic() - started
+                    yield chunk.choices[0].delta.content
+        except GeneratorExit:
+            # We stopped reading (cancelled or rejected topic); not the provider's fault
+            raise
+        except Exception:
+            breaker.record_failure(state)
+            raise
+        breaker.record_success(state, first_token_after or (time.monotonic() - started))
+
+    def run(self):
+        parser = QuizStreamParser()
+        status = Quiz.GENERATION_FAILED
+        try:
+            for text in self.stream_text():
+                if self.cancelled and self.quiz is None:
+                    return  # nobody is waiting any more; stop paying for tokens
+                for q_data in parser.feed(text):
+                    self.save_question(parser.fields, q_data)
+                if 'error' in parser.fields and self.quiz is None:
+                    # Check if AI rejected the topic
+                    self.error = parser.fields['error']
+                    self.rejected = True
+                    return
+
+            if self.quiz is None:
+                self.error = "The AI could not create questions for this topic. Please try again."
+            status = Quiz.GENERATED
+        except GenerationCancelled:
+            pass
+        except Exception:
+            logger.exception("AI quiz generation on %r failed", self.topic)
+            if self.quiz is None:
+                self.error = "We are facilitating many quizzes right now! Please try again in 30 seconds. 🚀"
+        finally:
+            if self.quiz is None and self.reserved_month is not None:
+                AIQuizUsage.release(self.user, self.reserved_month)
+            self.ready.set()
+            if self.quiz is not None:
+                Quiz.objects.filter(pk=self.quiz.pk).update(
+                    generation_status=status, generation_updated_at=timezone.now()
+                )
+                if status == Quiz.GENERATED:
+                    self.send_ready_email()
+
+    def create_quiz(self, fields):
+        # Get or Create "AI Generated" category
+        category, _ = Category.objects.get_or_create(name="AI Generated")
+
+        # ✅ Hybrid Title Logic
+        # If user typed a short topic (e.g. "Python"), use it directly.
+        # If user typed a long description, use the AI's summarized title.
+        if len(self.topic.split()) <= 6:
+            final_title = self.topic.title()
+        else:
+            final_title = (fields.get('title') or self.topic[:50]).title()
+
+        # Append difficulty to title if not beginner
+        if self.difficulty != 'Beginner':
+            final_title = f"{final_title} ({self.difficulty})"
+
+        # ✅ Dynamic Time Calculation
+        # 1.5 minutes per question, minimum 5 minutes
+        calculated_duration = max(5, int(self.limit * 1.5))
+
+        return Quiz.objects.create(
+            title=final_title,
+            description=f"An AI-generated quiz on {self.topic}. Challenge yourself!",
+            category=category,
+            quiz_type='practice', # Defaulting to practice for AI quizzes
+            duration_minutes=calculated_duration,
+            passing_percentage=60, # Standard passing
+            created_by=self.user,
+            generation_status=Quiz.GENERATING,
+            generation_updated_at=timezone.now(),
+        )
+
+    def save_question(self, fields, q_data):
+        if not q_data.get('text') or not q_data.get('choices'):
+            return
+        choice_texts = [c['text'] for c in q_data['choices'] if c.get('text')]
+        sig = signature(q_data['text'], choice_texts)
+        if self.quiz is None:
+            with self._lock:
+                if self.cancelled:
+                    raise GenerationCancelled
+                quiz = self.create_quiz(fields)
+                self.add_question(quiz, q_data, sig)
+                # Published only with its first question, so wait() never hands out an empty quiz
+                self.quiz = quiz
+            # First question is in: the student can start now
+            self.ready.set()
+        elif find_near_duplicates([sig], Question.objects.filter(quiz=self.quiz))[0] is not None:
+            # 🔁 The model repeated itself; don't show the same question twice
+            return
+        else:
+            self.add_question(self.quiz, q_data, sig)
+
+    def add_question(self, quiz, q_data, sig):
+        question = Question.objects.create(quiz=quiz, text=q_data['text'])
+        Choice.objects.bulk_create([
+            Choice(question=question, text=c['text'], is_correct=bool(c.get('is_correct')))
+            for c in q_data['choices'] if c.get('text')
+        ])
+        index_signatures([question.id], sig[None, :])
+        self.question_count += 1
+        if self.question_count > 1:
+            # 💓 Heartbeat for fail_stale_generations()
+            Quiz.objects.filter(pk=quiz.pk).update(generation_updated_at=timezone.now())
+
+    def send_ready_email(self):
+        # 🤖 Send AI Quiz Ready Email
+        try:
+            mail_subject = f"Your AI Quiz '{self.quiz.title}' is Ready! 🤖"
+            quiz_url = f"{self.site_url}{reverse('quiz_detail', args=[self.quiz.id])}"
+
+            html_message = render_to_string('quizzes/ai_quiz_ready_email.html', {
+                'user': self.user,
+                'topic': self.topic.title(),
+                'quiz_url': quiz_url,
+                'question_count': self.question_count,
+                'difficulty': self.difficulty,
+                'domain': self.site_url,
+            })
+            plain_message = f"Your AI quiz on {self.topic} is ready. Start here: {quiz_url}"
+
+            send_mail(
+                subject=mail_subject,
+                message=plain_message,
+                from_email='tgays.technology@gmail.com',
+                recipient_list=[self.user.email],
+                fail_silently=True,
+                html_message=html_message
+            )
+        except Exception:
+            logger.exception("Could not send the AI quiz ready email for quiz %s", self.quiz.pk)
+
+
+def fail_stale_generations(timeout=None):
+    """
+    Mark quizzes still GENERATING whose worker stopped saving questions
+    (server restart, recycled worker) as failed. The questions saved so far
+    are kept. Returns the number of quizzes failed.
+    """
+    timeout = timeout if timeout is not None else getattr(settings, 'AI_GENERATION_STALE_TIMEOUT', 60 * 5)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Quiz.objects.filter(generation_status=Quiz.GENERATING, generation_updated_at__lt=cutoff).update(
+        generation_status=Quiz.GENERATION_FAILED
+    )
@@ -0,0 +1,330 @@
+import csv
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .dedupe import duplicate_of, find_near_duplicates, index_signatures, minhash_many, question_document
+from .models import Question, Choice, QuestionImportJob
+from .utils import bulk_create_with_pks
+
+# Expected columns: Question, Option A, Option B, Option C, Option D, Correct Answer
+OPTION_KEYS = ['A', 'B', 'C', 'D']
+OPTION_COLUMNS = [f'Option {key}' for key in OPTION_KEYS]
+QUESTION_COLUMN = 'Question'
+ANSWER_COLUMN = 'Correct Answer'
+CHOICE_MAX_LENGTH = Choice._meta.get_field('text').max_length
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []  # (spreadsheet row number, message)
+
+    def add_error(self, row, message):
+        self.errors.append((row, message))
+
+
+def _clean_text(series):
+    cleaned = series.astype('string').str.strip()
+    return cleaned.mask(cleaned == '')
+
+
+def normalize_questions(df, first_row=2):
+    """
+    Validate a spreadsheet of questions with column-wise pandas operations.
+
+    Returns (questions, is_correct, errors): `questions` has one row per valid
+    question with columns text, A, B, C, D (missing options are NA) and row;
+    `is_correct` is a boolean frame of the same shape over A-D; `errors` lists
+    (row number, message) for every rejected row. `first_row` is the
+    spreadsheet row number of df's first row (row 1 is the header).
+    """
+    df = df.rename(columns=lambda c: str(c).strip())
+    if QUESTION_COLUMN not in df.columns:
+        raise ValueError(f"Missing '{QUESTION_COLUMN}' column.")
+    if ANSWER_COLUMN not in df.columns:
+        raise ValueError(f"Missing '{ANSWER_COLUMN}' column.")
+
+    row_numbers = pd.Series(np.arange(first_row, first_row + len(df)), index=df.index)
+    text = _clean_text(df[QUESTION_COLUMN])
+    options = pd.DataFrame({
+        key: _clean_text(df[column]) if column in df.columns else pd.Series(pd.NA, index=df.index, dtype='string')
+        for key, column in zip(OPTION_KEYS, OPTION_COLUMNS)
+    })
+    answer = _clean_text(df[ANSWER_COLUMN]).str.upper()
+
+    # Correct Answer may be the option letter (A-D) or the option text itself
+    by_letter = pd.DataFrame({key: answer == key for key in OPTION_KEYS}).fillna(False)
+    by_text = options.apply(lambda col: col.str.upper() == answer).fillna(False)
+    is_correct = (by_letter | by_text) & options.notna()
+
+    blank = text.isna() & options.isna().all(axis=1)
+    checks = [
+        (text.isna(), "Missing question text."),
+        (options.notna().sum(axis=1) < 2, "Needs at least two options."),
+        (options.apply(lambda col: col.str.len() > CHOICE_MAX_LENGTH).fillna(False).any(axis=1),
+         f"Option longer than {CHOICE_MAX_LENGTH} characters."),
+        (~is_correct.any(axis=1), "Correct Answer doesn't match any option."),
+    ]
+
+    errors = []
+    invalid = pd.Series(False, index=df.index)
+    for failed, message in checks:
+        failed = failed & ~blank & ~invalid  # One message per row is enough
+        errors.extend((int(row), message) for row in row_numbers[failed])
+        invalid |= failed
+    errors.sort()
+
+    keep = ~(blank | invalid)
+    questions = options[keep].assign(text=text[keep], row=row_numbers[keep])
+    return questions, is_correct[keep], errors
+
+
+def import_questions(quiz, df, chunk_size=1000, first_row=2, result=None, skip_duplicates=False, import_job=None):
+    """
+    Validate `df` and insert its questions and choices into `quiz`.
+    The whole DataFrame is written in one transaction with bulk INSERTs of
+    `chunk_size` questions, so a failure leaves none of its rows behind.
+    (Background jobs call this once per chunk of the file, passing
+    `import_job` to tag the new questions; run_import_job removes the earlier
+    chunks' questions if a later one fails.)
+
+    New questions are added to the near-duplicate index; with
+    `skip_duplicates`, rows that nearly repeat a question already in the
+    quiz (or an earlier row) are skipped and reported.
+    """
+    result = result or ImportResult()
+    questions, is_correct, errors = normalize_questions(df, first_row=first_row)
+    for row, message in errors:
+        result.add_error(row, message)
+
+    with transaction.atomic():
+        for start in range(0, len(questions), chunk_size):
+            chunk = questions.iloc[start:start + chunk_size]
+            correct = is_correct.iloc[start:start + chunk_size].to_numpy(dtype=bool)
+            texts = chunk[OPTION_KEYS].to_numpy(dtype=object, na_value=None)
+            present = chunk[OPTION_KEYS].notna().to_numpy()
+            row_numbers = chunk['row'].tolist()
+            signatures = minhash_many([
+                question_document(text, options[mask]) for text, options, mask in zip(chunk['text'].tolist(), texts, present)
+            ])
+
+            keep = np.ones(len(chunk), dtype=bool)
+            if skip_duplicates:
+                # Earlier chunks are already indexed, so the lookup covers them too
+                in_quiz = find_near_duplicates(signatures, Question.objects.filter(quiz=quiz))
+                in_file = duplicate_of(signatures)
+                for i, (existing, earlier) in enumerate(zip(in_quiz, in_file)):
+                    if existing is not None:
+                        result.add_error(row_numbers[i], f"Near-duplicate of question #{existing}.")
+                    elif earlier is not None:
+                        result.add_error(row_numbers[i], f"Near-duplicate of row {row_numbers[earlier]}.")
+                    else:
+                        continue
+                    keep[i] = False
+
+            created = bulk_create_with_pks(
+                [Question(quiz=quiz, text=text, import_job=import_job) for text in chunk['text'][keep].tolist()],
+            )
+            rows, cols = np.nonzero(present[keep])
+            texts, correct = texts[keep], correct[keep]
+            Choice.objects.bulk_create(
+                [Choice(question=created[r], text=texts[r, c], is_correct=bool(correct[r, c])) for r, c in zip(rows, cols)],
+                batch_size=chunk_size * len(OPTION_KEYS),
+            )
+            index_signatures([q.id for q in created], signatures[keep])
+            result.imported += len(created)
+    result.errors.sort()
+    return result
+
+
+def read_question_file(file):
+    if file.name.endswith('.csv'):
+        return pd.read_csv(file, dtype=str, keep_default_na=False)
+    return pd.read_excel(file, dtype=str, keep_default_na=False)
+
+
+# -------------------------------------------------------------------
+#  CHUNKED / BACKGROUND IMPORT
+# -------------------------------------------------------------------
+def iter_question_chunks(path, chunk_size=1000):
+    """
+    Yield (first_row, DataFrame) pieces of a question file without loading
+    it all: CSV through pandas' chunked reader, XLSX through openpyxl's
+    read-only mode. first_row is the spreadsheet row number of the chunk's
+    first line.
+    """
+    first_row = 2
+    if path.endswith('.csv'):
+        for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size):
+            yield first_row, chunk
+            first_row += len(chunk)
+        return
+
+    if not path.endswith('.xlsx'):
+        # Legacy formats have no streaming reader; they are small in practice
+        yield first_row, pd.read_excel(path, dtype=str, keep_default_na=False)
+        return
+
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = ['' if cell is None else str(cell) for cell in next(rows, ())]
+        width = len(header)
+        batch = []
+        for row in rows:
+            values = ['' if cell is None else str(cell) for cell in row[:width]]
+            batch.append(values + [''] * (width - len(values)))
+            if len(batch) == chunk_size:
+                yield first_row, pd.DataFrame(batch, columns=header)
+                first_row += len(batch)
+                batch = []
+        if batch:
+            yield first_row, pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def count_rows(path):
+    """Data rows in a question file, counted by streaming over it."""
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8', errors='replace') as fh:
+            return max(0, sum(1 for _ in csv.reader(fh)) - 1)
+    if path.endswith('.xlsx'):
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        return max(0, max_row - 1) if max_row else None
+    return None
+
+
+def preview_import(path, limit=10, sample_rows=200):
+    """
+    Dry run over the first `sample_rows` rows: parse and validate them
+    without writing anything. Returns (questions, errors) where questions
+    is a list of {'text', 'choices': [(text, is_correct)]} for the first
+    `limit` valid rows.
+    """
+    first_row, df = next(iter_question_chunks(path, chunk_size=sample_rows), (2, pd.DataFrame()))
+    if df.empty:
+        return [], []
+    questions, is_correct, errors = normalize_questions(df, first_row=first_row)
+
+    preview = []
+    for (_, row), (_, correct) in zip(questions.head(limit).iterrows(), is_correct.head(limit).iterrows()):
+        preview.append({
+            'text': row['text'],
+            'choices': [(row[key], bool(correct[key])) for key in OPTION_KEYS if not pd.isna(row[key])],
+        })
+    return preview, errors
+
+
+MAX_STORED_ERRORS = 200
+
+
+def _finish(job, status, message):
+    """Record the outcome and delete the uploaded file, which is no longer needed."""
+    job.status = status
+    job.message = message
+    job.finished_at = timezone.now()
+    if job.file:
+        job.file.delete(save=False)
+    job.file = ''
+    job.save(update_fields=['status', 'message', 'finished_at', 'file', 'updated_at'])
+    return job
+
+
+def rollback_import_job(job):
+    """Delete the questions (and their choices) a failed job already committed, and nothing else."""
+    deleted = Question.objects.filter(import_job=job).delete()[1]
+    return deleted.get(Question._meta.label, 0)
+
+
+def run_import_job(job, chunk_size=1000):
+    """
+    Import a confirmed job chunk by chunk. Each chunk commits on its own so
+    progress is visible in the admin while the job runs, and memory use
+    depends on the chunk size, not on the file size. The questions it creates
+    are tagged with the job, so if a chunk fails those of the earlier chunks
+    are deleted again: a job imports the whole file or nothing, while
+    questions others add to the quiz meanwhile are left alone.
+    """
+    # Claim the job so the thread and the management command never both run it
+    claimed = QuestionImportJob.objects.filter(pk=job.pk, status=QuestionImportJob.QUEUED).update(
+        status=QuestionImportJob.RUNNING, updated_at=timezone.now()
+    )
+    if not claimed:
+        return job
+    job.status = QuestionImportJob.RUNNING
+
+    try:
+        job.total_rows = count_rows(job.file.path)
+        job.save(update_fields=['total_rows', 'updated_at'])
+        for first_row, df in iter_question_chunks(job.file.path, chunk_size=chunk_size):
+            result = import_questions(job.quiz, df, chunk_size=chunk_size, first_row=first_row,
+                                      skip_duplicates=job.skip_duplicates, import_job=job)
+
+            job.processed_rows += len(df)
+            job.imported_count += result.imported
+            job.error_count += len(result.errors)
+            room = MAX_STORED_ERRORS - len(job.errors)
+            if room > 0:
+                job.errors += [list(error) for error in result.errors[:room]]
+            # Progress doubles as the heartbeat; 0 rows means fail_stale_import_jobs gave up on us
+            still_running = QuestionImportJob.objects.filter(pk=job.pk, status=QuestionImportJob.RUNNING).update(
+                processed_rows=job.processed_rows, imported_count=job.imported_count,
+                error_count=job.error_count, errors=job.errors, updated_at=timezone.now(),
+            )
+            if not still_running:
+                rollback_import_job(job)
+                job.refresh_from_db()
+                return job
+    except Exception as e:
+        removed = rollback_import_job(job)
+        return _finish(job, QuestionImportJob.FAILED,
+                       f"Stopped after {job.processed_rows} rows: {e}. Removed the {removed} questions already imported.")
+    return _finish(job, QuestionImportJob.DONE,
+                   f"Imported {job.imported_count} questions, skipped {job.error_count} rows.")
+
+
+def fail_stale_import_jobs(timeout=None):
+    """
+    Fail RUNNING jobs whose worker stopped reporting progress (server
+    restart, killed thread) and remove what they imported. Returns the jobs.
+    """
+    timeout = timeout if timeout is not None else getattr(settings, 'IMPORT_JOB_TIMEOUT', 60 * 15)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    failed = []
+    for job in QuestionImportJob.objects.filter(status=QuestionImportJob.RUNNING, updated_at__lt=cutoff):
+        # Claim it, so a worker that was only slow can't finish it at the same time
+        if not QuestionImportJob.objects.filter(pk=job.pk, status=QuestionImportJob.RUNNING,
+                                                updated_at=job.updated_at).update(status=QuestionImportJob.FAILED):
+            continue
+        removed = rollback_import_job(job)
+        failed.append(_finish(job, QuestionImportJob.FAILED,
+                              f"The import stopped responding after {job.processed_rows} rows. "
+                              f"Removed the {removed} questions already imported; please upload the file again."))
+    return failed
+
+
+def start_import_job(job):
+    """Queue a confirmed job and run it in a background thread."""
+    job.status = QuestionImportJob.QUEUED
+    job.save(update_fields=['status'])
+
+    def work():
+        try:
+            run_import_job(QuestionImportJob.objects.select_related('quiz').get(pk=job.pk))
+        finally:
+            connection.close()
+
+    threading.Thread(target=work, daemon=True).start()
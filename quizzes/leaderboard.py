@@ -0,0 +1,100 @@
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, FloatField, Q, Value
+from django.db.models.functions import Round
+
+from .models import Attempt
+
+PAGE_SIZE = 100
+
+
+# Leaderboard order: ties on score go to whoever submitted first. Served by
+# the (quiz, -score, finished_at, id) index on Attempt.
+LEADERBOARD_ORDER = ('-score', 'finished_at', 'id')
+
+
+def leaderboard_queryset(quiz, max_score=None):
+    """
+    Completed attempts of `quiz`, best first, with percentage, time taken
+    and college name computed by the database.
+    """
+    if max_score is None:
+        max_score = quiz.questions.count()
+    percentage = Value(0.0, output_field=FloatField())
+    if max_score:
+        percentage = Round(F('score') * 100.0 / max_score, 1, output_field=FloatField())
+
+    return (
+        Attempt.objects
+        .filter(quiz=quiz, finished_at__isnull=False)
+        .select_related('user')
+        .annotate(
+            percentage=percentage,
+            time_taken=ExpressionWrapper(F('finished_at') - F('created_at'), output_field=DurationField()),
+            college_name=F('user__profile__college__name'),
+        )
+        .order_by(*LEADERBOARD_ORDER)
+    )
+
+
+def ranked_after(key):
+    """Attempts that come after `key` = {'score', 'finished_at', 'id'} in leaderboard order."""
+    return (
+        Q(score__lt=key['score'])
+        | Q(score=key['score'], finished_at__gt=key['finished_at'])
+        | Q(score=key['score'], finished_at=key['finished_at'], id__gt=key['id'])
+    )
+
+
+def ranked_before(key):
+    """Attempts that come before `key` in leaderboard order."""
+    return (
+        Q(score__gt=key['score'])
+        | Q(score=key['score'], finished_at__lt=key['finished_at'])
+        | Q(score=key['score'], finished_at=key['finished_at'], id__lt=key['id'])
+    )
+
+
+def leaderboard_page(quiz, after=None, before=None, page_size=PAGE_SIZE, max_score=None):
+    """
+    One page of the leaderboard: the attempts after attempt `after`, or the
+    page ending just before attempt `before`. Both are keyset seeks on
+    (score, finished_at, id), so a deep page costs the same as the first;
+    the global rank of the page comes from one COUNT of the rows ahead of
+    the cursor. An unknown cursor gives the first page.
+    """
+    rows = leaderboard_queryset(quiz, max_score=max_score)
+    cursor = after if after is not None else before
+    key = None
+    if cursor is not None:
+        key = rows.filter(pk=cursor).values('score', 'finished_at', 'id').first()
+    if key is None:
+        page, first_rank = list(rows[:page_size]), 1
+    else:
+        ahead = rows.filter(ranked_before(key)).count()
+        if after is not None:
+            page, first_rank = list(rows.filter(ranked_after(key))[:page_size]), ahead + 2
+        else:
+            page = list(rows.filter(ranked_before(key)).order_by('score', '-finished_at', '-id')[:page_size])
+            page.reverse()
+            first_rank = ahead - len(page) + 1
+    for rank, attempt in enumerate(page, start=first_rank):
+        attempt.rank = rank
+    return page
+
+
+def leaderboard_stats(quiz):
+    """Participants (all attempts), completed attempts and average completed score in one query."""
+    completed = Q(finished_at__isnull=False)
+    stats = Attempt.objects.filter(quiz=quiz).aggregate(
+        total_participants=Count('id'),
+        completed_count=Count('id', filter=completed),
+        avg_score=Avg('score', filter=completed),
+    )
+    stats['avg_score'] = round(stats['avg_score'] or 0, 1)
+    return stats
+
+
+def format_duration(duration):
+    if duration is None:
+        return "N/A"
+    total_seconds = int(duration.total_seconds())
+    return f"{total_seconds // 60}m {total_seconds % 60}s"
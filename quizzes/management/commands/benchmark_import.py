@@ -0,0 +1,61 @@
+import os
+import tempfile
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from quizzes.importer import import_questions, read_question_file
+from quizzes.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the spreadsheet question import (rows/second). Nothing is kept in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='?', help='CSV/XLSX file to import (a synthetic CSV is generated if omitted)')
+        parser.add_argument('--rows', type=int, default=10000, help='Rows in the synthetic file')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['file']
+        generated = path is None
+        if generated:
+            path = self.write_synthetic_csv(options['rows'])
+
+        try:
+            started = time.perf_counter()
+            with open(path, 'rb') as fh:
+                df = read_question_file(fh)
+            read_seconds = time.perf_counter() - started
+
+            with transaction.atomic():
+                quiz = Quiz.objects.create(title="Import benchmark", is_active=False)
+                started = time.perf_counter()
+                result = import_questions(quiz, df, chunk_size=options['chunk_size'])
+                import_seconds = time.perf_counter() - started
+                # Benchmark only: throw everything away
+                transaction.set_rollback(True)
+        finally:
+            if generated:
+                os.remove(path)
+
+        rows = len(df)
+        self.stdout.write(f"Rows: {rows} ({result.imported} imported, {len(result.errors)} rejected)")
+        self.stdout.write(f"Read:   {read_seconds:.2f}s")
+        self.stdout.write(f"Import: {import_seconds:.2f}s")
+        self.stdout.write(self.style.SUCCESS(f"{rows / (read_seconds + import_seconds):,.0f} rows/second"))
+
+    def write_synthetic_csv(self, rows):
+        df = pd.DataFrame({
+            'Question': [f"Benchmark question {i}: what is {i} + {i}?" for i in range(rows)],
+            'Option A': [str(2 * i) for i in range(rows)],
+            'Option B': [str(2 * i + 1) for i in range(rows)],
+            'Option C': [str(i) for i in range(rows)],
+            'Option D': [str(i * i + 3) for i in range(rows)],
+            'Correct Answer': ['A'] * rows,
+        })
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', newline='') as fh:
+            df.to_csv(fh, index=False)
+        return path
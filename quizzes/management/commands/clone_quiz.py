@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from quizzes.cloning import clone_quizzes
+from quizzes.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Deep-copy one or more quizzes with all their questions and choices (copies start inactive)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='+', type=int)
+        parser.add_argument('--suffix', default=' (Copy)', help='Appended to each copied title')
+
+    def handle(self, *args, **options):
+        quizzes = list(Quiz.objects.filter(id__in=options['quiz_ids']).order_by('id'))
+        missing = set(options['quiz_ids']) - {q.id for q in quizzes}
+        if missing:
+            raise CommandError(f"Quiz not found: {', '.join(map(str, sorted(missing)))}")
+
+        started = time.perf_counter()
+        copies = clone_quizzes(quizzes, title_suffix=options['suffix'])
+        elapsed = time.perf_counter() - started
+
+        for source, copy in zip(quizzes, copies):
+            self.stdout.write(f"#{source.id} '{source.title}' -> #{copy.id} '{copy.title}' ({copy.questions.count()} questions)")
+        self.stdout.write(self.style.SUCCESS(f"Cloned {len(copies)} quizzes in {elapsed:.2f}s"))
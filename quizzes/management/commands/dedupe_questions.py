@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from quizzes.dedupe import (
+    DEFAULT_THRESHOLD, chunked, cluster, index_signatures, minhash_many, question_document, similar_pairs,
+)
+from quizzes.models import Answer, Choice, Question
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the near-duplicate index over the whole question bank and report (or delete) duplicates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='Estimated similarity (0-1) above which two questions are duplicates')
+        parser.add_argument('--delete', action='store_true',
+                            help='Delete duplicates inside the same quiz, keeping the oldest. Questions with answers are kept.')
+
+    def handle(self, *args, **options):
+        # Plain value lists: no model instances for the whole bank
+        questions = list(Question.objects.order_by('id').values_list('id', 'quiz_id', 'text'))
+        choices = defaultdict(list)
+        for question_id, text in Choice.objects.order_by('id').values_list('question_id', 'text'):
+            choices[question_id].append(text)
+
+        self.stdout.write(f"Signing {len(questions)} questions...")
+        signatures = minhash_many([question_document(text, choices[qid]) for qid, _, text in questions])
+        ids = [qid for qid, _, _ in questions]
+        with transaction.atomic():
+            index_signatures(ids, signatures, replace_all=True)
+
+        groups = cluster(len(questions), similar_pairs(signatures, options['threshold']))
+        if not groups:
+            self.stdout.write(self.style.SUCCESS("No near-duplicates found."))
+            return
+
+        to_delete = []
+        for members in groups:
+            self.stdout.write(f"\n{len(members)} similar questions:")
+            kept_per_quiz = set()
+            for i in members:
+                qid, quiz_id, text = questions[i]
+                self.stdout.write(f"  #{qid} (quiz {quiz_id}): {text[:70]}")
+                if quiz_id in kept_per_quiz:
+                    to_delete.append(qid)
+                kept_per_quiz.add(quiz_id)
+
+        self.stdout.write(f"\n{len(groups)} groups, {len(to_delete)} same-quiz duplicates.")
+        if not options['delete'] or not to_delete:
+            return
+
+        answered = set()
+        for chunk in chunked(to_delete):
+            answered.update(Answer.objects.filter(question_id__in=chunk).values_list('question_id', flat=True))
+        removable = [qid for qid in to_delete if qid not in answered]
+        for chunk in chunked(removable):
+            Question.objects.filter(id__in=chunk).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {len(removable)} duplicates; kept {len(answered)} that students have already answered."
+        ))
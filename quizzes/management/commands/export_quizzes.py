@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from quizzes.bundles import write_bundle
+from quizzes.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Export quizzes with their questions, choices and categories as a JSON-lines quiz bundle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='Bundle file to write (default: stdout)')
+        parser.add_argument('--ids', nargs='+', type=int, help='Only these quiz ids')
+        parser.add_argument('--category', help='Only quizzes in this category')
+        parser.add_argument('--type', choices=[Quiz.PRACTICE, Quiz.HACKATHON], help='Only this quiz type')
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.all()
+        if options['ids']:
+            quizzes = quizzes.filter(id__in=options['ids'])
+        if options['category']:
+            quizzes = quizzes.filter(category__name=options['category'])
+        if options['type']:
+            quizzes = quizzes.filter(quiz_type=options['type'])
+
+        if not options['output']:
+            write_bundle(quizzes, sys.stdout)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as fh:
+            write_bundle(quizzes, fh)
+        self.stdout.write(self.style.SUCCESS(f"Exported {quizzes.count()} quizzes to {options['output']}"))
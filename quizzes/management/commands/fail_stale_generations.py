@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from quizzes.generation import fail_stale_generations
+
+
+class Command(BaseCommand):
+    help = 'Mark AI quizzes whose generation stopped responding (e.g. after a server restart) as failed'
+
+    def handle(self, *args, **kwargs):
+        failed = fail_stale_generations()
+        if failed:
+            self.stdout.write(self.style.ERROR(f"Marked {failed} unfinished AI quizzes as failed"))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from quizzes.bundles import BundleError, import_bundle
+
+
+class Command(BaseCommand):
+    help = 'Import (create or update) quizzes from a JSON-lines quiz bundle written by export_quizzes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('bundle', help='Bundle file')
+        parser.add_argument('--batch-size', type=int, default=500, help='Quizzes per transaction')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['bundle'], encoding='utf-8') as fh:
+                result = import_bundle(fh, batch_size=options['batch_size'])
+        except (OSError, BundleError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.categories} categories, {result.quizzes} quizzes, {result.questions} questions "
+            f"and {result.choices} choices in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from quizzes.models import College
+from quizzes.onboarding import (
+    MAX_HASH_WORKERS, RosterError, default_workers, onboard_students, read_roster, send_activation_emails,
+)
+
+
+class Command(BaseCommand):
+    help = 'Create inactive student accounts from a roster (Email[,Full Name][,College][,Password]) and email activation links'
+
+    def add_arguments(self, parser):
+        parser.add_argument('roster_path', help='.csv, .xlsx or .xls file')
+        parser.add_argument('--college', help='College for rows without one (created if missing)')
+        parser.add_argument('--workers', type=int, help=f'Password hashing processes (default: CPU count, at most {MAX_HASH_WORKERS})')
+        parser.add_argument('--domain', default='127.0.0.1:8000', help='Site domain for the activation links')
+        parser.add_argument('--protocol', default='https')
+        parser.add_argument('--no-email', action='store_true', help="Don't send activation emails")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['roster_path'], 'rb') as fh:
+                rows = read_roster(fh)
+        except (OSError, RosterError, ValueError) as e:
+            raise CommandError(str(e))
+
+        college = None
+        if options['college']:
+            college, _ = College.objects.get_or_create(name=options['college'])
+
+        result = onboard_students(rows, default_college=college, workers=options['workers'] or default_workers())
+        for row, message in result.errors:
+            self.stderr.write(f"Row {row}: {message}")
+        self.stdout.write(self.style.SUCCESS(f"Created {len(result.users)} student accounts"))
+
+        if result.users and not options['no_email']:
+            sent, failed = send_activation_emails(result.users, options['domain'], options['protocol'])
+            self.stdout.write(f"Emailed {sent} students" + (f", {failed} failed" if failed else ""))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from quizzes.importer import fail_stale_import_jobs, run_import_job
+from quizzes.models import QuestionImportJob
+
+
+class Command(BaseCommand):
+    help = 'Run queued question import jobs (e.g. ones left behind by a server restart) and fail stuck ones'
+
+    def handle(self, *args, **kwargs):
+        for job in fail_stale_import_jobs():
+            self.stdout.write(self.style.ERROR(f"Import into '{job.quiz.title}' stopped responding: {job.message}"))
+
+        jobs = QuestionImportJob.objects.filter(status=QuestionImportJob.QUEUED).select_related('quiz').order_by('created_at')
+        for job in jobs:
+            self.stdout.write(f"Importing {job.file.name} into '{job.quiz.title}'...")
+            job = run_import_job(job)
+            style = self.style.SUCCESS if job.status == QuestionImportJob.DONE else self.style.ERROR
+            self.stdout.write(style(job.message or job.get_status_display()))
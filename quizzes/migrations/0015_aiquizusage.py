@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+import django.db.models.deletion
+
+
+def seed_usage(apps, schema_editor):
+    """Count AI quizzes already created so the limit carries over."""
+    Quiz = apps.get_model('quizzes', 'Quiz')
+    AIQuizUsage = apps.get_model('quizzes', 'AIQuizUsage')
+
+    rows = (
+        Quiz.objects.filter(category__name="AI Generated", created_by__isnull=False, created_at__isnull=False)
+        .annotate(month=TruncMonth('created_at', output_field=models.DateField()))
+        .values('created_by', 'month')
+        .annotate(total=Count('id'))
+    )
+    AIQuizUsage.objects.bulk_create([
+        AIQuizUsage(user_id=row['created_by'], month=row['month'], count=row['total'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0014_alter_quiz_created_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIQuizUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ai_quiz_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'AI Quiz Usage',
+                'verbose_name_plural': 'AI Quiz Usage',
+                'unique_together': {('user', 'month')},
+            },
+        ),
+        migrations.RunPython(seed_usage, migrations.RunPython.noop),
+    ]
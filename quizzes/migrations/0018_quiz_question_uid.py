@@ -0,0 +1,48 @@
+import uuid
+
+from django.db import migrations, models
+
+
+def fill_uids(apps, schema_editor):
+    for name in ('Quiz', 'Question'):
+        model = apps.get_model('quizzes', name)
+        batch = []
+        for obj in model.objects.only('pk').iterator(chunk_size=2000):
+            obj.uid = uuid.uuid4()
+            batch.append(obj)
+            if len(batch) == 2000:
+                model.objects.bulk_update(batch, ['uid'])
+                batch = []
+        model.objects.bulk_update(batch, ['uid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0017_question_dedupe_index'),
+    ]
+
+    operations = [
+        # Add nullable, fill every existing row with its own value, then make it unique
+        migrations.AddField(
+            model_name='quiz',
+            name='uid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='uid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_uids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='quiz',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
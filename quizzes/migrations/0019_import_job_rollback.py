@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0018_quiz_question_uid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionimportjob',
+            name='first_question_id',
+            field=models.PositiveBigIntegerField(blank=True, help_text="The quiz's questions from this id on were added by the job (removed again if it fails)", null=True),
+        ),
+        migrations.AddField(
+            model_name='questionimportjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
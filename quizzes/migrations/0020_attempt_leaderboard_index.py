@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0019_import_job_rollback'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['quiz', '-score', 'finished_at', 'id'], name='quizzes_att_quiz_id_fb0e23_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0020_attempt_leaderboard_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='calendar_salt',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
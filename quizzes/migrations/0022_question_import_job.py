@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0021_profile_calendar_salt'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='questionimportjob',
+            name='first_question_id',
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='import_job',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_questions', to='quizzes.questionimportjob'),
+        ),
+    ]
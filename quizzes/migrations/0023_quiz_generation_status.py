@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0022_question_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='generation_status',
+            field=models.CharField(blank=True, choices=[('generating', 'Generating'), ('generated', 'Generated'), ('failed', 'Generation failed')], editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='generation_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0023_quiz_generation_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='activation_emailed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import User
-from django.db.models.signals import pre_save
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save
+from django.utils import timezone
 from django.dispatch import receiver
 import hashlib
+import uuid
 
 class College(models.Model):
     name = models.CharField(max_length=190, unique=True)
@@ -23,6 +26,10 @@ class Profile(models.Model):
     profile_pic = models.ImageField(upload_to='profiles/', blank=True, null=True)
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, blank=True, null=True)
     date_of_birth = models.DateField(blank=True, null=True)
+    # Mixed into the calendar feed token; changing it revokes old feed links (training/ics.py)
+    calendar_salt = models.CharField(max_length=32, blank=True, default='')
+    # Set when a bulk-onboarded student's activation email went out (quizzes/onboarding.py)
+    activation_emailed_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
@@ -117,10 +124,32 @@ class Quiz(models.Model):
     
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_quizzes')
     created_at = models.DateTimeField(auto_now_add=True, null=True)
+    # 🌍 Stable identity across environments (quiz bundles, see quizzes/bundles.py)
+    uid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+
+    # 🤖 AI generation progress (blank for quizzes written by hand, see quizzes/generation.py)
+    GENERATING = 'generating'
+    GENERATED = 'generated'
+    GENERATION_FAILED = 'failed'
+    GENERATION_STATUSES = [
+        (GENERATING, 'Generating'),
+        (GENERATED, 'Generated'),
+        (GENERATION_FAILED, 'Generation failed'),
+    ]
+    generation_status = models.CharField(max_length=20, choices=GENERATION_STATUSES, blank=True, editable=False)
+    generation_updated_at = models.DateTimeField(null=True, blank=True, editable=False)  # heartbeat while generating
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 🔐 Remember the coupon as loaded, so a save can tell if it changed without a query
+        if 'coupon_code' in field_names:
+            instance._loaded_coupon_code = instance.coupon_code
+        return instance
+
 
 class HackathonResult(Quiz):
     class Meta:
@@ -132,6 +161,10 @@ class HackathonResult(Quiz):
 class Question(models.Model):
     quiz = models.ForeignKey(Quiz, related_name='questions', on_delete=models.CASCADE)
     text = models.TextField()
+    uid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    # Set on questions a background import created, so a failed import removes exactly those
+    import_job = models.ForeignKey('QuestionImportJob', on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='created_questions', editable=False)
 
     def __str__(self):
         return self.text[:70]
@@ -156,6 +189,10 @@ class Attempt(models.Model):
     auto_submit_reason = models.CharField(max_length=255, blank=True, null=True)
     lifelines_used = models.JSONField(default=dict, blank=True)
 
+    class Meta:
+        # Leaderboard order (see quizzes/leaderboard.py)
+        indexes = [models.Index(fields=['quiz', '-score', 'finished_at', 'id'])]
+
     def __str__(self):
         return f"{self.user.username} - {self.quiz.title}"
 
@@ -181,24 +218,150 @@ class QuizAccessGrant(models.Model):
 
 
 
+class QuestionSignature(models.Model):
+    """MinHash signature of a question (text + choices) for near-duplicate detection. See quizzes/dedupe.py."""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    minhash = models.BinaryField()  # 64 little-endian uint32 values
+
+
+class QuestionBucket(models.Model):
+    """LSH bucket of one signature band; questions sharing a bucket are duplicate candidates."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='lsh_buckets')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['band', 'bucket'])]
+
+
+class QuestionImportJob(models.Model):
+    """An uploaded question spreadsheet, previewed by the admin and imported in the background."""
+    PREVIEW = 'preview'
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PREVIEW, 'Awaiting confirmation'),
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PREVIEW)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)
+    imported_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="First rejected rows: [row, message]")
+    message = models.TextField(blank=True)
+    skip_duplicates = models.BooleanField(default=True, help_text="Skip rows that nearly repeat a question already in the quiz or earlier in the file")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # heartbeat while running
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return f"Import into {self.quiz.title} ({self.get_status_display()})"
+
+    @property
+    def progress(self):
+        if self.status == self.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, int(self.processed_rows * 100 / self.total_rows))
+
+
+class AIQuizUsage(models.Model):
+    """
+    Per-user, per-month count of AI generated quizzes.
+    Slots are reserved with a conditional UPDATE before calling the AI,
+    so concurrent requests can never go past the monthly limit.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ai_quiz_usage')
+    month = models.DateField(help_text="First day of the month")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'month')
+        verbose_name = 'AI Quiz Usage'
+        verbose_name_plural = 'AI Quiz Usage'
+
+    def __str__(self):
+        return f"{self.user.username} - {self.month:%B %Y}: {self.count}"
+
+    @staticmethod
+    def current_month():
+        return timezone.now().date().replace(day=1)
+
+    @classmethod
+    def reserve(cls, user, limit):
+        """
+        Take one slot for this month. Returns the month reserved,
+        or None if the user has reached the limit.
+        """
+        month = cls.current_month()
+        updated = cls.objects.filter(user=user, month=month, count__lt=limit).update(count=F('count') + 1)
+        if updated:
+            return month
+
+        if cls.objects.filter(user=user, month=month).exists():
+            return None
+
+        # First AI quiz of the month
+        try:
+            with transaction.atomic():
+                cls.objects.create(user=user, month=month, count=1)
+            return month
+        except IntegrityError:
+            # Another request created the row first; race for a slot again
+            return cls.reserve(user, limit)
+
+    @classmethod
+    def release(cls, user, month):
+        """Give a reserved slot back (e.g. the AI failed to generate the quiz)."""
+        cls.objects.filter(user=user, month=month, count__gt=0).update(count=F('count') - 1)
+
+
 @receiver(pre_save, sender=Quiz)
-def reset_access_when_coupon_changes(sender, instance, **kwargs):
+def reset_access_when_coupon_changes(sender, instance, update_fields=None, **kwargs):
     """
     Automatically revoke access for all users if the coupon_code changes.
     """
     if not instance.pk:
         # If quiz is new, do nothing
         return
-
-    try:
-        old_quiz = Quiz.objects.get(pk=instance.pk)
-    except Quiz.DoesNotExist:
+    if update_fields is not None and 'coupon_code' not in update_fields:
         return
 
-    old_code = (old_quiz.coupon_code or '').strip().lower()
+    if hasattr(instance, '_loaded_coupon_code'):
+        # Compare with the value loaded from the DB (no extra SELECT)
+        old_coupon = instance._loaded_coupon_code
+    else:
+        # Built by hand or loaded without coupon_code: ask the DB
+        stored = list(Quiz.objects.filter(pk=instance.pk).values_list('coupon_code', flat=True))
+        if not stored:
+            return
+        old_coupon = stored[0]
+
+    old_code = (old_coupon or '').strip().lower()
     new_code = (instance.coupon_code or '').strip().lower()
 
     if old_code != new_code:
         # Coupon has changed! Revoke all user access for this quiz
         QuizAccessGrant.objects.filter(quiz=instance).delete()
         print(f"🔐 Coupon changed for '{instance.title}', all previous access revoked.")
+
+
+@receiver(post_save, sender=Quiz)
+def remember_saved_coupon(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'coupon_code' in update_fields:
+        instance._loaded_coupon_code = instance.coupon_code
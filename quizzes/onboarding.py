@@ -0,0 +1,265 @@
+"""
+Bulk student onboarding from a college roster (CSV or Excel).
+
+Columns: Email (required), Full Name, College, Password (all optional).
+Students without a password get a random one; they activate through the
+usual email link and can then use "Forgot password".
+
+Registering one by one costs a PBKDF2 hash, a User INSERT, two profile
+signal queries and an SMTP round trip per student. Here:
+
+* passwords are hashed in parallel across a small process pool when run
+  from the onboard_students command (PBKDF2 is pure CPU, so threads wouldn't
+  help); the admin page hashes inline and takes at most ADMIN_MAX_ROWS rows,
+  so a web worker never forks,
+* colleges are resolved in one query (missing ones are created in bulk),
+* User and Profile rows go in with bulk_create, which sends no post_save,
+  so create_user_profile/save_user_profile never run per row,
+* activation emails are queued and sent one by one over one SMTP
+  connection; Profile.activation_emailed_at records which ones went out.
+"""
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMessage
+from django.core.validators import validate_email
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from training.mailing import LazyConnection, send_and_mark
+
+from .importer import read_question_file
+from .models import College, Profile
+from .utils import bulk_create_with_pks
+
+ACTIVATION_FROM = 'gymforest.in@gmail.com'
+EMAIL_BATCH_SIZE = 50
+PARALLEL_HASH_MIN = 8  # below this a pool costs more than it saves
+MAX_HASH_WORKERS = 4   # leave the other cores to the web and database
+ADMIN_MAX_ROWS = 200   # larger rosters go through `manage.py onboard_students`
+
+
+class RosterError(ValueError):
+    pass
+
+
+class OnboardResult:
+    def __init__(self):
+        self.users = []
+        self.errors = []  # (spreadsheet row number, message)
+
+
+# -------------------------------------------------------------------
+#  ROSTER
+# -------------------------------------------------------------------
+def read_roster(file):
+    """[(row number, {'email', 'full_name', 'college', 'password'})] from an uploaded CSV/Excel file."""
+    df = read_question_file(file).rename(columns=lambda c: str(c).strip().lower().replace(' ', '_'))
+    if 'email' not in df.columns:
+        raise RosterError("Missing 'Email' column.")
+    for column in ('full_name', 'college', 'password'):
+        if column not in df.columns:
+            df[column] = ''
+    df = df[['email', 'full_name', 'college', 'password']].apply(lambda col: col.str.strip())
+    return [(number, row) for number, row in enumerate(df.to_dict('records'), start=2)]
+
+
+# -------------------------------------------------------------------
+#  PASSWORD HASHING
+# -------------------------------------------------------------------
+def _init_worker(settings_module):
+    # Spawned workers (Windows/macOS) start without Django configured
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def default_workers():
+    return max(1, min(os.cpu_count() or 1, MAX_HASH_WORKERS))
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    make_password() for each password; with workers > 1, spread over a
+    process pool of at most MAX_HASH_WORKERS. Only offline callers (the
+    management command) should ask for a pool.
+    """
+    workers = min(workers or 1, MAX_HASH_WORKERS)
+    if workers == 1 or len(passwords) < PARALLEL_HASH_MIN:
+        return [make_password(p) for p in passwords]
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(os.environ.get('DJANGO_SETTINGS_MODULE'),)
+    ) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+# -------------------------------------------------------------------
+#  ONBOARDING
+# -------------------------------------------------------------------
+def _resolve_colleges(names):
+    """{name: College} for every name, creating the missing ones in bulk."""
+    names = {n for n in names if n}
+    colleges = {c.name: c for c in College.objects.filter(name__in=names)}
+    missing = names - colleges.keys()
+    if missing:
+        College.objects.bulk_create([College(name=n) for n in missing], ignore_conflicts=True)
+        colleges.update({c.name: c for c in College.objects.filter(name__in=missing)})
+    return colleges
+
+
+def _split_name(full_name):
+    # Same split as the registration form
+    if " " in full_name:
+        return full_name.split(" ", 1)
+    return full_name, ""
+
+
+def _taken(emails):
+    """Lower-cased emails among `emails` already used as a username or email."""
+    taken = set()
+    for email, username in (
+        User.objects.annotate(email_lower=Lower('email'), username_lower=Lower('username'))
+        .filter(Q(email_lower__in=emails) | Q(username_lower__in=emails))
+        .values_list('email_lower', 'username_lower')
+    ):
+        taken |= {email, username}
+    return taken & set(emails)
+
+
+def onboard_students(rows, default_college=None, workers=1):
+    """
+    Create inactive accounts (username = email, like registration) for the
+    roster rows. Rows with a bad or already registered email are reported in
+    `errors` and skipped, including emails someone registered while the
+    passwords were being hashed.
+    """
+    result = OnboardResult()
+    taken = _taken({row['email'].lower() for _, row in rows if row['email']})
+
+    accepted, seen = [], set()
+    for number, row in rows:
+        email = row['email']
+        if not email:
+            result.errors.append((number, "Missing email."))
+            continue
+        try:
+            validate_email(email)
+        except ValidationError:
+            result.errors.append((number, f"{email} is not a valid email."))
+            continue
+        if email.lower() in taken:
+            result.errors.append((number, f"{email} is already registered."))
+            continue
+        if email.lower() in seen:
+            result.errors.append((number, f"{email} appears more than once."))
+            continue
+        seen.add(email.lower())
+        accepted.append((number, row))
+    if not accepted:
+        return result
+
+    # The slow part, done before the transaction so no locks are held meanwhile
+    hashes = hash_passwords([row['password'] or secrets.token_urlsafe(16) for _, row in accepted], workers=workers)
+    colleges = _resolve_colleges(row['college'] for _, row in accepted)
+    pending = list(zip(accepted, hashes))
+
+    for retry in (True, False):
+        try:
+            users = _create_accounts(pending, colleges, default_college)
+            break
+        except IntegrityError:
+            # Someone registered one of these emails since the check above
+            raced = _taken({row['email'].lower() for (_, row), _ in pending})
+            if not retry or not raced:
+                result.errors.extend(
+                    (number, f"{row['email']} could not be created, please try again.") for (number, row), _ in pending
+                )
+                return result
+            result.errors.extend(
+                (number, f"{row['email']} is already registered.")
+                for (number, row), _ in pending if row['email'].lower() in raced
+            )
+            pending = [item for item in pending if item[0][1]['email'].lower() not in raced]
+            if not pending:
+                return result
+
+    # bulk_create skips post_save: clear any cached entitlements left under a reused id
+    from training.entitlements import invalidate_entitlements
+    invalidate_entitlements(*[u.pk for u in users])
+
+    result.errors.sort()
+    result.users = users
+    return result
+
+
+@transaction.atomic
+def _create_accounts(pending, colleges, default_college):
+    """Insert the users and their profiles for [((row number, row), password hash)]."""
+    users = []
+    for (_, row), password in pending:
+        first, last = _split_name(row['full_name'])
+        users.append(User(
+            username=row['email'], email=row['email'], first_name=first[:150], last_name=last[:150],
+            password=password, is_active=False,  # Deactivate until verified
+        ))
+    users = bulk_create_with_pks(users, key='username')
+    Profile.objects.bulk_create([
+        Profile(user=user, college=colleges.get(row['college']) or default_college)
+        for user, ((_, row), _) in zip(users, pending)
+    ])
+    return users
+
+
+# -------------------------------------------------------------------
+#  ACTIVATION EMAILS
+# -------------------------------------------------------------------
+def activation_email(user, domain, protocol='https', connection=None):
+    message = render_to_string('quizzes/acc_active_email.html', {
+        'user': user,
+        'domain': domain,
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': default_token_generator.make_token(user),
+        'protocol': protocol,
+    })
+    return EmailMessage('Activate your account.', message, ACTIVATION_FROM, [user.email], connection=connection)
+
+
+def send_activation_emails(users, domain, protocol='https', batch_size=EMAIL_BATCH_SIZE):
+    """
+    Send each activation email over one SMTP connection and set the profile's
+    activation_emailed_at for those that went out, one UPDATE per
+    `batch_size` students. Returns (sent, failed).
+    """
+    mail = LazyConnection()
+    now = timezone.now()
+    try:
+        sent, refused, failed, _ = send_and_mark(
+            users, lambda u: activation_email(u, domain, protocol),
+            lambda ids: Profile.objects.filter(user_id__in=ids).update(activation_emailed_at=now),
+            mail, batch_size, mark_refused=False,
+        )
+    finally:
+        mail.close()
+    return sent, refused + failed
+
+
+def queue_activation_emails(users, domain, protocol='https'):
+    """Send the activation emails from a background thread so the admin page returns at once."""
+    def work():
+        try:
+            send_activation_emails(users, domain, protocol)
+        finally:
+            connection.close()
+
+    threading.Thread(target=work, daemon=True).start()
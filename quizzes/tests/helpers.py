@@ -0,0 +1,33 @@
+"""Helpers shared by the test suites (training/tests.py uses them too)."""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class ChangelistQueryBudgetMixin:
+    """
+    For TestCase classes checking that an admin changelist costs the same
+    number of queries for 1 row or many.
+
+    Override add_rows(n) to add n rows (with their related objects) to every
+    changelist under test; self.count keeps their names unique.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        self.count = 0
+
+    def queries_for(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant(self, url_name):
+        url = reverse(url_name)
+        self.add_rows(1)
+        self.client.get(url)  # warm the per-user entitlement cache
+        one_row = self.queries_for(url)
+        self.add_rows(5)
+        self.assertEqual(self.queries_for(url), one_row)
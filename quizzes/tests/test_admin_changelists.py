@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from quizzes.tests.helpers import ChangelistQueryBudgetMixin
+from quizzes.models import Attempt, College, Quiz
+
+
+class ChangelistQueryBudgetTest(ChangelistQueryBudgetMixin, TestCase):
+    """A changelist page costs the same number of queries for 1 row or many."""
+    def setUp(self):
+        super().setUp()
+        self.college = College.objects.create(name="IIT")
+
+    def add_rows(self, n):
+        for _ in range(n):
+            self.count += 1
+            user = User.objects.create(username=f"student{self.count}")
+            user.profile.college = self.college
+            user.profile.save()
+            quiz = Quiz.objects.create(title=f"Hackathon {self.count}", quiz_type=Quiz.HACKATHON)
+            Attempt.objects.create(user=user, quiz=quiz, score=1, finished_at=timezone.now())
+
+    def test_attempt_changelist(self):
+        self.assert_constant('admin:quizzes_attempt_changelist')
+
+    def test_hackathon_result_changelist(self):
+        self.assert_constant('admin:quizzes_hackathonresult_changelist')
+
+    def test_participant_count_annotation(self):
+        self.add_rows(1)
+        response = self.client.get(reverse('admin:quizzes_hackathonresult_changelist'))
+        self.assertEqual(response.context['cl'].result_list[0].participant_count, 1)
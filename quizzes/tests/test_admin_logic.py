@@ -1,3 +1,4 @@
+from django.contrib import admin
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -7,7 +8,7 @@ from quizzes.admin import AttemptAdmin
 class AttemptAdminTest(TestCase):
     def test_attempt_admin_configuration(self):
         # Verify list_filter and ordering
-        self.assertIn('user__profile__college', AttemptAdmin.list_filter)
+        self.assertIn(('user__profile__college', admin.RelatedOnlyFieldListFilter), AttemptAdmin.list_filter)
         self.assertEqual(AttemptAdmin.ordering, ('-score', 'finished_at'))
 
     def test_attempt_sorting_logic(self):
@@ -0,0 +1,46 @@
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+from quizzes.ai import AIUnavailable, CircuitBreaker
+
+
+class CircuitBreakerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=2, cooldown=0.2)
+
+    def provider_error(self):
+        raise RuntimeError("timeout")
+
+    def test_trips_open_after_failures(self):
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                self.breaker.call(self.provider_error)
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        # Open breaker fails fast without calling the provider
+        with self.assertRaises(AIUnavailable):
+            self.breaker.call(lambda: self.fail("provider should not be called"))
+
+    def test_half_open_probe_closes_on_success(self):
+        self.breaker.trip()
+        time.sleep(0.25)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+        self.assertEqual(self.breaker.call(lambda: "ok"), "ok")
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_probe_reopens_on_failure(self):
+        self.breaker.trip()
+        time.sleep(0.25)
+
+        with self.assertRaises(RuntimeError):
+            self.breaker.call(self.provider_error)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker('slow', failure_rate=0.5, min_calls=2, slow_call_seconds=0)
+        breaker.call(lambda: "slow")
+        breaker.call(lambda: "slow")
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
@@ -0,0 +1,157 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from quizzes.ai import AIUnavailable, breaker
+from quizzes.generation import QuizGeneration, QuizStreamParser, fail_stale_generations
+from quizzes.models import AIQuizUsage, Quiz
+
+QUIZ_JSON = json.dumps({
+    "title": "Braces {and} \"quotes\"",
+    "questions": [
+        {"text": "Which is a dict literal: {}?", "choices": [
+            {"text": "{}", "is_correct": True},
+            {"text": "[]", "is_correct": False},
+        ]},
+        {"text": "What does \\n mean?", "choices": [
+            {"text": "Newline", "is_correct": True},
+            {"text": "Nothing", "is_correct": False},
+        ]},
+    ]
+})
+
+
+def chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class QuizStreamParserTest(TestCase):
+    def test_questions_are_emitted_as_they_close(self):
+        parser = QuizStreamParser()
+        emitted = []
+        for piece in chunks(QUIZ_JSON, 7):
+            emitted.extend(parser.feed(piece))
+
+        self.assertEqual(emitted, json.loads(QUIZ_JSON)['questions'])
+        self.assertEqual(parser.fields['title'], 'Braces {and} "quotes"')
+
+    def test_first_question_available_before_stream_ends(self):
+        parser = QuizStreamParser()
+        first_close = QUIZ_JSON.index('"is_correct": false}]}') + len('"is_correct": false}]}')
+        self.assertEqual(len(parser.feed(QUIZ_JSON[:first_close])), 1)
+
+    def test_rejection_error_field(self):
+        parser = QuizStreamParser()
+        parser.feed('{ "error": "Please choose an educational topic." }')
+        self.assertEqual(parser.fields['error'], "Please choose an educational topic.")
+
+
+class QuizGenerationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='student', email='student@example.com')
+
+    def run_generation(self, stream, generation=None):
+        generation = generation or QuizGeneration(self.user, "python", 2, "Beginner", site_url="http://testserver")
+        with mock.patch.object(QuizGeneration, 'stream_text', return_value=iter(stream)):
+            generation.run()
+        return generation
+
+    def test_questions_are_saved(self):
+        generation = self.run_generation(chunks(QUIZ_JSON, 5))
+
+        self.assertTrue(generation.ready.is_set())
+        quiz = Quiz.objects.get(pk=generation.quiz.pk)
+        self.assertEqual(quiz.title, "Python")
+        self.assertEqual(quiz.questions.count(), 2)
+        self.assertEqual(quiz.questions.first().choices.filter(is_correct=True).get().text, "{}")
+        self.assertEqual(quiz.generation_status, Quiz.GENERATED)
+
+    def test_rejected_topic_creates_nothing(self):
+        generation = self.run_generation(['{"error": "No thanks."}'])
+
+        self.assertTrue(generation.rejected)
+        self.assertEqual(generation.error, "No thanks.")
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_wait_returns_the_quiz(self):
+        generation = self.run_generation(chunks(QUIZ_JSON, 5))
+        self.assertEqual(generation.wait(timeout=0), generation.quiz)
+        self.assertFalse(generation.cancelled)
+
+    def test_timed_out_generation_is_cancelled(self):
+        month = AIQuizUsage.reserve(self.user, 3)
+        generation = QuizGeneration(self.user, "python", 2, "Beginner", site_url="http://testserver",
+                                    reserved_month=month)
+        # The view stops waiting before the model has finished a question
+        self.assertIsNone(generation.wait(timeout=0))
+        self.run_generation(chunks(QUIZ_JSON, 5), generation)
+
+        self.assertFalse(Quiz.objects.exists())
+        self.assertEqual(AIQuizUsage.objects.get(user=self.user).count, 0)  # quota handed back
+        self.assertTrue(generation.ready.is_set())
+
+    def test_cancel_between_chunks_stops_before_the_first_question(self):
+        generation = QuizGeneration(self.user, "python", 2, "Beginner", site_url="http://testserver")
+        first_close = QUIZ_JSON.index('"is_correct": false}]}') + len('"is_correct": false}]}')
+
+        def stream():
+            yield QUIZ_JSON[:first_close - 1]
+            generation.wait(timeout=0)  # times out while the first question is still open
+            yield QUIZ_JSON[first_close - 1:]
+
+        self.run_generation(stream(), generation)
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_provider_error_mid_stream_marks_the_quiz_failed(self):
+        first_close = QUIZ_JSON.index('"is_correct": false}]}') + len('"is_correct": false}]}')
+
+        def stream():
+            yield QUIZ_JSON[:first_close]
+            raise RuntimeError("connection reset")
+
+        with self.assertLogs('quizzes.generation', 'ERROR'):
+            generation = self.run_generation(stream())
+
+        quiz = Quiz.objects.get(pk=generation.quiz.pk)
+        self.assertEqual(quiz.generation_status, Quiz.GENERATION_FAILED)
+        self.assertEqual(quiz.questions.count(), 1)
+        self.assertEqual(mail.outbox, [])  # no "your quiz is ready" for half a quiz
+
+    def test_stale_generation_is_failed(self):
+        quiz = Quiz.objects.create(title="Python", generation_status=Quiz.GENERATING,
+                                   generation_updated_at=timezone.now() - timedelta(minutes=10))
+        fresh = Quiz.objects.create(title="Django", generation_status=Quiz.GENERATING,
+                                    generation_updated_at=timezone.now())
+
+        self.assertEqual(fail_stale_generations(timeout=60), 1)
+        quiz.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(quiz.generation_status, Quiz.GENERATION_FAILED)
+        self.assertEqual(fresh.generation_status, Quiz.GENERATING)
+
+
+class GenerationBreakerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.generation = QuizGeneration(None, "python", 2, "Beginner", site_url="http://testserver")
+
+    def test_open_breaker_skips_the_provider(self):
+        breaker.trip()
+        with mock.patch('quizzes.generation.get_client') as get_client:
+            with self.assertRaises(AIUnavailable):
+                list(self.generation.stream_text())
+        get_client.assert_not_called()
+
+    def test_provider_errors_count_against_the_breaker(self):
+        with mock.patch('quizzes.generation.get_client') as get_client, \
+                mock.patch.object(breaker, 'record_failure') as record_failure:
+            get_client.return_value.chat.completions.create.side_effect = RuntimeError("timeout")
+            with self.assertRaises(RuntimeError):
+                list(self.generation.stream_text())
+        record_failure.assert_called_once_with(breaker.CLOSED)
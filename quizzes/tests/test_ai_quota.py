@@ -0,0 +1,35 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from quizzes.generation import QuizGeneration
+from quizzes.models import AIQuizUsage
+
+
+class AIQuizUsageTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='student')
+
+    def test_reserve_stops_at_limit(self):
+        months = [AIQuizUsage.reserve(self.user, 3) for _ in range(4)]
+
+        self.assertEqual(months[:3], [AIQuizUsage.current_month()] * 3)
+        self.assertIsNone(months[3])
+        self.assertEqual(AIQuizUsage.objects.get(user=self.user).count, 3)
+
+    def test_release_frees_a_slot(self):
+        for _ in range(3):
+            month = AIQuizUsage.reserve(self.user, 3)
+        AIQuizUsage.release(self.user, month)
+
+        self.assertIsNotNone(AIQuizUsage.reserve(self.user, 3))
+
+    def test_failed_generation_gives_slot_back(self):
+        month = AIQuizUsage.reserve(self.user, 3)
+        generation = QuizGeneration(self.user, "python", 5, "Beginner", "http://testserver", reserved_month=month)
+
+        with mock.patch.object(QuizGeneration, 'stream_text', side_effect=RuntimeError("provider down")):
+            generation.run()
+
+        self.assertIsNone(generation.quiz)
+        self.assertEqual(AIQuizUsage.objects.get(user=self.user).count, 0)
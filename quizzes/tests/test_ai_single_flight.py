@@ -0,0 +1,124 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from quizzes.ai import AIUnavailable, chat_completion, prompt_key, single_flight, store_answer, stream_chat_completion
+
+
+class SingleFlightTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_prompt_key_ignores_whitespace(self):
+        a = prompt_key("gpt-4o", [{"role": "user", "content": "  What is\n   Python? "}])
+        b = prompt_key("gpt-4o", [{"role": "user", "content": "What is Python?"}])
+        self.assertEqual(a, b)
+
+    def test_concurrent_callers_share_one_call(self):
+        calls = []
+        results = []
+
+        def provider():
+            calls.append(1)
+            time.sleep(0.2)
+            return "explanation"
+
+        threads = [
+            threading.Thread(target=lambda: results.append(single_flight("same-key", provider)))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["explanation"] * 8)
+
+    def test_waiting_callers_see_leader_error(self):
+        def provider():
+            time.sleep(0.1)
+            raise RuntimeError("provider down")
+
+        errors = []
+
+        def call():
+            try:
+                single_flight("failing-key", provider)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, ["provider down"] * 3)
+
+    @override_settings(AI_REQUEST_TIMEOUT=0.1)
+    def test_waiters_give_up_after_the_request_timeout(self):
+        messages = [{"role": "user", "content": "What is Python?"}]
+        key = prompt_key("gpt-4o", messages)
+        leader_started, release = threading.Event(), threading.Event()
+
+        def slow_provider():
+            leader_started.set()
+            release.wait(5)
+            return "late"
+
+        leader = threading.Thread(target=lambda: single_flight(key, slow_provider))
+        leader.start()
+        self.addCleanup(leader.join)
+        self.addCleanup(release.set)
+        leader_started.wait(5)
+
+        with self.assertRaises(AIUnavailable):
+            single_flight(key, lambda: self.fail("waiters must not call the provider"))
+        # chat_completion() answers with the last good reply instead
+        store_answer(key, "cached explanation")
+        self.assertEqual(chat_completion(messages), "cached explanation")
+
+
+def fake_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+@override_settings(AI_SINGLE_FLIGHT_POLL_INTERVAL=0.02)
+class StreamSingleFlightTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_streams_share_one_call(self):
+        calls = []
+        leader_started = threading.Event()
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            leader_started.set()
+            for piece in ["Two", " plus", " two"]:
+                time.sleep(0.05)
+                yield fake_chunk(piece)
+
+        client = mock.Mock()
+        client.chat.completions.create.side_effect = create
+        messages = [{"role": "user", "content": "Explain 2 + 2"}]
+        results = {}
+
+        def consume(name):
+            results[name] = ''.join(stream_chat_completion(messages))
+
+        with mock.patch('quizzes.ai.get_client', return_value=client):
+            leader = threading.Thread(target=consume, args=("leader",))
+            leader.start()
+            leader_started.wait(1)
+            follower = threading.Thread(target=consume, args=("follower",))
+            follower.start()
+            leader.join()
+            follower.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, {"leader": "Two plus two", "follower": "Two plus two"})
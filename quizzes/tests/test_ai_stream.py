@@ -0,0 +1,32 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from quizzes.ai import AIUnavailable
+from quizzes.models import Quiz, Question, Choice
+
+
+class AskAIStreamTest(TestCase):
+    def setUp(self):
+        quiz = Quiz.objects.create(title="Python Basics")
+        self.question = Question.objects.create(quiz=quiz, text="What is 2 + 2?")
+        Choice.objects.create(question=self.question, text="4", is_correct=True)
+
+    def get_stream(self):
+        response = self.client.get(reverse('ask_ai_stream'), {'question_id': self.question.id, 'user_answer': '5'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return b''.join(response.streaming_content).decode()
+
+    def test_tokens_are_relayed_as_events(self):
+        with mock.patch('quizzes.views.stream_chat_completion', return_value=iter(["Two", " plus two"])):
+            body = self.get_stream()
+
+        self.assertIn('event: token\ndata: {"text": "Two"}\n\n', body)
+        self.assertIn('event: token\ndata: {"text": " plus two"}\n\n', body)
+        self.assertTrue(body.endswith('event: done\ndata: {}\n\n'))
+
+    def test_open_breaker_sends_degraded_notice(self):
+        with mock.patch('quizzes.views.stream_chat_completion', side_effect=AIUnavailable):
+            body = self.get_stream()
+
+        self.assertIn('"degraded": true', body)
@@ -0,0 +1,38 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import TestCase
+from quizzes.models import Quiz, Question
+from quizzes.utils import bulk_create_with_pks
+
+
+class BulkCreateWithPksTest(TestCase):
+    """Without RETURNING (MySQL) the new ids are read back by a unique key, not by id order."""
+    def setUp(self):
+        self.quiz = Quiz.objects.create(title="Busy Quiz")
+        no_returning = mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert',
+                                         new_callable=mock.PropertyMock, return_value=False)
+        no_returning.start()
+        self.addCleanup(no_returning.stop)
+
+    def test_concurrent_insert_into_the_same_quiz(self):
+        real_bulk_create = QuerySet.bulk_create
+
+        def bulk_create_racing_another_writer(queryset, objs, *args, **kwargs):
+            Question.objects.create(quiz=self.quiz, text="From the editor")
+            created = real_bulk_create(queryset, objs, *args, **kwargs)
+            Question.objects.create(quiz=self.quiz, text="From AI generation")
+            return created
+
+        questions = [Question(quiz=self.quiz, text=f"Imported {i}") for i in range(3)]
+        with mock.patch.object(QuerySet, 'bulk_create', bulk_create_racing_another_writer):
+            created = bulk_create_with_pks(questions)
+
+        self.assertEqual([Question.objects.get(pk=q.pk).text for q in created], ["Imported 0", "Imported 1", "Imported 2"])
+        self.assertFalse(any(q._state.adding for q in created))
+
+    def test_users_by_username(self):
+        users = bulk_create_with_pks([User(username=name) for name in ("ada", "alan")], key='username')
+        self.assertEqual([User.objects.get(pk=u.pk).username for u in users], ["ada", "alan"])
@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from quizzes.models import Quiz, QuizAccessGrant
+
+
+class CouponChangeTest(TestCase):
+    def setUp(self):
+        quiz = Quiz.objects.create(title="Hack Day", quiz_type=Quiz.HACKATHON, coupon_code="HACK24")
+        QuizAccessGrant.objects.create(quiz=quiz, user=User.objects.create(username="student"))
+        self.quiz = Quiz.objects.get(pk=quiz.pk)
+
+    def test_save_without_coupon_change_does_no_select(self):
+        self.quiz.is_active = False
+        self.quiz.coupon_code = " hack24 "  # Same code, different case/spacing
+        with self.assertNumQueries(1):  # Just the UPDATE
+            self.quiz.save()
+        self.assertTrue(QuizAccessGrant.objects.exists())
+
+    def test_coupon_change_revokes_access(self):
+        self.quiz.coupon_code = "HACK25"
+        self.quiz.save()
+        self.assertFalse(QuizAccessGrant.objects.exists())
+
+    def test_snapshot_follows_saves(self):
+        self.quiz.coupon_code = "HACK25"
+        self.quiz.save()
+        QuizAccessGrant.objects.create(quiz=self.quiz, user=User.objects.create(username="late"))
+        self.quiz.save()  # Still HACK25: nothing to revoke
+        self.assertTrue(QuizAccessGrant.objects.exists())
+
+    def test_instance_built_by_hand_falls_back_to_db(self):
+        quiz = Quiz(pk=self.quiz.pk, title="Hack Day", quiz_type=Quiz.HACKATHON, coupon_code="OTHER")
+        quiz.save()
+        self.assertFalse(QuizAccessGrant.objects.exists())
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from quizzes import importer
+from quizzes.importer import fail_stale_import_jobs, iter_question_chunks, preview_import, run_import_job
+from quizzes.models import Quiz, Question, QuestionImportJob
+
+CSV = (
+    "Question,Option A,Option B,Correct Answer\n"
+    "Capital of France?,Paris,Rome,A\n"
+    "No answer?,a,b,Z\n"
+    "2 + 2?,3,4,4\n"
+)
+
+
+class QuestionImportJobTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.quiz = Quiz.objects.create(title="Imported Quiz")
+        self.job = QuestionImportJob.objects.create(quiz=self.quiz)
+        self.job.file.save('questions.csv', ContentFile(CSV.encode()))
+
+    def test_chunks_keep_spreadsheet_row_numbers(self):
+        chunks = list(iter_question_chunks(self.job.file.path, chunk_size=2))
+        self.assertEqual([(first_row, len(df)) for first_row, df in chunks], [(2, 2), (4, 1)])
+
+    def test_preview_saves_nothing(self):
+        preview, errors = preview_import(self.job.file.path)
+
+        self.assertEqual([q['text'] for q in preview], ["Capital of France?", "2 + 2?"])
+        self.assertEqual(preview[0]['choices'], [("Paris", True), ("Rome", False)])
+        self.assertEqual(errors, [(3, "Correct Answer doesn't match any option.")])
+        self.assertFalse(Question.objects.exists())
+
+    def test_queued_job_imports_in_chunks(self):
+        self.job.status = QuestionImportJob.QUEUED
+        self.job.save()
+
+        job = run_import_job(self.job, chunk_size=2)
+
+        self.assertEqual(job.status, QuestionImportJob.DONE)
+        self.assertEqual((job.total_rows, job.processed_rows, job.imported_count, job.error_count), (3, 3, 2, 1))
+        self.assertEqual(job.errors, [[3, "Correct Answer doesn't match any option."]])
+        self.assertEqual(self.quiz.questions.count(), 2)
+        self.assertFalse(job.file)
+        self.assertEqual(os.listdir(os.path.join(self.media, 'imports')), [])
+
+    def test_failed_chunk_rolls_back_earlier_chunks(self):
+        self.job.status = QuestionImportJob.QUEUED
+        self.job.save()
+        real_import = importer.import_questions
+        calls = []
+
+        def flaky_import(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("database went away")
+            return real_import(*args, **kwargs)
+
+        with mock.patch('quizzes.importer.import_questions', side_effect=flaky_import):
+            job = run_import_job(self.job, chunk_size=2)
+
+        self.assertEqual(job.status, QuestionImportJob.FAILED)
+        self.assertIn("Removed the 1 questions", job.message)
+        self.assertFalse(self.quiz.questions.exists())
+        self.assertFalse(job.file)
+
+    def test_rollback_keeps_questions_added_by_others(self):
+        self.job.status = QuestionImportJob.QUEUED
+        self.job.save()
+        real_import = importer.import_questions
+        calls = []
+
+        def import_while_someone_edits(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                # e.g. the question editor or AI generation writing to the same quiz mid-import
+                Question.objects.create(quiz=self.quiz, text="Added in the editor")
+                raise RuntimeError("database went away")
+            return real_import(*args, **kwargs)
+
+        with mock.patch('quizzes.importer.import_questions', side_effect=import_while_someone_edits):
+            job = run_import_job(self.job, chunk_size=2)
+
+        self.assertEqual(job.status, QuestionImportJob.FAILED)
+        self.assertEqual(list(self.quiz.questions.values_list('text', flat=True)), ["Added in the editor"])
+
+    def test_stale_running_job_is_failed(self):
+        Question.objects.create(quiz=self.quiz, text="Already there")
+        QuestionImportJob.objects.filter(pk=self.job.pk).update(
+            status=QuestionImportJob.RUNNING, updated_at=timezone.now() - timedelta(hours=1),
+        )
+        Question.objects.create(quiz=self.quiz, text="Half imported", import_job=self.job)
+
+        failed = fail_stale_import_jobs(timeout=60)
+
+        self.assertEqual([job.pk for job in failed], [self.job.pk])
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, QuestionImportJob.FAILED)
+        self.assertEqual(list(self.quiz.questions.values_list('text', flat=True)), ["Already there"])
+        self.assertEqual(fail_stale_import_jobs(timeout=60), [])
+
+    def test_job_is_only_run_once(self):
+        # Still awaiting confirmation: nothing to claim
+        run_import_job(self.job)
+        self.assertFalse(Question.objects.exists())
+
+    def test_status_endpoint(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:quiz-import-status', args=[self.quiz.id, self.job.id]))
+        self.assertEqual(response.json()['status'], QuestionImportJob.PREVIEW)
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from quizzes.leaderboard import leaderboard_page, leaderboard_stats
+from quizzes.models import Quiz, Question, Attempt, College
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        self.quiz = Quiz.objects.create(title="Hack Day", quiz_type=Quiz.HACKATHON)
+        for i in range(4):
+            Question.objects.create(quiz=self.quiz, text=f"Q{i}")
+        college = College.objects.create(name="IIT")
+        start = timezone.now() - timedelta(hours=1)
+        # (score, minutes taken); equal scores are ranked by submit time
+        for i, (score, minutes) in enumerate([(2, 10), (4, 30), (2, 5), (3, 20)]):
+            user = User.objects.create(username=f"student{i}")
+            user.profile.college = college
+            user.profile.save()
+            attempt = Attempt.objects.create(user=user, quiz=self.quiz, score=score,
+                                             finished_at=start + timedelta(minutes=minutes))
+            Attempt.objects.filter(pk=attempt.pk).update(created_at=start)
+        Attempt.objects.create(user=User.objects.create(username="unfinished"), quiz=self.quiz)
+
+    def test_rank_percentage_and_time_from_sql(self):
+        rows = leaderboard_page(self.quiz)
+
+        self.assertEqual([(r.rank, r.user.username) for r in rows],
+                         [(1, "student1"), (2, "student3"), (3, "student2"), (4, "student0")])
+        self.assertEqual(rows[0].percentage, 100.0)
+        self.assertEqual(rows[2].time_taken, timedelta(minutes=5))
+        self.assertEqual(rows[0].college_name, "IIT")
+
+    def test_keyset_pages_keep_global_rank(self):
+        ranked = leaderboard_page(self.quiz, max_score=4)
+        # cursor lookup, COUNT of rows ahead, page
+        with self.assertNumQueries(3):
+            page = leaderboard_page(self.quiz, after=ranked[1].pk, page_size=1, max_score=4)
+        self.assertEqual([(r.rank, r.user.username) for r in page], [(3, "student2")])
+        page = leaderboard_page(self.quiz, before=ranked[3].pk, page_size=2, max_score=4)
+        self.assertEqual([(r.rank, r.user.username) for r in page], [(2, "student3"), (3, "student2")])
+        self.assertEqual([r.rank for r in leaderboard_page(self.quiz, before=ranked[1].pk, max_score=4)], [1])
+        self.assertEqual([r.rank for r in leaderboard_page(self.quiz, after=ranked[3].pk)], [])
+        # An unknown cursor falls back to the first page
+        self.assertEqual(leaderboard_page(self.quiz, after=0, page_size=1)[0].rank, 1)
+
+    def test_keyset_filter_breaks_ties(self):
+        tie = Attempt.objects.filter(quiz=self.quiz, score=2).order_by('finished_at').first()
+        twin = Attempt.objects.create(user=User.objects.create(username="twin"), quiz=self.quiz, score=2,
+                                      finished_at=tie.finished_at)
+        page = leaderboard_page(self.quiz, after=tie.pk, page_size=1)
+        self.assertEqual([(r.rank, r.pk) for r in page], [(4, twin.pk)])
+
+    def test_stats_in_one_query(self):
+        with self.assertNumQueries(1):
+            stats = leaderboard_stats(self.quiz)
+        self.assertEqual(stats, {'total_participants': 5, 'completed_count': 4, 'avg_score': 2.8})
+
+    def test_dashboard_query_count_does_not_grow_with_participants(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin)
+        url = reverse('admin:quizzes_hackathonresult_change', args=[self.quiz.id])
+        response = self.client.get(url)
+        self.assertContains(response, "student1")
+
+        base = len(self.captured(url))
+        finished = timezone.now()
+        for i in range(10):
+            Attempt.objects.create(user=User.objects.create(username=f"late{i}"), quiz=self.quiz, score=1, finished_at=finished)
+        self.assertEqual(len(self.captured(url)), base)
+
+    def captured(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return queries
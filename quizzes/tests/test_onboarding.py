@@ -0,0 +1,129 @@
+import io
+import smtplib
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from quizzes.models import College, Profile
+from quizzes import onboarding
+from quizzes.onboarding import RosterError, hash_passwords, onboard_students, read_roster, send_activation_emails
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """Fails for the addresses in `refuse`."""
+    refuse = {}
+
+    def send_messages(self, messages):
+        for message in messages:
+            error = self.refuse.get(message.to[0])
+            if error is not None:
+                raise error
+        return super().send_messages(messages)
+
+
+def roster(text, name='students.csv'):
+    fh = io.BytesIO(text.encode())
+    fh.name = name
+    return read_roster(fh)
+
+
+class OnboardingTest(TestCase):
+    def setUp(self):
+        self.college = College.objects.create(name="IIT Madras")
+        User.objects.create_user('taken@example.com', 'taken@example.com', 'pass')
+
+    def test_onboard_students(self):
+        rows = roster(
+            "Email,Full Name,College,Password\n"
+            "ada@example.com,Ada Lovelace,IIT Madras,secret123\n"
+            "alan@example.com,Alan,NIT Trichy,\n"
+            "TAKEN@example.com,Someone,,\n"
+            "ada@example.com,Ada Again,,\n"
+            "not-an-email,Nobody,,\n"
+            ",Blank,,\n"
+        )
+        # existing users, colleges, missing college INSERT + re-read,
+        # savepoint, User INSERT, Profile INSERT, release
+        with self.assertNumQueries(8):
+            result = onboard_students(rows, workers=1)
+
+        self.assertEqual([u.email for u in result.users], ['ada@example.com', 'alan@example.com'])
+        self.assertEqual([row for row, _ in result.errors], [4, 5, 6, 7])
+
+        ada = User.objects.get(username='ada@example.com')
+        self.assertFalse(ada.is_active)
+        self.assertEqual((ada.first_name, ada.last_name), ('Ada', 'Lovelace'))
+        self.assertTrue(ada.check_password('secret123'))
+        self.assertEqual(ada.profile.college, self.college)
+        self.assertEqual(Profile.objects.get(user__username='alan@example.com').college.name, "NIT Trichy")
+
+    def test_default_college(self):
+        result = onboard_students(roster("email\nada@example.com\n"), default_college=self.college, workers=1)
+        self.assertEqual(result.users[0].profile.college, self.college)
+
+    def test_parallel_hashing(self):
+        passwords = [f'password{i}' for i in range(10)]
+        hashes = hash_passwords(passwords, workers=2)
+        self.assertTrue(all(check_password(p, h) for p, h in zip(passwords, hashes)))
+
+    def test_registration_racing_the_import_is_reported(self):
+        real_hash = onboarding.hash_passwords
+
+        def hash_while_someone_registers(passwords, workers=1):
+            User.objects.create_user('ada@example.com', 'ada@example.com', 'pass')
+            return real_hash(passwords, workers)
+
+        with mock.patch('quizzes.onboarding.hash_passwords', hash_while_someone_registers):
+            result = onboard_students(roster("email\nada@example.com\nalan@example.com\n"))
+        self.assertEqual([u.email for u in result.users], ['alan@example.com'])
+        self.assertEqual(result.errors, [(2, "ada@example.com is already registered.")])
+        self.assertTrue(User.objects.get(username='ada@example.com').is_active)
+
+    def test_missing_email_column(self):
+        with self.assertRaises(RosterError):
+            roster("name\nAda\n")
+
+    def test_activation_emails_share_one_connection(self):
+        result = onboard_students(roster("email\na@example.com\nb@example.com\nc@example.com\n"), workers=1)
+        with self.assertNumQueries(2):  # one activation_emailed_at UPDATE per batch of 2
+            sent, failed = send_activation_emails(result.users, 'example.com', batch_size=2)
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertIn('example.com/activate/', mail.outbox[0].body)
+        self.assertFalse(Profile.objects.filter(user__in=result.users, activation_emailed_at__isnull=True).exists())
+
+    @override_settings(EMAIL_BACKEND='quizzes.tests.test_onboarding.FlakyEmailBackend')
+    def test_one_failed_activation_email_does_not_fail_its_chunk(self):
+        FlakyEmailBackend.refuse = {'b@example.com': smtplib.SMTPServerDisconnected("try later")}
+        self.addCleanup(setattr, FlakyEmailBackend, 'refuse', {})
+        result = onboard_students(roster("email\na@example.com\nb@example.com\nc@example.com\n"), workers=1)
+
+        self.assertEqual(send_activation_emails(result.users, 'example.com', batch_size=10), (2, 1))
+        self.assertEqual(
+            list(Profile.objects.filter(user__in=result.users, activation_emailed_at__isnull=True)
+                 .values_list('user__username', flat=True)),
+            ['b@example.com'],
+        )
+
+    def test_admin_page(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        upload = SimpleUploadedFile('students.csv', b"Email,Full Name\nada@example.com,Ada Lovelace\n")
+        response = self.client.post(reverse('admin:college-onboard-students'), {
+            'file': upload, 'college': self.college.pk,
+        })
+        self.assertRedirects(response, reverse('admin:auth_user_changelist'))
+        self.assertEqual(User.objects.get(username='ada@example.com').profile.college, self.college)
+
+    def test_admin_page_sends_large_rosters_to_the_command(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        upload = SimpleUploadedFile('students.csv', b"Email\na@example.com\nb@example.com\nc@example.com\n")
+        with mock.patch('quizzes.admin.ADMIN_MAX_ROWS', 2), mock.patch('quizzes.onboarding.hash_passwords') as hashing:
+            response = self.client.post(reverse('admin:college-onboard-students'), {'file': upload})
+        self.assertContains(response, 'manage.py onboard_students')
+        hashing.assert_not_called()
+        self.assertFalse(User.objects.filter(username='a@example.com').exists())
@@ -0,0 +1,100 @@
+import io
+
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from quizzes.dedupe import BANDS, find_near_duplicates, index_questions, minhash_many, question_document, signature, similar_pairs
+from quizzes.importer import import_questions
+from quizzes.models import Quiz, Question, Choice, QuestionBucket, QuestionSignature
+
+
+def add_question(quiz, text, choices):
+    question = Question.objects.create(quiz=quiz, text=text)
+    for choice in choices:
+        Choice.objects.create(question=question, text=choice, is_correct=choice == choices[0])
+    return question
+
+
+class QuestionDedupeTest(TestCase):
+    def setUp(self):
+        self.quiz = Quiz.objects.create(title="Python Basics")
+        self.original = add_question(self.quiz, "Which keyword defines a function in Python?", ["def", "func", "lambda", "fn"])
+        index_questions(Question.objects.prefetch_related('choices'))
+
+    def test_signature_ignores_case_punctuation_and_option_order(self):
+        a = signature("Which keyword defines a function in Python?", ["def", "func", "lambda", "fn"])
+        b = signature("which keyword defines a function in python", ["fn", "lambda", "func", "def"])
+        self.assertTrue((a == b).all())
+
+    def test_near_duplicate_is_found_and_different_question_is_not(self):
+        near = signature("Which keyword defines a function in Python ?!", ["def", "func", "lambda", "fn "])
+        other = signature("What does len() return for an empty list?", ["0", "None", "1", "Error"])
+
+        self.assertEqual(find_near_duplicates([near, other]), [self.original.id, None])
+        # Limited to another quiz: no match
+        elsewhere = Question.objects.exclude(quiz=self.quiz)
+        self.assertEqual(find_near_duplicates([near], elsewhere), [None])
+
+    def test_similar_pairs_within_a_batch(self):
+        docs = [
+            question_document("Capital of France?", ["Paris", "Rome"]),
+            question_document("What is 2 + 2?", ["4", "5"]),
+            question_document("Capital of France ?", ["Rome", "Paris"]),
+        ]
+        self.assertEqual(similar_pairs(minhash_many(docs)), [(0, 2)])
+
+    def test_import_skips_near_duplicates(self):
+        df = pd.DataFrame({
+            'Question': ["Which keyword defines a function in Python", "Capital of France?", "capital of france"],
+            'Option A': ["def", "Paris", "Paris"],
+            'Option B': ["func", "Rome", "Rome"],
+            'Option C': ["lambda", "", ""],
+            'Option D': ["fn", "", ""],
+            'Correct Answer': ["A", "A", "A"],
+        })
+        result = import_questions(self.quiz, df, skip_duplicates=True)
+
+        self.assertEqual(result.imported, 1)
+        self.assertEqual(result.errors, [
+            (2, f"Near-duplicate of question #{self.original.id}."),
+            (4, "Near-duplicate of row 3."),
+        ])
+        # The new question is indexed for the next import
+        self.assertTrue(Question.objects.get(text="Capital of France?").signature)
+
+    def test_command_deletes_same_quiz_duplicates(self):
+        copy = add_question(self.quiz, "Which keyword defines a function in Python?", ["def", "func", "lambda", "fn"])
+        other_quiz = Quiz.objects.create(title="Python Review")
+        reused = add_question(other_quiz, "Which keyword defines a function in Python?", ["def", "func", "lambda", "fn"])
+
+        out = io.StringIO()
+        call_command('dedupe_questions', '--delete', stdout=out)
+
+        self.assertIn("3 similar questions:", out.getvalue())
+        self.assertIn("Deleted 1 duplicates", out.getvalue())
+        self.assertFalse(Question.objects.filter(id=copy.id).exists())
+        self.assertTrue(Question.objects.filter(id__in=[self.original.id, reused.id]).count() == 2)
+        # The rebuilt index covers exactly the remaining questions
+        self.assertEqual(set(QuestionSignature.objects.values_list('question_id', flat=True)),
+                         {self.original.id, reused.id})
+
+    def test_choice_edit_in_admin_reindexes(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        before = bytes(self.original.signature.minhash)
+        choices = list(self.original.choices.order_by('id'))
+        data = {
+            'quiz': self.quiz.id, 'text': self.original.text,
+            'choices-TOTAL_FORMS': len(choices), 'choices-INITIAL_FORMS': len(choices),
+            'choices-MIN_NUM_FORMS': 0, 'choices-MAX_NUM_FORMS': 1000,
+        }
+        for i, choice in enumerate(choices):
+            data.update({f'choices-{i}-id': choice.id, f'choices-{i}-question': self.original.id,
+                         f'choices-{i}-text': f"option {i}", f'choices-{i}-is_correct': 'on' if i == 0 else ''})
+        response = self.client.post(reverse('admin:quizzes_question_change', args=[self.original.id]), data)
+        self.assertEqual(response.status_code, 302)
+
+        self.original.refresh_from_db()
+        self.assertNotEqual(bytes(QuestionSignature.objects.get(question=self.original).minhash), before)
+        self.assertEqual(QuestionBucket.objects.filter(question=self.original).count(), BANDS)
@@ -0,0 +1,106 @@
+import json
+
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from quizzes.admin import QuizAdmin
+from quizzes.models import Quiz, Question, Choice
+
+
+class QuestionEditorTest(TestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin)
+        self.quiz = Quiz.objects.create(title="Big Quiz")
+        for i in range(QuizAdmin.inline_question_limit + 5):
+            question = Question.objects.create(quiz=self.quiz, text=f"Question {i}")
+            Choice.objects.create(question=question, text="Yes", is_correct=True)
+            Choice.objects.create(question=question, text="No")
+        self.question = self.quiz.questions.order_by('id').first()
+
+    def save(self, url, payload):
+        return self.client.post(url, json.dumps(payload), content_type='application/json')
+
+    def test_large_quiz_change_page_skips_inlines(self):
+        response = self.client.get(reverse('admin:quizzes_quiz_change', args=[self.quiz.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['questions_in_editor'])
+        self.assertNotContains(response, 'Question 0')
+
+    def test_list_is_paged(self):
+        response = self.client.get(reverse('admin:quiz-question-list', args=[self.quiz.id]), {'page': 2})
+        data = response.json()
+        self.assertEqual(data['count'], QuizAdmin.inline_question_limit + 5)
+        self.assertEqual(len(data['questions']), data['count'] - QuizAdmin.editor_page_size)
+
+    def test_save_updates_deletes_and_adds_choices(self):
+        url = reverse('admin:quiz-question-detail', args=[self.quiz.id, self.question.id])
+        choices = self.client.get(url).json()['choices']
+
+        payload = {
+            'text': "Edited?",
+            'choices': [
+                {'id': choices[0]['id'], 'text': "Yes", 'is_correct': False},
+                {'id': None, 'text': "Maybe", 'is_correct': True},
+            ],
+        }
+        with CaptureQueriesContext(connection) as large_quiz:
+            response = self.save(url, payload)
+
+        # Same work for a one-question quiz: cost doesn't depend on quiz size
+        small = Quiz.objects.create(title="Small Quiz")
+        question = Question.objects.create(quiz=small, text="Only question")
+        keep = Choice.objects.create(question=question, text="Yes", is_correct=True)
+        Choice.objects.create(question=question, text="No")
+        payload['choices'][0]['id'] = keep.id
+        with CaptureQueriesContext(connection) as small_quiz:
+            self.save(reverse('admin:quiz-question-detail', args=[small.id, question.id]), payload)
+        self.assertEqual(len(large_quiz), len(small_quiz))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(c['text'], c['is_correct']) for c in response.json()['choices']],
+                         [("Yes", False), ("Maybe", True)])
+        self.assertFalse(Choice.objects.filter(id=choices[1]['id']).exists())
+
+    def test_invalid_question_is_rejected(self):
+        response = self.save(reverse('admin:quiz-question-new', args=[self.quiz.id]), {
+            'text': "", 'choices': [{'text': "Only one", 'is_correct': False}],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['errors']), 3)
+
+    def test_malformed_payload_is_a_400(self):
+        url = reverse('admin:quiz-question-new', args=[self.quiz.id])
+        good = [{'text': "A", 'is_correct': True}, {'text': "B"}]
+        count = self.quiz.questions.count()
+        for payload in (
+            ["not", "an", "object"],
+            "just a string",
+            {'text': 42, 'choices': good},
+            {'text': "Q?", 'choices': "A, B"},
+            {'text': "Q?", 'choices': ["A", "B"]},
+            {'text': "Q?", 'choices': [{'text': 1, 'is_correct': True}, {'text': "B"}]},
+            {'text': "Q?", 'choices': [{'id': [1], 'text': "A", 'is_correct': True}, {'text': "B"}]},
+            {'text': "Q?", 'choices': [{'text': "A", 'is_correct': "false"}, {'text': "B", 'is_correct': True}]},
+        ):
+            with self.subTest(payload=payload):
+                response = self.save(url, payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertTrue(response.json()['errors'])
+        self.assertEqual(self.quiz.questions.count(), count)
+
+    def test_delete(self):
+        url = reverse('admin:quiz-question-delete', args=[self.quiz.id, self.question.id])
+        self.assertEqual(self.client.post(url).json(), {'deleted': self.question.id})
+        self.assertFalse(Question.objects.filter(id=self.question.id).exists())
+
+    def test_delete_needs_question_delete_permission(self):
+        editor = User.objects.create_user('editor', 'editor@example.com', 'pass', is_staff=True)
+        editor.user_permissions.add(*Permission.objects.filter(codename__in=['view_quiz', 'change_quiz']))
+        self.client.force_login(editor)
+
+        url = reverse('admin:quiz-question-delete', args=[self.quiz.id, self.question.id])
+        self.assertEqual(self.client.post(url).status_code, 403)
+        self.assertTrue(Question.objects.filter(id=self.question.id).exists())
@@ -0,0 +1,45 @@
+import pandas as pd
+from django.test import TestCase
+from quizzes.importer import import_questions
+from quizzes.models import Quiz, Question, Choice
+
+
+class QuestionImportTest(TestCase):
+    def setUp(self):
+        self.quiz = Quiz.objects.create(title="Imported Quiz")
+
+    def test_import_with_letter_and_text_answers(self):
+        df = pd.DataFrame({
+            ' Question ': ["Capital of France?", "2 + 2?"],
+            'Option A': ["Paris", "3"],
+            'Option B': ["Rome", "4"],
+            'Option C': ["Berlin", ""],
+            'Option D': [None, None],
+            'Correct Answer': ["a", "4"],
+        })
+        result = import_questions(self.quiz, df, chunk_size=1)
+
+        self.assertEqual(result.imported, 2)
+        self.assertEqual(result.errors, [])
+        france = Question.objects.get(text="Capital of France?")
+        self.assertEqual(list(france.choices.values_list('text', 'is_correct')),
+                         [("Paris", True), ("Rome", False), ("Berlin", False)])
+        maths = Question.objects.get(text="2 + 2?")
+        self.assertEqual(maths.choices.get(is_correct=True).text, "4")
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        df = pd.DataFrame({
+            'Question': ["", "Only one option?", "No answer?", "Good?", ""],
+            'Option A': ["x", "yes", "a", "yes", ""],
+            'Option B': ["y", "", "b", "no", ""],
+            'Correct Answer': ["A", "A", "Z", "A", ""],
+        })
+        result = import_questions(self.quiz, df)
+
+        self.assertEqual(result.imported, 1)
+        self.assertEqual(result.errors, [
+            (2, "Missing question text."),
+            (3, "Needs at least two options."),
+            (4, "Correct Answer doesn't match any option."),
+        ])
+        self.assertEqual(Choice.objects.filter(question__quiz=self.quiz).count(), 2)
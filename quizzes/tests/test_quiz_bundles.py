@@ -0,0 +1,63 @@
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from quizzes.bundles import BundleError, import_bundle, write_bundle
+from quizzes.models import Category, Quiz, Question, Choice, QuizAccessGrant
+
+
+class QuizBundleTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Python", description="Snakes")
+        self.quiz = Quiz.objects.create(title="Basics", category=category, quiz_type=Quiz.HACKATHON, coupon_code="OLD")
+        for i in range(3):
+            question = Question.objects.create(quiz=self.quiz, text=f"Question {i}?")
+            Choice.objects.create(question=question, text="Yes", is_correct=True)
+            Choice.objects.create(question=question, text="No")
+
+    def export(self, chunk_size=200):
+        out = io.StringIO()
+        write_bundle(Quiz.objects.all(), out, chunk_size=chunk_size)
+        return out.getvalue().splitlines(keepends=True)
+
+    def test_round_trip_into_empty_database(self):
+        lines = self.export()
+        Quiz.objects.all().delete()
+        Category.objects.all().delete()
+
+        result = import_bundle(lines)
+
+        self.assertEqual((result.categories, result.quizzes, result.questions, result.choices), (1, 1, 3, 6))
+        quiz = Quiz.objects.get(uid=self.quiz.uid)
+        self.assertEqual((quiz.title, quiz.category.name, quiz.coupon_code), ("Basics", "Python", "OLD"))
+        self.assertEqual(list(quiz.questions.order_by('id').values_list('text', flat=True)),
+                         ["Question 0?", "Question 1?", "Question 2?"])
+        self.assertEqual(Choice.objects.filter(question__quiz=quiz, is_correct=True).count(), 3)
+
+    def test_reimport_updates_in_place(self):
+        lines = self.export()
+        record = json.loads(lines[2])
+        record['title'] = "Basics v2"
+        record['coupon_code'] = "NEW"
+        record['questions'][0]['text'] = "Edited?"
+        record['questions'][0]['choices'] = [["No", False], ["Yes", True], ["Maybe", False]]
+        lines[2] = json.dumps(record) + '\n'
+        QuizAccessGrant.objects.create(quiz=self.quiz, user=User.objects.create(username="student"))
+
+        import_bundle(lines)
+
+        self.assertEqual(Quiz.objects.count(), 1)
+        self.assertEqual(Question.objects.count(), 3)
+        self.quiz.refresh_from_db()
+        self.assertEqual(self.quiz.title, "Basics v2")
+        question = self.quiz.questions.order_by('id').first()
+        self.assertEqual(question.text, "Edited?")
+        self.assertEqual(list(question.choices.order_by('id').values_list('text', 'is_correct')),
+                         [("No", False), ("Yes", True), ("Maybe", False)])
+        # Coupon changed: old grants are revoked, as with an admin edit
+        self.assertFalse(QuizAccessGrant.objects.exists())
+
+    def test_rejects_unknown_version(self):
+        with self.assertRaises(BundleError):
+            import_bundle(['{"format": "quizmaster-bundle", "version": 99}\n'])
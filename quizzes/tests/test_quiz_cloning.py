@@ -0,0 +1,43 @@
+import io
+
+from django.core.management import call_command
+from django.test import TestCase
+from quizzes.cloning import clone_quizzes
+from quizzes.dedupe import index_questions
+from quizzes.models import Quiz, Question, Choice, QuestionSignature
+
+
+class QuizCloningTest(TestCase):
+    def setUp(self):
+        self.quizzes = []
+        for n in range(2):
+            quiz = Quiz.objects.create(title=f"Hackathon {n}", quiz_type=Quiz.HACKATHON, coupon_code="HACK", duration_minutes=45)
+            for i in range(50):
+                question = Question.objects.create(quiz=quiz, text=f"Quiz {n} question {i}?")
+                Choice.objects.create(question=question, text="Right", is_correct=True)
+                Choice.objects.create(question=question, text="Wrong")
+            self.quizzes.append(quiz)
+        index_questions(Question.objects.prefetch_related('choices'))
+
+    def test_clone_copies_everything_in_a_few_queries(self):
+        # Quiz inserts + reads + bulk inserts; independent of the number of questions
+        with self.assertNumQueries(14):
+            copies = clone_quizzes(self.quizzes)
+
+        for source, copy in zip(self.quizzes, copies):
+            self.assertEqual(copy.title, f"{source.title} (Copy)")
+            self.assertFalse(copy.is_active)
+            self.assertEqual((copy.coupon_code, copy.duration_minutes), ("HACK", 45))
+            self.assertEqual(
+                list(copy.questions.order_by('id').values_list('text', 'choices__text', 'choices__is_correct')),
+                list(source.questions.order_by('id').values_list('text', 'choices__text', 'choices__is_correct')),
+            )
+        self.assertEqual(QuestionSignature.objects.filter(question__quiz__in=copies).count(), 100)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('clone_quiz', str(self.quizzes[0].id), '--suffix', ' 2025', stdout=out)
+        copy = Quiz.objects.get(title="Hackathon 0 2025")
+        self.assertEqual(copy.questions.count(), 50)
+        self.assertIn(f"#{self.quizzes[0].id} 'Hackathon 0' -> #{copy.id} 'Hackathon 0 2025' (50 questions)", out.getvalue())
+        self.assertIn("Cloned 1 quizzes", out.getvalue())
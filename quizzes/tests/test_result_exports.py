@@ -0,0 +1,60 @@
+import csv
+import io
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+from quizzes.exports import EXPORT_HEADER, attempt_rows, hackathon_result_rows
+from quizzes.models import Quiz, Question, Attempt
+
+
+class ResultExportTest(TestCase):
+    def setUp(self):
+        self.quiz = Quiz.objects.create(title="Hack Day", quiz_type=Quiz.HACKATHON)
+        for i in range(2):
+            Question.objects.create(quiz=self.quiz, text=f"Q{i}")
+        finished = timezone.now()
+        # Equal scores and submit times: ties fall back to id, across chunk boundaries too
+        for i, score in enumerate([1, 2, 1, 1, 0]):
+            Attempt.objects.create(user=User.objects.create(username=f"s{i}", first_name="Stu", last_name=str(i)),
+                                   quiz=self.quiz, score=score, finished_at=finished - timedelta(minutes=score))
+        Attempt.objects.create(user=User.objects.create(username="unfinished"), quiz=self.quiz,
+                               auto_submit_reason="Tab switch")
+
+    def test_ranked_rows_in_chunks(self):
+        rows = list(hackathon_result_rows([self.quiz.id], chunk_size=2))
+
+        self.assertEqual(rows[0], EXPORT_HEADER)
+        self.assertEqual([(r[1], r[2]) for r in rows[1:]], [(1, "s1"), (2, "s0"), (3, "s2"), (4, "s3"), (5, "s4")])
+        self.assertEqual(rows[1][3:9], ["Stu 1", "", "", 2, 2, 100.0])
+
+    def test_attempt_rows_include_unfinished(self):
+        rows = list(attempt_rows(Attempt.objects.all(), chunk_size=4))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[-1][-1], "Tab switch")
+
+    def test_admin_exports(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+
+        response = self.client.get(reverse('admin:hackathon-results-export', args=[self.quiz.id, 'csv']))
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(list(csv.reader(io.StringIO(body)))), 6)
+
+        response = self.client.post(reverse('admin:quizzes_hackathonresult_changelist'), {
+            'action': 'export_results_xlsx', '_selected_action': [self.quiz.id],
+        })
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(sheet.max_row, 6)
+
+        response = self.client.get(reverse('admin:hackathon-results-export', args=[self.quiz.id, 'pdf']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_ranked_chunks_have_an_index(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Attempt._meta.db_table)
+        self.assertIn(['quiz_id', 'score', 'finished_at', 'id'],
+                      [c['columns'] for c in constraints.values() if c['index']])
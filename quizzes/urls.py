@@ -31,6 +31,7 @@ urlpatterns = [
     path('password-change/', auth_views.PasswordChangeView.as_view(template_name='quizzes/password_change.html'), name='password_change'),
     path('password-change/done/', auth_views.PasswordChangeDoneView.as_view(template_name='quizzes/password_change_done.html'), name='password_change_done'),
     path('ask-ai/', views.ask_ai, name='ask_ai'),
+    path('ask-ai/stream/', views.ask_ai_stream, name='ask_ai_stream'),
     path('analyze-progress/', views.analyze_progress, name='analyze_progress'),
     path('generate-quiz/', views.generate_quiz_page, name='generate_quiz_page'),
     path('api/generate-quiz/', views.generate_quiz_api, name='generate_quiz_api'),
@@ -6,8 +6,39 @@ from reportlab.lib.utils import ImageReader
 from django.utils import timezone
 
 from django.conf import settings
+from django.db import connection
 import os
 
+
+def bulk_create_with_pks(objs, key='uid', batch_size=None):
+    """
+    bulk_create() that always fills in the primary keys of `objs`.
+
+    PostgreSQL/SQLite return them from the INSERT; MySQL does not, so there we
+    read the new rows back by `key`, a unique field each object already
+    carries before the INSERT (Question.uid, User.username). Matching by key
+    rather than by id order stays right when other writers insert rows into
+    the same table at the same time.
+    """
+    if not objs:
+        return objs
+    model = type(objs[0])
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs, batch_size=batch_size)
+
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    keys = [getattr(obj, key) for obj in objs]
+    pks = {}
+    for start in range(0, len(keys), 1000):
+        pks.update(model.objects.filter(**{f'{key}__in': keys[start:start + 1000]}).values_list(key, 'pk'))
+    if len(pks) != len(objs):
+        raise RuntimeError(f"Expected {len(objs)} new {model.__name__} rows, found {len(pks)}")
+    for obj, value in zip(objs, keys):
+        obj.pk = pks[value]
+        obj._state.adding = False
+    return objs
+
+
 def generate_certificate_pdf(attempt):
     """
     Generates a PDF certificate for the given attempt.
@@ -12,8 +12,9 @@ import json
 from django.db import models
 from django.db.models import Sum, Count, F, Avg, Max
 from django.db.models.functions import Coalesce
-from .models import Quiz, Question, Choice, Attempt, Answer, QuizAccessGrant, Category
-from training.models import Enrollment, ClassSchedule
+from .models import Quiz, Question, Choice, Attempt, Answer, QuizAccessGrant, Category, AIQuizUsage
+from training.models import ClassSchedule
+from training.entitlements import get_entitlements
 from .forms import UserRegistrationForm, UserLoginForm, EmailValidationPasswordResetForm, CustomSetPasswordForm, UserUpdateForm, ProfileUpdateForm
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
@@ -25,9 +26,14 @@ from django.contrib.sites.shortcuts import get_current_site
 from django.contrib.auth.models import User
 from django.contrib.auth import views as auth_views
 from django.urls import reverse_lazy
-from django.http import FileResponse
+from django.http import FileResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.clickjacking import xframe_options_sameorigin
 from .utils import generate_certificate_pdf
+from .generation import QuizGeneration
+from .ai import chat_completion, stream_chat_completion, astream_chat_completion, AIUnavailable
+
+AI_BUSY_MESSAGE = "Our AI tutor is getting a lot of questions right now. Please try again in a minute. 🙏"
 
 # 🧠 Utility: Send Hackathon Email
 def send_hackathon_result_email(request, attempt):
@@ -229,13 +235,9 @@ def home(request):
         # 7. 📅 Upcoming Classes (Training)
         # 7. 📅 Upcoming Classes (Training)
         upcoming_classes = []
-        is_tutor_user = False
-        
-        # Check if user is a designated tutor (Mirroring 'check_is_tutor' logic)
-        if user.is_superuser or user.groups.filter(name='Tutor').exists() or ClassSchedule.objects.filter(tutor=user).exists():
-            is_tutor_user = True
-            
-        if is_tutor_user:
+        entitlements = get_entitlements(user)
+
+        if entitlements.is_tutor:
              # If Tutor, Show Teaching Schedule (Priority)
              upcoming_classes = ClassSchedule.objects.filter(
                  tutor=user,
@@ -243,12 +245,8 @@ def home(request):
              ).order_by('start_time')[:2]
         else:
             # If Student, Show Enrolled Classes
-            active_enrollments = Enrollment.objects.filter(
-                user=user, 
-                expires_at__gt=timezone.now()
-            )
-            if active_enrollments.exists():
-                 batch_ids = active_enrollments.values_list('batch_id', flat=True)
+            batch_ids = entitlements.active_batch_ids
+            if batch_ids:
                  upcoming_classes = ClassSchedule.objects.filter(
                      batch__id__in=batch_ids,
                      start_time__gte=timezone.now()
@@ -370,9 +368,7 @@ def activate(request, uidb64, token):
 # 🧠 Utility: Check if user can access a quiz
 def user_has_access(user, quiz):
     """Allow all practice quizzes, and only coupon-approved hackathon quizzes."""
-    if quiz.quiz_type.lower() == 'practice':
-        return True
-    return QuizAccessGrant.objects.filter(user=user, quiz=quiz).exists()
+    return get_entitlements(user).can_open(quiz)
 
 
 # 📂 Category Selection Page
@@ -420,7 +416,7 @@ def quiz_list(request, category_id=None):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    unlocked_quiz_ids = QuizAccessGrant.objects.filter(user=request.user).values_list('quiz_id', flat=True)
+    unlocked_quiz_ids = get_entitlements(request.user).unlocked_quiz_ids
     
     return render(request, 'quizzes/quiz_list.html', {
         'page_obj': page_obj,
@@ -437,6 +433,8 @@ def quiz_detail(request, pk):
 
     # ✅ PRACTICE QUIZ: Directly accessible
     if quiz.quiz_type.lower() == 'practice':
+        if quiz.generation_status == Quiz.GENERATION_FAILED:
+            messages.warning(request, "⚠️ The AI stopped before finishing this quiz, so it has fewer questions than you asked for.")
         return render(request, 'quizzes/quiz_detail.html', {'quiz': quiz})
 
     # ✅ HACKATHON QUIZ: Check Time & Access
@@ -845,6 +843,28 @@ def my_history(request):
     return render(request, 'quizzes/user_dashboard.html', context)
 
 
+def build_explanation_messages(question, user_answer_text):
+    correct_choices = question.choices.filter(is_correct=True)
+    correct_text = ", ".join([c.text for c in correct_choices])
+
+    prompt = f"""
+    You are an expert tutor. A student answered a multiple-choice question incorrectly.
+    
+    Question: {question.text}
+    Student's Answer: {user_answer_text}
+    Correct Answer: {correct_text}
+    
+    Please provide a brief, encouraging, and clear explanation of:
+    1. Why the student's answer is incorrect.
+    2. Why the correct answer is right.
+    Keep it strictly under 100 words. Be friendly and helpful.
+    """
+    return [
+        {"role": "system", "content": "You are a helpful AI tutor."},
+        {"role": "user", "content": prompt}
+    ]
+
+
 @csrf_exempt
 def ask_ai(request):
     """
@@ -857,41 +877,65 @@ def ask_ai(request):
             user_answer_text = data.get('user_answer')
             
             question = Question.objects.get(id=question_id)
-            correct_choices = question.choices.filter(is_correct=True)
-            correct_text = ", ".join([c.text for c in correct_choices])
-            
-            # Configure OpenAI
-            from openai import OpenAI
-            client = OpenAI(api_key=settings.OPENAI_API_KEY)
-            
-            prompt = f"""
-            You are an expert tutor. A student answered a multiple-choice question incorrectly.
-            
-            Question: {question.text}
-            Student's Answer: {user_answer_text}
-            Correct Answer: {correct_text}
-            
-            Please provide a brief, encouraging, and clear explanation of:
-            1. Why the student's answer is incorrect.
-            2. Why the correct answer is right.
-            Keep it strictly under 100 words. Be friendly and helpful.
-            """
-            
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful AI tutor."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return JsonResponse({'explanation': response.choices[0].message.content})
-            
+
+            # Students asking about the same question at once share one provider call
+            explanation = chat_completion(build_explanation_messages(question, user_answer_text))
+            return JsonResponse({'explanation': explanation})
+
+        except AIUnavailable:
+            # Provider is struggling: answer fast instead of holding the worker
+            return JsonResponse({'explanation': AI_BUSY_MESSAGE, 'degraded': True})
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def ask_ai_stream(request):
+    """
+    Server-Sent Events version of ask_ai.
+    Relays the explanation token by token so the student sees text right away.
+    Under ASGI the provider stream is consumed asynchronously.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+    question = get_object_or_404(Question, id=request.GET.get('question_id'))
+    messages_ = build_explanation_messages(question, request.GET.get('user_answer', ''))
+
+    def events():
+        try:
+            for text in stream_chat_completion(messages_):
+                yield _sse('token', {'text': text})
+            yield _sse('done', {})
+        except AIUnavailable:
+            yield _sse('done', {'text': AI_BUSY_MESSAGE, 'degraded': True})
+        except Exception as e:
+            print(f"AI stream error: {e}")
+            yield _sse('error', {'error': 'AI service unavailable'})
+
+    async def aevents():
+        try:
+            async for text in astream_chat_completion(messages_):
+                yield _sse('token', {'text': text})
+            yield _sse('done', {})
+        except AIUnavailable:
+            yield _sse('done', {'text': AI_BUSY_MESSAGE, 'degraded': True})
+        except Exception as e:
+            print(f"AI stream error: {e}")
+            yield _sse('error', {'error': 'AI service unavailable'})
+
+    is_asgi = isinstance(request, ASGIRequest)
+    response = StreamingHttpResponse(aevents() if is_asgi else events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Tell nginx not to buffer the stream
+    return response
+
+
 @csrf_exempt
 def analyze_progress(request):
     """
@@ -923,9 +967,6 @@ def analyze_progress(request):
                 stats_text += f"- {label}: Scored {score}/{max_score}\n"
 
             # 2. Query OpenAI
-            from openai import OpenAI
-            client = OpenAI(api_key=settings.OPENAI_API_KEY)
-            
             prompt = f"""
             You are an expert academic mentor. Analyze this student's recent quiz history:
             
@@ -938,15 +979,14 @@ def analyze_progress(request):
             Use emojis. Talk directly to the student ("You...").
             """
             
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful academic mentor."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return JsonResponse({'analysis': response.choices[0].message.content})
-            
+            analysis = chat_completion([
+                {"role": "system", "content": "You are a helpful academic mentor."},
+                {"role": "user", "content": prompt}
+            ])
+            return JsonResponse({'analysis': analysis})
+
+        except AIUnavailable:
+            return JsonResponse({'analysis': AI_BUSY_MESSAGE, 'degraded': True})
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
@@ -974,157 +1014,38 @@ def generate_quiz_api(request):
             if not topic:
                 return JsonResponse({'error': 'Topic is required'}, status=400)
 
-            # 🛑 0. Check Monthly Limit (3 Quizzes)
-            from django.utils import timezone
-            now = timezone.now()
-            start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            
-            # Count user's AI quizzes this month
-            # Note: We rely on created_at or fuzzy matching if created_at is null for old ones
-            # But since this is a new feature, we only care about new quizzes which will have created_at
-            current_month_count = Quiz.objects.filter(
-                created_by=request.user,
-                quiz_type='practice', # Assuming AI quizzes are practice
-                category__name="AI Generated",
-                created_at__gte=start_of_month
-            ).count()
-            
-            if current_month_count >= 3:
+            current_site = get_current_site(request)
+
+            # 🛑 0. Reserve one of this month's AI quizzes (3 per month).
+            # A single conditional UPDATE, so parallel requests can't overshoot.
+            reserved_month = AIQuizUsage.reserve(request.user, settings.AI_QUIZ_MONTHLY_LIMIT)
+            if reserved_month is None:
                 return JsonResponse({
                     'error': 'Monthly limit exceeded', 
                     'limit_reached': True
                 }, status=403)
 
-            # 1. Configure OpenAI
-            from openai import OpenAI
-            client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-            # 2. Construct Prompt for JSON
-            prompt = f"""
-            Analyze the topic: "{topic}".
-            Difficulty Level: {difficulty}.
-            
-            STRICT CONTENT GUIDELINES:
-            This platform is for study and educational purposes only.
-            1. REJECT topics involving: profanity, sexual content, violence, hate speech, illegal acts, or inappropriate adult themes.
-            2. REJECT topics that are purely for inappropriate entertainment or "bad things".
-            
-            If the topic violates these rules, return ONLY this JSON:
-            {{ "error": "This platform is designed mainly for study purposes. Please choose a polite and educational topic." }}
-
-            If the topic is safe/educational, create a multiple-choice quiz about "{topic}".
-            Number of questions: {limit}.
-            Complexity: {difficulty} (Ensure questions are suitable for {difficulty} level).
-            
-            Return ONLY raw JSON. No markdown formatting. No code blocks.
-            Success Structure:
-            {{
-                "title": "Short Topic Title (Max 5 words)",
-                "questions": [
-                    {{
-                        "text": "Question text here?",
-                        "choices": [
-                            {{"text": "Choice 1", "is_correct": false}},
-                            {{"text": "Choice 2", "is_correct": true}},
-                            {{"text": "Choice 3", "is_correct": false}},
-                            {{"text": "Choice 4", "is_correct": false}}
-                        ]
-                    }}
-                ]
-            }}
-            """
-
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful and ethical AI tutor. You strictly enforce educational guidelines."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={ "type": "json_object" }
-            )
-            
-            clean_text = response.choices[0].message.content.strip()
-            
-            quiz_data = json.loads(clean_text)
-            
-            # Check if AI rejected the topic
-            if 'error' in quiz_data:
-                 return JsonResponse({'error': quiz_data['error']}, status=400)
-
-            # 3. Save to Database
-            # Get or Create "AI Generated" category
-            category, _ = Category.objects.get_or_create(name="AI Generated")
-            
-            # ✅ Hybrid Title Logic
-            # If user typed a short topic (e.g. "Python"), use it directly.
-            # If user typed a long description, use the AI's summarized title.
-            if len(topic.split()) <= 6:
-                final_title = topic.title()
-            else:
-                final_title = quiz_data.get('title', topic[:50]).title()
-            
-            # Append difficulty to title if not beginner
-            if difficulty != 'Beginner':
-                final_title = f"{final_title} ({difficulty})"
-
-            # ✅ Dynamic Time Calculation
-            # 1.5 minutes per question, minimum 5 minutes
-            calculated_duration = max(5, int(limit * 1.5))
-            
-            # Create Quiz Object
-            quiz = Quiz.objects.create(
-                title=final_title,
-                description=f"An AI-generated quiz on {topic}. Challenge yourself!",
-                category=category,
-                quiz_type='practice', # Defaulting to practice for AI quizzes
-                duration_minutes=calculated_duration, 
-                passing_percentage=60, # Standard passing
-                created_by=request.user
+            # 1. Generate in the background, saving questions as they stream in.
+            # We answer as soon as the first question exists so the student can
+            # start while the rest is still being written.
+            generation = QuizGeneration(
+                request.user, topic, limit, difficulty,
+                site_url=f"{'https' if request.is_secure() else 'http'}://{current_site.domain}",
+                reserved_month=reserved_month,
             )
-
-            # 4. Save Questions to Database
-            for q_data in quiz_data.get('questions', []):
-                question = Question.objects.create(
-                    quiz=quiz,
-                    text=q_data['text']
-                    # question_type removed as it doesn't exist in model
-                )
-                
-                for choice_data in q_data.get('choices', []):
-                    Choice.objects.create(
-                        question=question,
-                        text=choice_data['text'],
-                        is_correct=choice_data['is_correct']
-                    )
-
-            # 🤖 Send AI Quiz Ready Email
             try:
-                current_site = get_current_site(request)
-                mail_subject = f"Your AI Quiz '{final_title}' is Ready! 🤖"
-                quiz_url = f"{'https' if request.is_secure() else 'http'}://{current_site.domain}{reverse('quiz_detail', args=[quiz.id])}"
-                
-                html_message = render_to_string('quizzes/ai_quiz_ready_email.html', {
-                    'user': request.user,
-                    'topic': topic.title(),
-                    'quiz_url': quiz_url,
-                    'question_count': limit,
-                    'difficulty': difficulty,
-                    'domain': f"{'https' if request.is_secure() else 'http'}://{current_site.domain}",
-                })
-                plain_message = f"Your AI quiz on {topic} is ready. Start here: {quiz_url}"
-                
-                send_mail(
-                    subject=mail_subject,
-                    message=plain_message,
-                    from_email='tgays.technology@gmail.com',
-                    recipient_list=[request.user.email],
-                    fail_silently=True,
-                    html_message=html_message
-                )
-            except Exception as e:
-                print(f"Error sending AI quiz email: {e}")
-            
-            return JsonResponse({'success': True, 'quiz_id': quiz.id})
+                generation.start()
+            except Exception:
+                AIQuizUsage.release(request.user, reserved_month)
+                raise
+            # On timeout this cancels the generation, so no quiz appears after we've answered
+            quiz = generation.wait(timeout=getattr(settings, 'AI_GENERATION_TIMEOUT', 90))
+
+            if quiz is not None:
+                return JsonResponse({'success': True, 'quiz_id': quiz.id})
+            if generation.rejected:
+                return JsonResponse({'error': generation.error}, status=400)
+            return JsonResponse({'error': generation.error or "We are facilitating many quizzes right now! Please try again in 30 seconds. 🚀"}, status=500)
 
         except Exception as e:
             print(f"Generic Error: {e}")
@@ -1182,12 +1103,9 @@ def use_lifeline_api(request):
                     result['remove_ids'] = [c.id for c in incorrect_choices]
             
             elif lifeline_type == 'ask_ai':
-                from openai import OpenAI
                 if not settings.OPENAI_API_KEY:
                      return JsonResponse({'error': 'OpenAI API Key not configured'}, status=500)
 
-                client = OpenAI(api_key=settings.OPENAI_API_KEY)
-                
                 options_text = "\n".join([f"- {c.text}" for c in question.choices.all()])
                 
                 prompt = f"""
@@ -1202,12 +1120,8 @@ def use_lifeline_api(request):
                 """
                 
                 try:
-                    ai_resp = client.chat.completions.create(
-                        model="gpt-4o",
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=60
-                    )
-                    result['hint'] = ai_resp.choices[0].message.content.strip()
+                    hint = chat_completion([{"role": "user", "content": prompt}], max_tokens=60)
+                    result['hint'] = hint.strip()
                 except Exception as e:
                      print(f"OpenAI Error: {e}")
                      return JsonResponse({'error': 'AI service unavailable'}, status=503)
@@ -1,13 +1,21 @@
+import csv
 from django import forms
 from django.db import models # Added missing import
 from django.contrib import admin
 from django.db.models import Q
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.conf import settings
 from .models import Workshop, Batch, ClassSchedule, Coupon, Enrollment, Attendance, Resource
 from django.contrib import messages
+from django.utils import timezone
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect, render
+from django.urls import path
+from datetime import date, timedelta
+from .analytics import batch_attendance
+from .coupons import (
+    CouponCSVError, coupon_email, issue_coupons, read_student_csv, send_coupon_emails_in_background,
+)
+from .recurrence import WEEKDAY_CHOICES, create_series, expand_weekly, find_conflicts
 
 class ClassScheduleForm(forms.ModelForm):
     # Explicitly define fields to ensure correct input format validation for datetime-local
@@ -33,6 +41,71 @@ class ClassScheduleForm(forms.ModelForm):
             Q(groups__name='Tutor') | Q(is_superuser=True) | Q(is_staff=True)
         ).distinct()
 
+class RecurringScheduleForm(forms.Form):
+    topic = forms.CharField(max_length=255, help_text='Use {n} for the session number, e.g. "Python Session {n}"')
+    tutor = forms.ModelChoiceField(queryset=User.objects.none(), required=False)
+    meeting_link = forms.URLField(max_length=500, required=False)
+    first_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    until = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    weekdays = forms.TypedMultipleChoiceField(
+        choices=WEEKDAY_CHOICES, coerce=int, widget=forms.CheckboxSelectMultiple
+    )
+    start_time = forms.TimeField(widget=forms.TimeInput(attrs={'type': 'time'}, format='%H:%M'))
+    duration_minutes = forms.IntegerField(min_value=15, max_value=24 * 60, initial=60)
+    every_n_weeks = forms.IntegerField(min_value=1, max_value=8, initial=1)
+    exclude_dates = forms.CharField(
+        required=False, widget=forms.Textarea(attrs={'rows': 3}),
+        help_text='Holidays to skip: one YYYY-MM-DD per line (or comma-separated)'
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Same tutor choices as the schedule form
+        self.fields['tutor'].queryset = User.objects.filter(
+            Q(groups__name='Tutor') | Q(is_superuser=True) | Q(is_staff=True)
+        ).distinct()
+
+    def clean_exclude_dates(self):
+        dates = set()
+        for value in self.cleaned_data['exclude_dates'].replace(',', '\n').split():
+            try:
+                dates.add(date.fromisoformat(value))
+            except ValueError:
+                raise forms.ValidationError(f"{value} is not a YYYY-MM-DD date.")
+        return dates
+
+    def clean(self):
+        data = super().clean()
+        if data.get('first_date') and data.get('until') and data['until'] < data['first_date']:
+            raise forms.ValidationError("The series must end on or after its first date.")
+        return data
+
+    def slots(self):
+        data = self.cleaned_data
+        return expand_weekly(
+            data['first_date'], data['until'], data['weekdays'], data['start_time'],
+            timedelta(minutes=data['duration_minutes']), interval=data['every_n_weeks'],
+            exclude_dates=data['exclude_dates'],
+        )
+
+class BulkCouponForm(forms.Form):
+    file = forms.FileField(
+        label='Student CSV',
+        help_text="Columns: email (required), amount and payment_date (YYYY-MM-DD) optional. Students need an account.",
+        widget=forms.FileInput(attrs={'accept': '.csv'})
+    )
+    valid_days = forms.IntegerField(min_value=1, initial=30, help_text="Access length from each payment date")
+    valid_until = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={'type': 'date'}),
+        help_text="Fixed end of access for everyone (overrides valid days)"
+    )
+    send_emails = forms.BooleanField(required=False, initial=True, label='Email the codes to the students')
+
+class BatchListFilter(admin.RelatedFieldListFilter):
+    """Batch filter whose labels ("Workshop - Batch") come from one query instead of one per batch."""
+    def field_choices(self, field, request, model_admin):
+        return [(batch.pk, str(batch)) for batch in Batch.objects.select_related('workshop').order_by('workshop__title', 'name')]
+
 class ClassScheduleInline(admin.TabularInline):
     model = ClassSchedule
     form = ClassScheduleForm # Use the form
@@ -57,12 +130,144 @@ class BatchAdmin(admin.ModelAdmin):
     list_display = ('name', 'workshop', 'start_date', 'end_date')
     list_filter = ('workshop',)
     inlines = [ClassScheduleInline, ResourceBatchInline]
+    actions = ['bulk_coupons_action']
+
+    def get_urls(self):
+        custom_urls = [
+            path(
+                '<int:object_id>/recurring-classes/',
+                self.admin_site.admin_view(self.recurring_classes),
+                name='batch-recurring-classes',
+            ),
+            path(
+                '<int:object_id>/bulk-coupons/',
+                self.admin_site.admin_view(self.bulk_coupons),
+                name='batch-bulk-coupons',
+            ),
+            path(
+                '<int:object_id>/attendance/',
+                self.admin_site.admin_view(self.attendance_report),
+                name='batch-attendance',
+            ),
+        ]
+        return custom_urls + super().get_urls()
+
+    @admin.action(description="🎟️ Generate coupons from a student CSV")
+    def bulk_coupons_action(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Select exactly one batch.", messages.WARNING)
+            return None
+        return redirect('admin:batch-bulk-coupons', queryset.first().pk)
+
+    # 📊 Student x class matrix, summarised with NumPy and cached until new attendance arrives
+    def attendance_report(self, request, object_id):
+        batch = self.get_object(request, object_id)
+        if batch is None or not self.has_view_permission(request, batch):
+            raise PermissionDenied
+        context = {
+            **self.admin_site.each_context(request),
+            'report': batch_attendance(batch.pk),
+            'object': batch,
+            'opts': self.model._meta,
+            'object_id': object_id,
+            'title': f'Attendance: {batch}',
+        }
+        return render(request, 'admin/training/batch/attendance.html', context)
+
+    # 🎟️ A whole cohort in one go: one INSERT for the coupons, emails over one SMTP connection
+    def bulk_coupons(self, request, object_id):
+        batch = self.get_object(request, object_id)
+        if batch is None or not self.has_change_permission(request, batch):
+            raise PermissionDenied
+        errors = []
+        if request.method == 'POST':
+            form = BulkCouponForm(request.POST, request.FILES)
+            if form.is_valid():
+                try:
+                    rows = read_student_csv(request.FILES['file'])
+                except (CouponCSVError, UnicodeDecodeError, csv.Error) as e:
+                    form.add_error('file', str(e))
+                else:
+                    result = issue_coupons(
+                        batch, rows, valid_days=form.cleaned_data['valid_days'],
+                        valid_until=form.cleaned_data['valid_until'],
+                    )
+                    errors = result.errors
+                    if result.coupons:
+                        note = f"✅ Generated {len(result.coupons)} coupons for {batch}"
+                        if result.renewed:
+                            note += f" ({result.renewed} existing enrollments extended)"
+                        if form.cleaned_data['send_emails']:
+                            send_coupon_emails_in_background(result.coupons)
+                            note += "; emails are being sent"
+                        messages.success(request, note + ".")
+                    if not errors:
+                        return redirect('admin:training_coupon_changelist')
+        else:
+            form = BulkCouponForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'form': form,
+            'errors': errors,
+            'object': batch,
+            'opts': self.model._meta,
+            'object_id': object_id,
+            'title': f'Bulk Coupons for {batch}',
+        }
+        return render(request, 'admin/training/batch/bulk_coupons.html', context)
+
+    # 🔁 Recurring series: expand in memory, one conflict query, one bulk INSERT
+    def recurring_classes(self, request, object_id):
+        batch = self.get_object(request, object_id)
+        if batch is None or not self.has_change_permission(request, batch):
+            raise PermissionDenied
+        slots, conflicts = [], []
+        if request.method == 'POST':
+            form = RecurringScheduleForm(request.POST)
+            if form.is_valid():
+                try:
+                    slots = form.slots()
+                except ValueError as e:
+                    form.add_error(None, str(e))
+                else:
+                    if not slots:
+                        form.add_error('weekdays', "No classes fall on these days in the chosen range.")
+                    conflicts = find_conflicts(form.cleaned_data['tutor'], slots)
+                if form.is_valid() and not conflicts and '_create' in request.POST:
+                    data = form.cleaned_data
+                    try:
+                        created = create_series(
+                            batch, data['topic'], slots, tutor=data['tutor'],
+                            meeting_link=data['meeting_link'] or None,
+                        )
+                    except ValueError as e:
+                        # Someone booked the tutor between preview and create
+                        form.add_error(None, str(e))
+                    else:
+                        messages.success(request, f"✅ Created {len(created)} classes for {batch}.")
+                        return redirect('admin:training_batch_change', batch.pk)
+        else:
+            form = RecurringScheduleForm(initial={'first_date': batch.start_date, 'until': batch.end_date})
+
+        context = {
+            **self.admin_site.each_context(request),
+            'form': form,
+            'slots': slots,
+            'conflicts': conflicts,
+            'object': batch,
+            'opts': self.model._meta,
+            'object_id': object_id,
+            'title': f'Recurring Classes for {batch}',
+        }
+        return render(request, 'admin/training/batch/recurring_classes.html', context)
 
 @admin.register(ClassSchedule)
 class ClassScheduleAdmin(admin.ModelAdmin):
     form = ClassScheduleForm # Use the form
     list_display = ('topic', 'batch', 'tutor', 'start_time', 'end_time', 'reminder_6hr_sent', 'reminder_30min_sent')
-    list_filter = ('batch', 'tutor', 'start_time', 'reminder_6hr_sent', 'reminder_30min_sent')
+    list_filter = (('batch', BatchListFilter), 'tutor', 'start_time', 'reminder_6hr_sent', 'reminder_30min_sent')
+    list_select_related = ('batch__workshop', 'tutor')
     inlines = [ResourceScheduleInline]
     readonly_fields = ('reminder_6hr_sent', 'reminder_30min_sent')
 
@@ -70,8 +275,9 @@ class ClassScheduleAdmin(admin.ModelAdmin):
 
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
-    list_display = ('code', 'batch', 'assigned_to', 'enrollment_valid_until', 'payment_date', 'is_used')
-    list_filter = ('is_used', 'batch')
+    list_display = ('code', 'batch', 'assigned_to', 'enrollment_valid_until', 'payment_date', 'is_used', 'emailed_at')
+    list_filter = ('is_used', ('batch', BatchListFilter), ('emailed_at', admin.EmptyFieldListFilter))
+    list_select_related = ('batch__workshop', 'assigned_to')
     search_fields = ('code', 'assigned_to__email', 'assigned_to__username')
     readonly_fields = ('code',)
     
@@ -81,6 +287,7 @@ class CouponAdmin(admin.ModelAdmin):
         'valid_days',
         ('enrollment_valid_from', 'enrollment_valid_until'),
         ('payment_amount', 'payment_date'),
+        'next_payment_date',
         'is_used',
         'code'
     )
@@ -129,46 +336,19 @@ class CouponAdmin(admin.ModelAdmin):
         js = ('training/js/coupon_admin.js',)
 
     def send_coupon_email(self, coupon):
-        subject = f"Your Access Code for {coupon.batch.workshop.title}"
-        
-        # Helper to get domain (assuming localhost for dev, should be dynamic in prod)
-        domain = "127.0.0.1:8000" 
-        
-        html_message = render_to_string('training/emails/coupon_email.html', {
-            'user': coupon.assigned_to,
-            'coupon': coupon,
-            'code': coupon.code,
-            'batch': coupon.batch,
-            'valid_days': coupon.valid_days,
-            'domain': domain,
-        })
-        
-        plain_message = f"""
-Hello {coupon.assigned_to.first_name},
-
-You have been granted access to {coupon.batch.workshop.title} ({coupon.batch.name}).
-Your access code is: {coupon.code}
-
-Redeem it here: http://{domain}/training-program/
-"""
-        
-        send_mail(
-            subject,
-            plain_message,
-            settings.EMAIL_HOST_USER,
-            [coupon.assigned_to.email],
-            fail_silently=False,
-            html_message=html_message
-        )
+        coupon_email(coupon).send(fail_silently=False)
+        Coupon.objects.filter(pk=coupon.pk).update(emailed_at=timezone.now())
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
-    list_display = ('user', 'batch', 'enrolled_at', 'expires_at', 'is_active')
-    list_filter = ('batch',)
+    list_display = ('user', 'batch', 'enrolled_at', 'expires_at', 'is_active', 'lapsed_at')
+    list_filter = (('batch', BatchListFilter), ('lapsed_at', admin.EmptyFieldListFilter))
+    list_select_related = ('user', 'batch__workshop')
     search_fields = ('user__username', 'user__email')
 
 @admin.register(Attendance)
 class AttendanceAdmin(admin.ModelAdmin):
     list_display = ('user', 'class_schedule', 'joined_at')
-    list_filter = ('class_schedule__batch',)
+    list_filter = (('class_schedule__batch', BatchListFilter),)
+    list_select_related = ('user', 'class_schedule')
 
@@ -0,0 +1,159 @@
+"""
+Per-batch attendance analytics: a student x class matrix built from flat
+queries and summarised with vectorised pandas/NumPy operations.
+
+    report = batch_attendance(batch.pk)
+    report['students']    # [{'user_id', 'name', 'email', 'attended', 'rate', 'missed_streak',
+                          #   'longest_streak', 'at_risk', 'marks'}], at-risk students first
+    report['classes']     # [{'id', 'topic', 'start_time', 'attended', 'rate'}]
+    report['overall_rate']
+
+Only classes that have started count. The report is cached per batch under
+a version number that attendance/enrollment/class changes bump (see
+bump_batches), so it is rebuilt only once new attendance rows arrive or a
+new class starts.
+"""
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.utils import timezone
+
+from .attendance import schedule_brief
+from .models import Attendance, ClassSchedule, Enrollment
+
+AT_RISK_RATE = 0.6      # attended less than this share of the classes so far
+AT_RISK_STREAK = 3      # or missed this many classes in a row, up to the latest
+REPORT_TTL = 60 * 60 * 24
+
+
+def _version_key(batch_id):
+    return f"analytics:batch:{batch_id}:version"
+
+
+def _report_key(batch_id, version):
+    return f"analytics:batch:{batch_id}:{version}"
+
+
+def bump_batches(*batch_ids):
+    """Invalidate the cached reports of these batches."""
+    for batch_id in {b for b in batch_ids if b}:
+        key = _version_key(batch_id)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:  # evicted between add and incr
+            cache.set(key, 1, None)
+
+
+# -------------------------------------------------------------------
+#  MATRIX
+# -------------------------------------------------------------------
+def attendance_matrix(batch_id, now=None):
+    """
+    (students DataFrame, [class dicts], boolean ndarray students x classes,
+    start of the next class or None). Classes are the started ones in start
+    order; students are everyone enrolled in the batch. Three flat queries.
+    """
+    now = now or timezone.now()
+    students = pd.DataFrame.from_records(
+        Enrollment.objects.filter(batch_id=batch_id).order_by('user__first_name', 'user__username')
+        .values('user_id', 'user__username', 'user__first_name', 'user__last_name', 'user__email'),
+        columns=['user_id', 'user__username', 'user__first_name', 'user__last_name', 'user__email'],
+    )
+    schedule = list(
+        ClassSchedule.objects.filter(batch_id=batch_id, start_time__isnull=False).order_by('start_time')
+        .values('id', 'topic', 'start_time')
+    )
+    classes = [c for c in schedule if c['start_time'] <= now]
+    next_class_at = schedule[len(classes)]['start_time'] if len(schedule) > len(classes) else None
+    pairs = np.array(
+        list(Attendance.objects.filter(class_schedule__batch_id=batch_id, class_schedule__start_time__lte=now)
+             .values_list('user_id', 'class_schedule_id')),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+
+    matrix = np.zeros((len(students), len(classes)), dtype=bool)
+    if len(pairs) and len(students) and len(classes):
+        rows = pd.Index(students['user_id']).get_indexer(pairs[:, 0])
+        cols = pd.Index([c['id'] for c in classes]).get_indexer(pairs[:, 1])
+        keep = (rows >= 0) & (cols >= 0)  # attendance of students no longer enrolled is ignored
+        matrix[rows[keep], cols[keep]] = True
+    return students, classes, matrix, next_class_at
+
+
+def missed_streaks(matrix):
+    """(current, longest) runs of missed classes per row, without a Python loop over students."""
+    n_students, n_classes = matrix.shape
+    if n_classes == 0:
+        zeros = np.zeros(n_students, dtype=int)
+        return zeros, zeros
+    missed = ~matrix
+    # Trailing misses: position of the last attended class from the end
+    attended_any = matrix.any(axis=1)
+    current = np.where(attended_any, np.argmax(matrix[:, ::-1], axis=1), n_classes)
+    # Longest run: running count of misses, reset at every attendance
+    idx = np.arange(1, n_classes + 1)
+    last_attended = np.maximum.accumulate(np.where(matrix, idx, 0), axis=1)
+    runs = np.where(missed, idx - last_attended, 0)
+    return current, runs.max(axis=1)
+
+
+def build_report(batch_id, now=None):
+    now = now or timezone.now()
+    students, classes, matrix, next_class_at = attendance_matrix(batch_id, now)
+    n_classes = matrix.shape[1]
+    attended = matrix.sum(axis=1)
+    rates = attended / n_classes if n_classes else np.zeros(len(students))
+    current, longest = missed_streaks(matrix)
+    at_risk = (n_classes > 0) & ((rates < AT_RISK_RATE) | (current >= AT_RISK_STREAK))
+
+    names = (students['user__first_name'] + ' ' + students['user__last_name']).str.strip()
+    names = names.where(names != '', students['user__username'])
+    class_attended = matrix.sum(axis=0)
+    class_rates = class_attended / len(students) if len(students) else np.zeros(n_classes)
+
+    return {
+        'students': sorted([
+            {
+                'user_id': int(user_id), 'name': name, 'email': email, 'attended': int(a),
+                'rate': round(float(r) * 100, 1), 'missed_streak': int(c), 'longest_streak': int(l),
+                'at_risk': bool(risk), 'marks': row.tolist(),
+            }
+            for user_id, name, email, a, r, c, l, risk, row in zip(
+                students['user_id'], names, students['user__email'], attended, rates, current, longest, at_risk, matrix
+            )
+        ], key=lambda s: (not s['at_risk'], s['rate'])),
+        'classes': [
+            {**c, 'attended': int(a), 'rate': round(float(r) * 100, 1)}
+            for c, a, r in zip(classes, class_attended, class_rates)
+        ],
+        'overall_rate': round(float(matrix.mean()) * 100, 1) if matrix.size else 0.0,
+        'at_risk_count': int(at_risk.sum()),
+        'next_class_at': next_class_at,
+    }
+
+
+# -------------------------------------------------------------------
+#  CACHED ENTRY POINT
+# -------------------------------------------------------------------
+def batch_attendance(batch_id):
+    now = timezone.now()
+    version = cache.get(_version_key(batch_id), 0)
+    report = cache.get(_report_key(batch_id, version))
+    # A class starting adds a column, so the report also expires then
+    if report is None or (report['next_class_at'] and report['next_class_at'] <= now):
+        report = build_report(batch_id, now)
+        cache.set(_report_key(batch_id, version), report, REPORT_TTL)
+    return report
+
+
+# -------------------------------------------------------------------
+#  INVALIDATION (connected in TrainingConfig.ready)
+# -------------------------------------------------------------------
+def attendance_changed(sender, instance, **kwargs):
+    bump_batches((schedule_brief(instance.class_schedule_id) or {}).get('batch_id'))
+
+
+def batch_member_changed(sender, instance, **kwargs):
+    """Enrollment / ClassSchedule saved or deleted."""
+    bump_batches(instance.batch_id)
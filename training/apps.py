@@ -5,3 +5,21 @@ class TrainingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'training'
     verbose_name = "Training Programs"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from . import analytics, attendance, ics
+        from .entitlements import connect_signals
+        from .models import Attendance, Batch, ClassSchedule, Enrollment, Workshop
+
+        connect_signals()
+        post_save.connect(attendance.schedule_changed, sender=ClassSchedule, dispatch_uid='attendance_schedule_save')
+        post_delete.connect(attendance.schedule_changed, sender=ClassSchedule, dispatch_uid='attendance_schedule_delete')
+        for model in (Enrollment, ClassSchedule):
+            post_save.connect(analytics.batch_member_changed, sender=model, dispatch_uid=f'analytics_{model.__name__}_save')
+            post_delete.connect(analytics.batch_member_changed, sender=model, dispatch_uid=f'analytics_{model.__name__}_delete')
+        post_save.connect(analytics.attendance_changed, sender=Attendance, dispatch_uid='analytics_attendance_save')
+        post_delete.connect(analytics.attendance_changed, sender=Attendance, dispatch_uid='analytics_attendance_delete')
+        for model in (Batch, Workshop):
+            post_save.connect(ics.labels_changed, sender=model, dispatch_uid=f'ics_{model.__name__}_save')
+            post_delete.connect(ics.labels_changed, sender=model, dispatch_uid=f'ics_{model.__name__}_delete')
@@ -0,0 +1,165 @@
+"""
+Write-behind attendance for the class-start burst.
+
+When a class starts the whole batch clicks "Join" within a minute. Instead
+of a SELECT + INSERT per click before the redirect, a join is appended to a
+buffer in the shared cache and `flush_attendance` (run every minute by
+scheduler.py) writes the buffer with one bulk INSERT ... IGNORE.
+
+The buffer is a sequence of numbered slots:
+
+    attendance:seq        last slot handed out (atomic incr)
+    attendance:flushed    last slot written to the database
+    attendance:horizon    last slot handed out as of the previous flush
+    attendance:item:<n>   (user_id, schedule_id, joined_at)
+    attendance:seen:<user>:<schedule>   slot of the user's buffered join, also read by the calendar
+
+With a per-process cache (LocMem, i.e. no REDIS_URL) the flusher could not
+see the buffer, so joins are written straight away (still one INSERT, no
+SELECT). ATTENDANCE_WRITE_BEHIND overrides the choice.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Attendance, ClassSchedule
+
+SEQ_KEY = 'attendance:seq'
+FLUSHED_KEY = 'attendance:flushed'
+HORIZON_KEY = 'attendance:horizon'
+SEEN_TTL = 60 * 60 * 12
+ITEM_TTL = 60 * 60 * 24
+SCHEDULE_TTL = 60 * 10
+
+
+def _item_key(n):
+    return f"attendance:item:{n}"
+
+
+def _seen_key(user_id, schedule_id):
+    return f"attendance:seen:{user_id}:{schedule_id}"
+
+
+def write_behind_enabled():
+    enabled = getattr(settings, 'ATTENDANCE_WRITE_BEHIND', None)
+    if enabled is None:
+        enabled = 'locmem' not in settings.CACHES['default']['BACKEND'].lower()
+    return enabled
+
+
+# -------------------------------------------------------------------
+#  SCHEDULE LOOKUP (cached; dropped by the receivers below)
+# -------------------------------------------------------------------
+def _schedule_key(schedule_id):
+    return f"attendance:schedule:{schedule_id}"
+
+
+def schedule_brief(schedule_id):
+    """{'batch_id', 'meeting_link'} for a schedule, or None if it doesn't exist."""
+    brief = cache.get(_schedule_key(schedule_id))
+    if brief is None:
+        row = ClassSchedule.objects.filter(id=schedule_id).values('batch_id', 'meeting_link').first()
+        brief = row or {}
+        cache.set(_schedule_key(schedule_id), brief, SCHEDULE_TTL)
+    return brief or None
+
+
+def schedule_changed(sender, instance, **kwargs):
+    cache.delete(_schedule_key(instance.pk))
+
+
+def _bump_analytics(*batch_ids):
+    # bulk_create sends no post_save, so tell the attendance reports directly
+    from .analytics import bump_batches
+    bump_batches(*batch_ids)
+
+
+# -------------------------------------------------------------------
+#  RECORDING
+# -------------------------------------------------------------------
+def record_join(user_id, schedule_id, joined_at=None):
+    """
+    Record that a user joined a class. Repeat joins are ignored while the
+    first one is still waiting in the buffer.
+
+    The seen marker holds the join's slot and is written only once the item
+    is stored. Once the flush has moved past that slot the marker no longer
+    blocks anything, so a join whose item was lost (evicted) is recorded
+    again on the next click; a join already written is skipped by the
+    INSERT ... IGNORE.
+    """
+    joined_at = joined_at or timezone.now()
+    if not write_behind_enabled():
+        Attendance.objects.bulk_create(
+            [Attendance(user_id=user_id, class_schedule_id=schedule_id, joined_at=joined_at)], ignore_conflicts=True
+        )
+        _bump_analytics((schedule_brief(schedule_id) or {}).get('batch_id'))
+        return
+    seen = cache.get(_seen_key(user_id, schedule_id))
+    if seen is not None and seen > cache.get(FLUSHED_KEY, 0):
+        return  # already buffered (double click, reload)
+    cache.add(SEQ_KEY, 0, None)
+    n = cache.incr(SEQ_KEY)
+    cache.set(_item_key(n), (user_id, schedule_id, joined_at), ITEM_TTL)
+    cache.set(_seen_key(user_id, schedule_id), n, SEEN_TTL)
+
+
+def pending_schedule_ids(user_id, schedule_ids):
+    """Schedules the user joined whose attendance may not be flushed yet."""
+    if not write_behind_enabled():
+        return set()
+    keys = {_seen_key(user_id, sid): sid for sid in schedule_ids}
+    return {keys[key] for key in cache.get_many(list(keys))}
+
+
+# -------------------------------------------------------------------
+#  FLUSHING
+# -------------------------------------------------------------------
+def flush_attendance(batch_size=1000):
+    """
+    Write buffered joins to the database; returns the number of joins written.
+
+    A slot can be handed out a moment before its item is stored, so a missing
+    item handed out since the previous run may still be in flight: the flush
+    stops there and picks it up next time. Items missing below the previous
+    run's horizon were lost (evicted from the cache) and are skipped in the
+    same pass, however many there are.
+    """
+    last = cache.get(SEQ_KEY, 0)
+    flushed = cache.get(FLUSHED_KEY, 0)
+    horizon = cache.get(HORIZON_KEY, 0)
+    if flushed > last:
+        # The sequence itself was evicted and restarted from 0
+        flushed = horizon = 0
+        cache.set(FLUSHED_KEY, 0, None)
+    horizon = min(horizon, last)
+    written = 0
+    while flushed < last:
+        numbers = range(flushed + 1, min(last, flushed + batch_size) + 1)
+        items = cache.get_many([_item_key(n) for n in numbers])
+        rows, cursor = [], flushed
+        for n in numbers:
+            item = items.get(_item_key(n))
+            if item is None:
+                if n > horizon:
+                    break  # may still be in flight
+                # handed out before the previous run and still missing: lost, move on
+            else:
+                user_id, schedule_id, joined_at = item
+                rows.append(Attendance(user_id=user_id, class_schedule_id=schedule_id, joined_at=joined_at))
+            cursor = n
+
+        # A class deleted since the join takes its attendance with it
+        live = dict(ClassSchedule.objects.filter(id__in={r.class_schedule_id for r in rows}).values_list('id', 'batch_id'))
+        Attendance.objects.bulk_create(
+            [r for r in rows if r.class_schedule_id in live], batch_size=batch_size, ignore_conflicts=True
+        )
+        _bump_analytics(*{live[r.class_schedule_id] for r in rows if r.class_schedule_id in live})
+        cache.set(FLUSHED_KEY, cursor, None)
+        cache.delete_many([_item_key(n) for n in range(flushed + 1, cursor + 1)])
+        written += len(rows)
+        if cursor < numbers[-1]:
+            break
+        flushed = cursor
+    cache.set(HORIZON_KEY, last, None)
+    return written
@@ -0,0 +1,196 @@
+"""
+Bulk coupons for a whole cohort.
+
+    result = issue_coupons(batch, read_student_csv(fh), valid_days=90)
+    send_coupon_emails(result.coupons)
+
+The CSV needs an `email` column; `amount` and `payment_date` (YYYY-MM-DD)
+are optional per row. Students are matched to existing accounts by email
+in one query, codes are generated and checked for collisions in one query,
+and the coupons are written with one bulk INSERT. Students who already have
+an enrollment in the batch (renewals) get their access window extended
+with one UPDATE per distinct expiry date. Emails then go out one by one
+over a single SMTP connection; Coupon.emailed_at records which ones arrived,
+so a failure shows up on that coupon instead of hiding its whole chunk.
+"""
+import csv
+import io
+import threading
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMultiAlternatives
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .entitlements import invalidate_entitlements
+from .mailing import LazyConnection, send_and_mark
+from .models import Coupon, Enrollment
+
+EMAIL_BATCH_SIZE = 50
+
+
+class CouponCSVError(ValueError):
+    pass
+
+
+class CouponIssue:
+    """Outcome of issue_coupons()."""
+    def __init__(self):
+        self.coupons = []
+        self.errors = []        # [(row number, message)]
+        self.renewed = 0        # existing enrollments whose expiry moved
+
+
+# -------------------------------------------------------------------
+#  CSV
+# -------------------------------------------------------------------
+def read_student_csv(fh):
+    """[(row number, {'email', 'amount', 'payment_date'})] from a CSV file (text or bytes)."""
+    content = fh.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(content))
+    columns = {(name or '').strip().lower(): name for name in reader.fieldnames or []}
+    if 'email' not in columns:
+        raise CouponCSVError("The CSV needs an 'email' column.")
+
+    rows = []
+    for number, raw in enumerate(reader, start=2):
+        get = lambda column: (raw.get(columns[column]) or '').strip() if column in columns else ''
+        rows.append((number, {'email': get('email'), 'amount': get('amount'), 'payment_date': get('payment_date')}))
+    return rows
+
+
+# -------------------------------------------------------------------
+#  ISSUING
+# -------------------------------------------------------------------
+def generate_codes(n):
+    """n distinct coupon codes not already in use (same shape as Coupon.save)."""
+    codes = set()
+    while len(codes) < n:
+        fresh = {str(uuid.uuid4()).upper()[:12] for _ in range(n - len(codes))} - codes
+        taken = set(Coupon.objects.filter(code__in=fresh).values_list('code', flat=True))
+        codes |= fresh - taken
+    return list(codes)
+
+
+@transaction.atomic
+def issue_coupons(batch, rows, valid_days=30, valid_until=None, payment_date=None):
+    """
+    One coupon per CSV row for `batch`. Dates follow CouponAdmin.save_model:
+    payment date defaults to today, access starts on the payment date and
+    lasts `valid_days` unless `valid_until` is given.
+    """
+    result = CouponIssue()
+    today = timezone.now().date()
+
+    emails = {row['email'].lower() for _, row in rows if row['email']}
+    users = {
+        u.email_lower: u
+        for u in User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails)
+    }
+
+    pending, seen = [], set()
+    for number, row in rows:
+        email = row['email'].lower()
+        if not email:
+            result.errors.append((number, "Missing email."))
+            continue
+        user = users.get(email)
+        if user is None:
+            result.errors.append((number, f"No account with email {row['email']}."))
+            continue
+        if email in seen:
+            result.errors.append((number, f"{row['email']} appears more than once."))
+            continue
+        try:
+            amount = Decimal(row['amount']) if row['amount'] else None
+            paid_on = date.fromisoformat(row['payment_date']) if row['payment_date'] else (payment_date or today)
+        except (InvalidOperation, ValueError):
+            result.errors.append((number, "Invalid amount or payment_date."))
+            continue
+        seen.add(email)
+        pending.append(Coupon(
+            batch=batch,
+            assigned_to=user,
+            valid_days=valid_days,
+            enrollment_valid_from=paid_on,
+            enrollment_valid_until=valid_until or (paid_on + timedelta(days=valid_days)),
+            payment_amount=amount,
+            payment_date=paid_on,
+        ))
+
+    for coupon, code in zip(pending, generate_codes(len(pending))):
+        coupon.code = code
+    # bulk_create skips Coupon.save(), so the enrollment sync happens below in bulk
+    result.coupons = Coupon.objects.bulk_create(pending)
+    for coupon in result.coupons:
+        coupon.batch = batch  # emails read batch.workshop without a query each
+
+    user_ids = [c.assigned_to_id for c in result.coupons]
+    result.renewed = Enrollment.sync_expiry_many(batch.pk, user_ids)
+    invalidate_entitlements(*user_ids)
+    return result
+
+
+# -------------------------------------------------------------------
+#  EMAIL
+# -------------------------------------------------------------------
+def coupon_email(coupon, domain="127.0.0.1:8000", connection=None):
+    subject = f"Your Access Code for {coupon.batch.workshop.title}"
+    html_message = render_to_string('training/emails/coupon_email.html', {
+        'user': coupon.assigned_to,
+        'coupon': coupon,
+        'code': coupon.code,
+        'batch': coupon.batch,
+        'valid_days': coupon.valid_days,
+        'domain': domain,
+    })
+    plain_message = f"""
+Hello {coupon.assigned_to.first_name},
+
+You have been granted access to {coupon.batch.workshop.title} ({coupon.batch.name}).
+Your access code is: {coupon.code}
+
+Redeem it here: http://{domain}/training-program/
+"""
+    message = EmailMultiAlternatives(
+        subject, plain_message, settings.EMAIL_HOST_USER, [coupon.assigned_to.email], connection=connection
+    )
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
+def send_coupon_emails(coupons, batch_size=EMAIL_BATCH_SIZE):
+    """
+    Email each coupon over one SMTP connection and set emailed_at on those
+    that went out, one UPDATE per `batch_size` coupons. Returns (sent, failed).
+    """
+    coupons = [c for c in coupons if c.assigned_to and c.assigned_to.email and c.emailed_at is None]
+    mail = LazyConnection()
+    now = timezone.now()
+    try:
+        sent, refused, failed, _ = send_and_mark(
+            coupons, coupon_email,
+            lambda ids: Coupon.objects.filter(pk__in=ids).update(emailed_at=now),
+            mail, batch_size, mark_refused=False,
+        )
+    finally:
+        mail.close()
+    return sent, refused + failed
+
+
+def send_coupon_emails_in_background(coupons):
+    def work():
+        try:
+            send_coupon_emails(coupons)
+        finally:
+            connection.close()
+
+    threading.Thread(target=work, daemon=True).start()
@@ -0,0 +1,131 @@
+"""
+Per-user entitlements: what a signed-in user may see and open.
+
+    ents = get_entitlements(request.user)
+    ents.is_tutor, ents.active_batch_ids, ents.is_active_student, ents.can_open(quiz)
+
+Computed once (four small queries), cached for ENTITLEMENT_CACHE_TTL seconds
+and memoised on the user object for the rest of the request. The signal
+receivers below drop the cached copy whenever an enrollment, coupon, quiz
+grant, tutor group membership or class schedule of the user changes, so
+the TTL only bounds staleness for changes made outside the ORM.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from quizzes.models import QuizAccessGrant
+from .models import ClassSchedule, Coupon, Enrollment
+
+TUTOR_GROUP = 'Tutor'
+
+
+def _key(user_id):
+    return f"entitlements:{user_id}"
+
+
+class Entitlements:
+    def __init__(self, is_tutor=False, batches=None, unlocked_quiz_ids=()):
+        self.is_tutor = is_tutor
+        self.batches = batches or {}                 # {batch_id: expires_at}
+        self.unlocked_quiz_ids = frozenset(unlocked_quiz_ids)
+
+    @property
+    def active_batch_ids(self):
+        # Expiry is checked on read, so an enrollment lapsing mid-TTL is not served stale
+        now = timezone.now()
+        return [batch_id for batch_id, expires_at in self.batches.items() if expires_at > now]
+
+    @property
+    def is_active_student(self):
+        return bool(self.active_batch_ids)
+
+    def can_open(self, quiz):
+        """Practice quizzes are open to all; other quizzes need a coupon grant."""
+        return quiz.quiz_type.lower() == 'practice' or quiz.pk in self.unlocked_quiz_ids
+
+
+def _compute(user):
+    is_tutor = (
+        user.is_superuser
+        or user.groups.filter(name=TUTOR_GROUP).exists()
+        or ClassSchedule.objects.filter(tutor=user).exists()
+    )
+    return Entitlements(
+        is_tutor=is_tutor,
+        batches=dict(Enrollment.objects.filter(user=user).values_list('batch_id', 'expires_at')),
+        unlocked_quiz_ids=QuizAccessGrant.objects.filter(user=user).values_list('quiz_id', flat=True),
+    )
+
+
+def get_entitlements(user):
+    if not user.is_authenticated:
+        return Entitlements()
+    ents = getattr(user, '_entitlements', None)
+    if ents is None:
+        ents = cache.get(_key(user.pk))
+        if ents is None:
+            ents = _compute(user)
+            cache.set(_key(user.pk), ents, getattr(settings, 'ENTITLEMENT_CACHE_TTL', 300))
+        user._entitlements = ents
+    return ents
+
+
+def invalidate_entitlements(*user_ids):
+    keys = [_key(user_id) for user_id in user_ids if user_id]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # ...and again once the change is visible to other requests, so one that
+    # read the old rows mid-transaction can't leave them cached
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+# -------------------------------------------------------------------
+#  INVALIDATION (connected in TrainingConfig.ready)
+# -------------------------------------------------------------------
+def user_owned_changed(sender, instance, **kwargs):
+    """Enrollment / QuizAccessGrant saved or deleted."""
+    invalidate_entitlements(instance.user_id)
+
+
+def coupon_changed(sender, instance, **kwargs):
+    # Coupon saves re-sync Enrollment.expires_at with a bulk UPDATE (no Enrollment signal)
+    invalidate_entitlements(instance.assigned_to_id)
+
+
+def schedule_changed(sender, instance, **kwargs):
+    invalidate_entitlements(instance.tutor_id)
+
+
+def groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.groups.add/remove/clear(...)
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_entitlements(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # group.user_set.add/remove(...)
+        invalidate_entitlements(*pk_set)
+    elif action == 'pre_clear':
+        invalidate_entitlements(*instance.user_set.values_list('pk', flat=True))
+
+
+def user_changed(sender, instance, **kwargs):
+    # Covers is_superuser edits, and a recycled user id never inherits a cached entry
+    invalidate_entitlements(instance.pk)
+
+
+def connect_signals():
+    from django.db.models.signals import m2m_changed, post_delete, post_save
+
+    for model in (Enrollment, QuizAccessGrant):
+        post_save.connect(user_owned_changed, sender=model, dispatch_uid=f'entitlements_{model.__name__}_save')
+        post_delete.connect(user_owned_changed, sender=model, dispatch_uid=f'entitlements_{model.__name__}_delete')
+    post_save.connect(coupon_changed, sender=Coupon, dispatch_uid='entitlements_coupon_save')
+    post_delete.connect(coupon_changed, sender=Coupon, dispatch_uid='entitlements_coupon_delete')
+    post_save.connect(schedule_changed, sender=ClassSchedule, dispatch_uid='entitlements_schedule_save')
+    post_delete.connect(schedule_changed, sender=ClassSchedule, dispatch_uid='entitlements_schedule_delete')
+    m2m_changed.connect(groups_changed, sender=User.groups.through, dispatch_uid='entitlements_groups')
+    post_save.connect(user_changed, sender=User, dispatch_uid='entitlements_user')
@@ -0,0 +1,128 @@
+"""
+Class schedule events for the calendars (student + tutor) and the JSON feed.
+
+Everything here filters on `start_time` ranges (start <= t < end) so the
+index on ClassSchedule.start_time can be used; `__year`/`__month` lookups
+wrap the column in a function and can't.
+"""
+import hashlib
+from datetime import date, datetime, timedelta
+
+from django.db.models import Count, Max, Q
+
+from .attendance import pending_schedule_ids, write_behind_enabled
+from .models import Attendance, ClassSchedule
+
+MAX_RANGE_DAYS = 100  # a quarter (plus slack) per request
+
+
+def month_range(year, month):
+    """[first day of month, first day of next month) as naive datetimes."""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def parse_range(start, end, today):
+    """Parse ?start=YYYY-MM-DD&end=YYYY-MM-DD (end exclusive); default to today's month."""
+    if not start and not end:
+        return month_range(today.year, today.month)
+    try:
+        start = datetime.combine(date.fromisoformat(start), datetime.min.time())
+        end = datetime.combine(date.fromisoformat(end), datetime.min.time())
+    except (TypeError, ValueError):
+        raise ValueError("start and end must be dates (YYYY-MM-DD).")
+    if end <= start:
+        raise ValueError("end must be after start.")
+    if end - start > timedelta(days=MAX_RANGE_DAYS):
+        raise ValueError(f"Range is limited to {MAX_RANGE_DAYS} days.")
+    return start, end
+
+
+def schedules_in_range(start, end, batch_ids=None, tutor=None):
+    schedules = ClassSchedule.objects.filter(start_time__gte=start, start_time__lt=end)
+    if tutor is not None:
+        schedules = schedules.filter(tutor=tutor)
+    else:
+        schedules = schedules.filter(batch_id__in=batch_ids)
+    return schedules
+
+
+def event_status(schedule, now, attended_ids=None):
+    """
+    Student view: joined if attended, missed if over and not attended, else upcoming.
+    Tutor view (attended_ids is None): past classes count as done ('joined').
+    """
+    is_past = bool(schedule.end_time and now > schedule.end_time)
+    if attended_ids is None:
+        return ('joined' if is_past else 'upcoming'), is_past
+    if schedule.id in attended_ids:
+        # If they attended, it is ALWAYS joined (whether past or active)
+        return 'joined', is_past
+    return ('missed' if is_past else 'upcoming'), is_past
+
+
+def events_by_day(schedules, now, attended_ids=None):
+    """{day_of_month: [{'schedule', 'status', 'is_past'}]} for the month grid partial."""
+    events_map = {}
+    for sched in schedules:
+        status, is_past = event_status(sched, now, attended_ids)
+        events_map.setdefault(sched.start_time.day, []).append({
+            'schedule': sched,
+            'status': status,
+            'is_past': is_past
+        })
+    return events_map
+
+
+def attended_ids_in(user, schedules):
+    """Schedules the user attended, including joins still waiting in the write-behind buffer."""
+    schedules = list(schedules)
+    attended = set(
+        Attendance.objects.filter(user=user, class_schedule__in=schedules).values_list('class_schedule_id', flat=True)
+    )
+    return attended | pending_schedule_ids(user.pk, [s.id for s in schedules])
+
+
+def feed_version(schedules, now, user=None, scope=''):
+    """
+    ETag for a set of events from two aggregate queries.
+
+    The feed changes when a schedule is added/edited/removed, when the user
+    joins a class, or when a class ends (upcoming -> missed/done), so all
+    three go into the validator, along with `scope` (who is asking and
+    for which batches). Joins still in the write-behind buffer count too,
+    since the body already shows them as joined.
+
+    There is deliberately no Last-Modified: deleting a class or an
+    attendance changes the feed without moving any timestamp forward, so
+    If-Modified-Since would answer 304 for a stale body.
+    """
+    stats = schedules.aggregate(
+        n=Count('id'),
+        updated=Max('updated_at'),
+        ended=Count('id', filter=Q(end_time__lt=now)),
+    )
+    joined = {'n': 0, 'last': None}
+    pending = set()
+    if user is not None:
+        joined = Attendance.objects.filter(user=user, class_schedule__in=schedules).aggregate(
+            n=Count('id'), last=Max('joined_at')
+        )
+        if write_behind_enabled():
+            pending = pending_schedule_ids(user.pk, list(schedules.values_list('id', flat=True)))
+    raw = (f"{scope}:{stats['n']}:{stats['updated']}:{stats['ended']}:{joined['n']}:{joined['last']}"
+           f":{sorted(pending)}")
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def event_payload(schedule, status):
+    return {
+        'id': schedule.id,
+        'topic': schedule.topic,
+        'start': schedule.start_time.isoformat(),
+        'end': schedule.end_time.isoformat() if schedule.end_time else None,
+        'batch': schedule.batch.name,
+        'workshop': schedule.batch.workshop.title,
+        'status': status,
+    }
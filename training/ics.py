@@ -0,0 +1,190 @@
+"""
+Per-user iCalendar (.ics) feed of class schedules.
+
+Students subscribe to /training/calendar/<token>.ics in Google/Apple/Outlook
+calendar. The token is the user id signed with a per-user salt
+(Profile.calendar_salt), so the URL works without a login session (calendar
+clients don't have one) and a leaked link can be revoked by resetting the
+salt (reset_feed_token).
+
+The feed only depends on the set of batches a user is enrolled in, so the
+rendered text is cached per batch-set *version*: the batch ids, the count
+and latest `updated_at` of their schedules per tutor together with that
+tutor's name, and a generation number bumped whenever a batch or workshop
+is edited, since those appear in the events too. Any change produces a new
+key (and ETag), everyone else shares the cached copy, and polling clients
+mostly get 304s. Saving a user only changes the feeds that show them as a
+tutor.
+
+Times are written in UTC (the trailing Z), so no VTIMEZONE block is needed.
+"""
+import hashlib
+import secrets
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import ClassSchedule
+
+SIGNING_SALT = 'training.ics'
+PRODID = '-//TGAYS Technology//QuizMaster Training//EN'
+ICS_CACHE_TTL = 60 * 60 * 24
+GENERATION_KEY = 'ics:generation'
+
+
+# -------------------------------------------------------------------
+#  FEED TOKENS
+# -------------------------------------------------------------------
+def _signer(calendar_salt):
+    # An empty salt keeps the links handed out before salts existed valid
+    return signing.Signer(salt=f"{SIGNING_SALT}:{calendar_salt}" if calendar_salt else SIGNING_SALT)
+
+
+def _calendar_salt(user):
+    try:
+        return user.profile.calendar_salt
+    except User.profile.RelatedObjectDoesNotExist:
+        return ''
+
+
+def feed_token(user):
+    return _signer(_calendar_salt(user)).sign(str(user.pk))
+
+
+def feed_user(token):
+    """The active user a feed token belongs to, or None if it was tampered with or reset."""
+    try:
+        user_id = int(token.split(':', 1)[0])
+    except ValueError:
+        return None
+    user = User.objects.select_related('profile').filter(pk=user_id, is_active=True).first()
+    if user is None:
+        return None
+    try:
+        _signer(_calendar_salt(user)).unsign(token)
+    except signing.BadSignature:
+        return None
+    return user
+
+
+def reset_feed_token(user):
+    """Give the user a new feed link; the old one stops working."""
+    user.profile.calendar_salt = secrets.token_hex(16)
+    user.profile.save(update_fields=['calendar_salt'])
+    return feed_token(user)
+
+
+# -------------------------------------------------------------------
+#  VERSION (ETag / cache key)
+# -------------------------------------------------------------------
+def bump_feeds():
+    cache.add(GENERATION_KEY, 0, None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:  # evicted between add and incr
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def labels_changed(sender, instance, **kwargs):
+    """Batch / Workshop saved or deleted: names shown in every feed may have changed."""
+    bump_feeds()
+
+
+def feed_version(batch_ids):
+    """Cache key (doubles as the ETag) for the feed of `batch_ids`, from one aggregate query."""
+    # Grouped by tutor, so renaming (or deleting) a tutor changes only the feeds they appear in
+    stats = list(
+        ClassSchedule.objects.filter(batch_id__in=batch_ids)
+        .values_list('tutor_id', 'tutor__first_name', 'tutor__last_name', 'tutor__username')
+        .annotate(n=Count('id'), updated=Max('updated_at'))
+        .order_by('tutor_id')
+    )
+    raw = f"{sorted(batch_ids)}:{stats}:{cache.get(GENERATION_KEY, 0)}"
+    return f"ics:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+# -------------------------------------------------------------------
+#  RENDERING
+# -------------------------------------------------------------------
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """RFC 5545: lines longer than 75 octets continue on the next line after a space."""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts, limit = [], 75
+    while data:
+        cut = min(limit, len(data))
+        # don't split a multi-byte character
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data, limit = data[cut:], 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _stamp(dt):
+    """UTC form-2 date-time. With USE_TZ=False stored times are naive TIME_ZONE times."""
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt, timezone.get_default_timezone())
+    return dt.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def iter_ics_lines(schedules, domain='quizmaster.tgaystechnology.com'):
+    """Yield the folded lines of a VCALENDAR for `schedules`, one event at a time."""
+    yield _fold('BEGIN:VCALENDAR')
+    yield _fold('VERSION:2.0')
+    yield _fold(f'PRODID:{PRODID}')
+    yield _fold('CALSCALE:GREGORIAN')
+    yield _fold('X-WR-CALNAME:Training Classes')
+    yield _fold(f'X-WR-TIMEZONE:{timezone.get_default_timezone_name()}')  # display hint only
+    for sched in schedules:
+        if not sched.start_time:
+            continue
+        end_time = sched.end_time or sched.start_time
+        description = [f"{sched.batch.workshop.title} - {sched.batch.name}"]
+        if sched.tutor_id:
+            description.append(f"Tutor: {sched.tutor.get_full_name() or sched.tutor.username}")
+        if sched.meeting_link:
+            description.append(f"Join: {sched.meeting_link}")
+        if sched.description:
+            description.append(sched.description)
+
+        yield _fold('BEGIN:VEVENT')
+        yield _fold(f'UID:class-{sched.id}@{domain}')
+        yield _fold(f'DTSTAMP:{_stamp(sched.updated_at)}')
+        yield _fold(f'DTSTART:{_stamp(sched.start_time)}')
+        yield _fold(f'DTEND:{_stamp(end_time)}')
+        yield _fold(f'SUMMARY:{_escape(sched.topic)}')
+        yield _fold(f'DESCRIPTION:{_escape(chr(10).join(description))}')
+        if sched.meeting_link:
+            yield _fold(f'URL:{sched.meeting_link}')
+            yield _fold(f'LOCATION:{_escape(sched.meeting_link)}')
+        yield _fold('END:VEVENT')
+    yield _fold('END:VCALENDAR')
+
+
+def render_feed(batch_ids):
+    """(etag, text) of the feed for `batch_ids`, rendered once per version and cached."""
+    key = feed_version(batch_ids)
+    text = cache.get(key)
+    if text is None:
+        schedules = (
+            ClassSchedule.objects.filter(batch_id__in=batch_ids, start_time__isnull=False)
+            .select_related('batch__workshop', 'tutor')
+            .order_by('start_time')
+            .iterator(chunk_size=500)
+        )
+        text = ''.join(iter_ics_lines(schedules))
+        cache.set(key, text, ICS_CACHE_TTL)
+    return key.split(':', 1)[1], text
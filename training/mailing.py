@@ -0,0 +1,62 @@
+"""
+Sending a run of emails over one SMTP connection without letting one bad
+address hold back the rest. Used by the renewal sweep (renewals.py) and the
+bulk coupon emails (coupons.py).
+"""
+import smtplib
+
+from django.core.mail import get_connection
+
+
+class LazyConnection:
+    """One SMTP connection for a whole run, opened only once there is something to send."""
+    def __init__(self):
+        self.connection = get_connection(fail_silently=False)
+        self.opened = False
+
+    def send(self, message):
+        if not self.opened:
+            self.connection.open()
+            self.opened = True
+        message.connection = self.connection
+        return self.connection.send_messages([message]) or 0
+
+    def close(self):
+        if self.opened:
+            self.connection.close()
+
+
+def send_and_mark(items, build, mark, mail, batch_size, mark_refused=True):
+    """
+    Email `items` one message at a time, so one refused address can't hold
+    back (or re-send) the others, and `mark` the ids of those that went out
+    with one UPDATE per `batch_size` items. Items without an email address
+    and (unless mark_refused is False) refused addresses are marked too;
+    other failures stay unmarked and are retried next run.
+    Returns (sent, refused, failed, marked), where `failed` counts only the
+    temporary failures.
+    """
+    sent = refused = failed = marked = 0
+    done = []
+    for item in items:
+        message = build(item)
+        if message is not None:
+            try:
+                sent += mail.send(message)
+            except smtplib.SMTPRecipientsRefused as e:
+                # The address itself is bad: retrying every minute won't help
+                refused += 1
+                print(f"Email refused for {message.to}: {e}")
+                if not mark_refused:
+                    continue
+            except Exception as e:
+                failed += 1
+                print(f"Error sending email to {message.to}: {e}")
+                continue
+        done.append(item.pk)
+        if len(done) == batch_size:
+            marked += mark(done)
+            done = []
+    if done:
+        marked += mark(done)
+    return sent, refused, failed, marked
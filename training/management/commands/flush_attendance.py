@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from training.attendance import flush_attendance
+
+
+class Command(BaseCommand):
+    help = 'Write buffered class joins (write-behind attendance) to the database'
+
+    def handle(self, *args, **kwargs):
+        written = flush_attendance()
+        if written:
+            self.stdout.write(self.style.SUCCESS(f"Recorded {written} class joins"))
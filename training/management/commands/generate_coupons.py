@@ -0,0 +1,38 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from training.coupons import CouponCSVError, issue_coupons, read_student_csv, send_coupon_emails
+from training.models import Batch
+
+
+class Command(BaseCommand):
+    help = 'Generate one coupon per student in a CSV (email[,amount][,payment_date]) for a batch and email them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('batch_id', type=int)
+        parser.add_argument('csv_path')
+        parser.add_argument('--valid-days', type=int, default=30, help='Access length from each payment date')
+        parser.add_argument('--valid-until', type=date.fromisoformat, help='Fixed end of access (YYYY-MM-DD)')
+        parser.add_argument('--no-email', action='store_true', help="Don't email the codes")
+
+    def handle(self, *args, **options):
+        try:
+            batch = Batch.objects.select_related('workshop').get(pk=options['batch_id'])
+        except Batch.DoesNotExist:
+            raise CommandError(f"Batch {options['batch_id']} does not exist")
+        try:
+            with open(options['csv_path'], 'rb') as fh:
+                rows = read_student_csv(fh)
+        except (OSError, CouponCSVError) as e:
+            raise CommandError(str(e))
+
+        result = issue_coupons(batch, rows, valid_days=options['valid_days'], valid_until=options['valid_until'])
+        for row, message in result.errors:
+            self.stderr.write(f"Row {row}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(result.coupons)} coupons for {batch} ({result.renewed} enrollments extended)"
+        ))
+
+        if result.coupons and not options['no_email']:
+            sent, failed = send_coupon_emails(result.coupons)
+            self.stdout.write(f"Emailed {sent} students" + (f", {failed} failed" if failed else ""))
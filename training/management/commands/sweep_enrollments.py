@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from training.renewals import PAYMENT_NOTICE_DAYS, RENEWAL_NOTICE_DAYS, sweep_enrollments
+
+
+class Command(BaseCommand):
+    help = 'Send renewal and payment reminders and record expired enrollments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renewal-days', type=int, default=RENEWAL_NOTICE_DAYS,
+                            help='Remind students this many days before their access ends')
+        parser.add_argument('--payment-days', type=int, default=PAYMENT_NOTICE_DAYS,
+                            help='Remind students this many days before a payment is due')
+
+    def handle(self, *args, **options):
+        result = sweep_enrollments(renewal_days=options['renewal_days'], payment_days=options['payment_days'])
+        if result.reminded or result.payment_due or result.lapsed or result.renewed:
+            self.stdout.write(self.style.SUCCESS(
+                f"Renewal reminders: {result.reminded}, payment reminders: {result.payment_due}, "
+                f"expired: {result.lapsed}, renewed: {result.renewed}"
+            ))
+        if result.refused:
+            self.stderr.write(self.style.ERROR(f"{result.refused} emails were refused by the mail server; they won't be retried"))
+        if result.failed:
+            self.stderr.write(self.style.ERROR(f"{result.failed} emails failed; they will be retried"))
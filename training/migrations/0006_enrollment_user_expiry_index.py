@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0005_classschedule_tutor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['user', 'expires_at'], name='training_en_user_id_0044c5_idx'),
+        ),
+    ]
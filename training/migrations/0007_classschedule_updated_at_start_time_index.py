@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0006_enrollment_user_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classschedule',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='classschedule',
+            name='start_time',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Class start time', null=True),
+        ),
+    ]
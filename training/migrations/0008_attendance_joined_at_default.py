@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0007_classschedule_updated_at_start_time_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendance',
+            name='joined_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0008_attendance_joined_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='payment_reminder_for',
+            field=models.DateField(blank=True, editable=False, help_text='Due date the last payment reminder was sent for', null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='lapsed_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When the sweeper recorded the expiry', null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='renewal_reminder_for',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Expiry the last renewal reminder was sent for', null=True),
+        ),
+        migrations.AlterField(
+            model_name='coupon',
+            name='next_payment_date',
+            field=models.DateField(blank=True, db_index=True, help_text='Next installment/renewal date', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['expires_at'], name='training_en_expires_16dcfb_idx'),
+        ),
+    ]
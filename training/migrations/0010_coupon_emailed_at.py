@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0009_enrollment_sweeper_markers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='emailed_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When the code was emailed to the student', null=True),
+        ),
+    ]
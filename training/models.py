@@ -2,7 +2,10 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 import uuid
+from datetime import datetime, time
 from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 
 class Workshop(models.Model):
     title = models.CharField(max_length=200)
@@ -36,7 +39,7 @@ class ClassSchedule(models.Model):
     batch = models.ForeignKey(Batch, related_name='classes', on_delete=models.CASCADE)
     topic = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
-    start_time = models.DateTimeField(null=True, blank=True, help_text="Class start time")
+    start_time = models.DateTimeField(null=True, blank=True, db_index=True, help_text="Class start time")
     end_time = models.DateTimeField(null=True, blank=True, help_text="Class end time")
     meeting_link = models.URLField(max_length=500, blank=True, null=True, help_text="Zoom/Google Meet link")
     
@@ -47,6 +50,7 @@ class ClassSchedule(models.Model):
     tutor = models.ForeignKey(User, related_name='tutor_schedules', on_delete=models.SET_NULL, null=True, blank=True, help_text="Assigned Tutor")
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         time_str = self.start_time.strftime('%Y-%m-%d %H:%M') if self.start_time else "TBA"
@@ -75,7 +79,9 @@ class Coupon(models.Model):
     
     payment_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Amount paid in INR")
     payment_date = models.DateField(null=True, blank=True, help_text="Date of payment")
-    next_payment_date = models.DateField(null=True, blank=True, help_text="Next installment/renewal date")
+    next_payment_date = models.DateField(null=True, blank=True, db_index=True, help_text="Next installment/renewal date")
+    payment_reminder_for = models.DateField(null=True, blank=True, editable=False, help_text="Due date the last payment reminder was sent for")
+    emailed_at = models.DateTimeField(null=True, blank=True, editable=False, help_text="When the code was emailed to the student")
 
     is_used = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -90,32 +96,8 @@ class Coupon(models.Model):
 
         # --- AUTO-SYNC ENROLLMENT EXPIRY ---
         # If Admin edits a used coupon (e.g. extending date), update the Enrollment
-        if self.assigned_to and self.batch:
-            # Re-calculate max expiry from ALL coupons for this user/batch
-            # This ensures if we fix a date, the enrollment reflects the best valid date
-            
-            # Find related enrollment
-            enrollment = Enrollment.objects.filter(user=self.assigned_to, batch=self.batch).first()
-            if enrollment:
-                all_coupons = Coupon.objects.filter(assigned_to=self.assigned_to, batch=self.batch)
-                max_date = None
-                
-                for c in all_coupons:
-                    if c.enrollment_valid_until:
-                        # Convert Date to DateTime (End of Day)
-                        from datetime import datetime, time
-                        dt = datetime.combine(c.enrollment_valid_until, time.max)
-                        dt = datetime.combine(c.enrollment_valid_until, time.max)
-                        # USE_TZ=False, so keep naive
-                        # dt = timezone.make_aware(dt)
-                        
-                        if not max_date or dt > max_date:
-                            max_date = dt
-                
-                # If we found a valid max date from coupons, sync the enrollment
-                if max_date:
-                    enrollment.expires_at = max_date
-                    enrollment.save()
+        if self.assigned_to_id and self.batch_id:
+            Enrollment.sync_expiry(self.assigned_to_id, self.batch_id)
 
     def __str__(self):
         return f"{self.code} ({self.batch.name})"
@@ -126,9 +108,68 @@ class Enrollment(models.Model):
     batch = models.ForeignKey(Batch, related_name='enrollments', on_delete=models.CASCADE)
     enrolled_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(help_text="When user access to this batch expires")
-    
+
+    # Set by the sweep_enrollments job
+    renewal_reminder_for = models.DateTimeField(null=True, blank=True, editable=False, help_text="Expiry the last renewal reminder was sent for")
+    lapsed_at = models.DateTimeField(null=True, blank=True, editable=False, help_text="When the sweeper recorded the expiry")
+
     class Meta:
         unique_together = ('user', 'batch')
+        indexes = [models.Index(fields=['user', 'expires_at']), models.Index(fields=['expires_at'])]
+
+    @classmethod
+    def sync_expiry(cls, user_id, batch_id):
+        """
+        Set the enrollment's expiry to the end of the latest enrollment_valid_until
+        among ALL the user's coupons for the batch (one aggregate + one UPDATE).
+        This keeps expires_at the single source of truth for access: the
+        gatekeeper only has to compare it with now.
+
+        With no coupon left (e.g. the last one was refunded and deleted) access
+        ends now. If only coupons without an end date remain, the expiry set
+        from their valid_days at redemption is kept.
+        """
+        stats = Coupon.objects.filter(assigned_to_id=user_id, batch_id=batch_id).aggregate(
+            latest=models.Max('enrollment_valid_until'), n=models.Count('id')
+        )
+        if stats['latest']:
+            # USE_TZ=False, so keep naive (end of day)
+            cls.objects.filter(user_id=user_id, batch_id=batch_id).update(
+                expires_at=datetime.combine(stats['latest'], time.max)
+            )
+        elif not stats['n']:
+            now = timezone.now()
+            cls.objects.filter(user_id=user_id, batch_id=batch_id, expires_at__gt=now).update(expires_at=now)
+
+    @classmethod
+    def sync_expiry_many(cls, batch_id, user_ids):
+        """
+        sync_expiry() for many users of one batch: one grouped MAX() query,
+        one UPDATE per distinct latest date (usually just one) and one UPDATE
+        expiring the enrollments with no coupon left. Returns the number of
+        enrollments updated.
+        """
+        enrolled = cls.objects.filter(batch_id=batch_id, user_id__in=user_ids).values('user_id')
+        latest = (
+            Coupon.objects.filter(batch_id=batch_id, assigned_to_id__in=enrolled, enrollment_valid_until__isnull=False)
+            .values('assigned_to_id').annotate(latest=models.Max('enrollment_valid_until'))
+            .values_list('assigned_to_id', 'latest')
+        )
+        users_by_date = {}
+        for user_id, day in latest:
+            users_by_date.setdefault(day, []).append(user_id)
+        updated = 0
+        for day, ids in users_by_date.items():
+            updated += cls.objects.filter(batch_id=batch_id, user_id__in=ids).update(
+                expires_at=datetime.combine(day, time.max)
+            )
+        now = timezone.now()
+        coupon_holders = Coupon.objects.filter(batch_id=batch_id, assigned_to_id__isnull=False).values('assigned_to_id')
+        updated += (
+            cls.objects.filter(batch_id=batch_id, user_id__in=user_ids, expires_at__gt=now)
+            .exclude(user_id__in=coupon_holders).update(expires_at=now)
+        )
+        return updated
 
     def is_active(self):
         return self.expires_at > timezone.now()
@@ -140,7 +181,7 @@ class Enrollment(models.Model):
 class Attendance(models.Model):
     user = models.ForeignKey(User, related_name='attendances', on_delete=models.CASCADE)
     class_schedule = models.ForeignKey(ClassSchedule, related_name='attendances', on_delete=models.CASCADE)
-    joined_at = models.DateTimeField(auto_now_add=True)
+    joined_at = models.DateTimeField(default=timezone.now)  # set by the join, not the (possibly later) write
 
     class Meta:
         unique_together = ('user', 'class_schedule')
@@ -168,3 +209,10 @@ class Resource(models.Model):
     class Meta:
         verbose_name = "Resource"
         verbose_name_plural = "Resources"
+
+
+@receiver(post_delete, sender=Coupon)
+def sync_expiry_after_coupon_delete(sender, instance, **kwargs):
+    # Removing a coupon (e.g. a refund) recomputes access from the ones left
+    if instance.assigned_to_id and instance.batch_id:
+        Enrollment.sync_expiry(instance.assigned_to_id, instance.batch_id)
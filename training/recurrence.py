@@ -0,0 +1,122 @@
+"""
+Recurring class series: expand a weekly pattern in memory, check the tutor's
+calendar once, then insert the whole series in one go.
+
+    slots = expand_weekly(date(2025, 1, 6), date(2025, 3, 31), [0, 2, 4], time(18, 0),
+                          timedelta(minutes=90), exclude_dates={date(2025, 1, 26)})
+    conflicts = find_conflicts(tutor, slots)
+    if not conflicts:
+        create_series(batch, "Python Session {n}", slots, tutor=tutor)
+
+Per-row ClassSchedule.clean() costs one overlap query per class; here the
+tutor's existing classes in the series' span come back in one range query
+and are matched against the series with a sweep over both sorted lists.
+"""
+import heapq
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .analytics import bump_batches
+from .entitlements import invalidate_entitlements
+from .models import ClassSchedule
+
+WEEKDAY_CHOICES = [
+    (0, 'Mon'), (1, 'Tue'), (2, 'Wed'), (3, 'Thu'), (4, 'Fri'), (5, 'Sat'), (6, 'Sun'),
+]
+MAX_SLOTS = 500
+
+
+def expand_weekly(first_date, until, weekdays, start_time, duration, interval=1, exclude_dates=()):
+    """
+    [(start, end)] for every `weekdays` day (0 = Monday) from `first_date` to
+    `until` inclusive, every `interval` weeks (counted from first_date's week),
+    skipping `exclude_dates`.
+    """
+    weekdays = set(weekdays)
+    exclude_dates = set(exclude_dates)
+    week_zero = first_date - timedelta(days=first_date.weekday())
+    slots = []
+    day = first_date
+    while day <= until:
+        if (
+            day.weekday() in weekdays
+            and day not in exclude_dates
+            and ((day - week_zero).days // 7) % interval == 0
+        ):
+            start = datetime.combine(day, start_time)
+            slots.append((start, start + duration))
+            if len(slots) > MAX_SLOTS:
+                raise ValueError(f"A series is limited to {MAX_SLOTS} classes.")
+        day += timedelta(days=1)
+    return slots
+
+
+def find_conflicts(tutor, slots):
+    """
+    [(slot, existing)] for every slot overlapping one of the tutor's classes,
+    where `existing` is a dict with id, topic, start_time and end_time.
+    """
+    if tutor is None or not slots:
+        return []
+    slots = sorted(slots)
+    existing = list(
+        ClassSchedule.objects.filter(
+            tutor=tutor,
+            start_time__lt=max(end for _, end in slots),
+            end_time__gt=slots[0][0],
+        ).order_by('start_time').values('id', 'topic', 'start_time', 'end_time')
+    )
+
+    conflicts = []
+    active = []  # heap of (end_time, index) of existing classes that started before the current slot ends
+    j = 0
+    for slot in slots:
+        start, end = slot
+        while j < len(existing) and existing[j]['start_time'] < end:
+            heapq.heappush(active, (existing[j]['end_time'], j))
+            j += 1
+        # Slots come in start order, so a class over before this one starts is over for the rest too
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        conflicts.extend((slot, existing[i]) for _, i in sorted(active, key=lambda item: item[1]))
+    return conflicts
+
+
+@transaction.atomic
+def create_series(batch, topic, slots, tutor=None, meeting_link=None, description=None):
+    """
+    Insert one ClassSchedule per slot with a single bulk INSERT. `{n}` in the
+    topic becomes the session number. Raises ValueError if the tutor is busy
+    at any of the slots (checked again here, with the tutor row locked so two
+    admins can't double-book at the same moment).
+    """
+    if tutor is not None:
+        User.objects.select_for_update().filter(pk=tutor.pk).first()
+        conflicts = find_conflicts(tutor, slots)
+        if conflicts:
+            (start, _), clash = conflicts[0]
+            message = f"Tutor {tutor.username} is already occupied at {start:%Y-%m-%d %H:%M} ({clash['topic']})."
+            if len(conflicts) > 1:
+                message += f" {len(conflicts) - 1} more classes clash too."
+            raise ValueError(message)
+
+    schedules = ClassSchedule.objects.bulk_create([
+        ClassSchedule(
+            batch=batch,
+            topic=topic.replace('{n}', str(n)),
+            description=description,
+            start_time=start,
+            end_time=end,
+            meeting_link=meeting_link,
+            tutor=tutor,
+        )
+        for n, (start, end) in enumerate(sorted(slots), start=1)
+    ])
+    # bulk_create sends no post_save: the attendance report gains classes
+    bump_batches(batch.pk)
+    if tutor is not None:
+        # and the tutor may have just become one
+        invalidate_entitlements(tutor.pk)
+    return schedules
@@ -0,0 +1,157 @@
+"""
+Enrollment expiry and renewal sweep, run every minute by scheduler.py
+through `manage.py sweep_enrollments`.
+
+Each run is a handful of indexed range queries:
+
+* enrollments expiring in the next RENEWAL_NOTICE_DAYS days get a renewal
+  reminder (Enrollment.renewal_reminder_for remembers which expiry it was
+  for, so an extended enrollment is reminded again before its new expiry),
+* coupons whose next_payment_date falls in the next PAYMENT_NOTICE_DAYS days
+  get a payment reminder (Coupon.payment_reminder_for, same idea),
+* enrollments that ran out get lapsed_at set, and those renewed since lose it.
+  Students whose access ended within LAPSE_NOTICE_WINDOW are told so.
+
+Emails go out one by one over a single SMTP connection, opened only when
+there is something to send. Markers are written with one UPDATE per batch
+of emails, so a temporary failure is retried next run without holding back
+or re-sending the others. An address the server refuses is marked like a
+sent one and not tried again.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .mailing import LazyConnection, send_and_mark
+from .models import Coupon, Enrollment
+
+RENEWAL_NOTICE_DAYS = 7
+PAYMENT_NOTICE_DAYS = 3
+LAPSE_NOTICE_WINDOW = timedelta(days=1)  # older lapses are recorded silently
+EMAIL_BATCH_SIZE = 50
+
+
+class SweepResult:
+    def __init__(self):
+        self.reminded = 0       # renewal reminders sent
+        self.payment_due = 0    # payment reminders sent
+        self.lapsed = 0         # enrollments newly recorded as expired
+        self.renewed = 0        # lapsed enrollments active again
+        self.refused = 0        # emails to addresses the server refused (not retried)
+        self.failed = 0         # emails that failed for now (retried next run)
+
+
+# -------------------------------------------------------------------
+#  QUERIES
+# -------------------------------------------------------------------
+def expiring_enrollments(now, days=RENEWAL_NOTICE_DAYS):
+    return (
+        Enrollment.objects.filter(expires_at__gt=now, expires_at__lte=now + timedelta(days=days))
+        .exclude(renewal_reminder_for=F('expires_at'))
+        .select_related('user', 'batch__workshop')
+    )
+
+
+def payments_due(today, days=PAYMENT_NOTICE_DAYS):
+    return (
+        Coupon.objects.filter(
+            next_payment_date__gte=today, next_payment_date__lte=today + timedelta(days=days),
+            assigned_to__isnull=False,
+        )
+        .exclude(payment_reminder_for=F('next_payment_date'))
+        .select_related('assigned_to', 'batch__workshop')
+    )
+
+
+# -------------------------------------------------------------------
+#  EMAIL
+# -------------------------------------------------------------------
+def _dashboard_link():
+    base_url = "http://127.0.0.1:8000" if settings.DEBUG else "https://quizmaster.tgaystechnology.com"
+    return f"{base_url}{reverse('training_program')}"
+
+
+def renewal_email(user, batch, kind, when, connection=None):
+    """kind is 'expiring', 'payment_due' or 'expired'; `when` the date it is about."""
+    subject = {
+        'expiring': f"Your access to {batch.workshop.title} ends on {when:%d %b %Y}",
+        'payment_due': f"Payment due on {when:%d %b %Y} - {batch.workshop.title}",
+        'expired': f"Your access to {batch.workshop.title} has ended",
+    }[kind]
+    context = {'user': user, 'batch': batch, 'kind': kind, 'when': when, 'dashboard_link': _dashboard_link()}
+    plain_message = f"""
+Hello {user.first_name},
+
+{subject} ({batch.name}).
+Renew with a new access code here: {context['dashboard_link']}
+"""
+    message = EmailMultiAlternatives(
+        subject, plain_message, settings.EMAIL_HOST_USER, [user.email], connection=connection
+    )
+    message.attach_alternative(render_to_string('training/emails/renewal_reminder.html', context), 'text/html')
+    return message
+
+
+# -------------------------------------------------------------------
+#  SWEEP
+# -------------------------------------------------------------------
+def sweep_enrollments(now=None, renewal_days=RENEWAL_NOTICE_DAYS, payment_days=PAYMENT_NOTICE_DAYS,
+                      batch_size=EMAIL_BATCH_SIZE):
+    now = now or timezone.now()
+    result = SweepResult()
+    mail = LazyConnection()
+
+    def build(user, batch, kind, when):
+        if not user.email:
+            return None
+        return renewal_email(user, batch, kind, when)
+
+    try:
+        # --- 1. ABOUT TO EXPIRE ---
+        expiring = list(expiring_enrollments(now, renewal_days))
+        result.reminded, refused, failed, _ = send_and_mark(
+            expiring,
+            lambda e: build(e.user, e.batch, 'expiring', e.expires_at),
+            lambda ids: Enrollment.objects.filter(pk__in=ids).update(renewal_reminder_for=F('expires_at')),
+            mail, batch_size,
+        )
+        result.refused += refused
+        result.failed += failed
+
+        # --- 2. INSTALLMENTS COMING DUE ---
+        due = list(payments_due(now.date(), payment_days))
+        result.payment_due, refused, failed, _ = send_and_mark(
+            due,
+            lambda c: build(c.assigned_to, c.batch, 'payment_due', c.next_payment_date),
+            lambda ids: Coupon.objects.filter(pk__in=ids).update(payment_reminder_for=F('next_payment_date')),
+            mail, batch_size,
+        )
+        result.refused += refused
+        result.failed += failed
+
+        # --- 3. EXPIRY TRANSITIONS ---
+        result.renewed = Enrollment.objects.filter(lapsed_at__isnull=False, expires_at__gt=now).update(lapsed_at=None)
+        recent = list(
+            Enrollment.objects.filter(expires_at__lte=now, expires_at__gt=now - LAPSE_NOTICE_WINDOW, lapsed_at__isnull=True)
+            .select_related('user', 'batch__workshop')
+        )
+        _, refused, failed, lapsed = send_and_mark(
+            recent,
+            lambda e: build(e.user, e.batch, 'expired', e.expires_at),
+            lambda ids: Enrollment.objects.filter(pk__in=ids).update(lapsed_at=now),
+            mail, batch_size,
+        )
+        result.refused += refused
+        result.failed += failed
+        # Anything older (first run, downtime) is recorded without an email
+        result.lapsed = lapsed + Enrollment.objects.filter(
+            expires_at__lte=now - LAPSE_NOTICE_WINDOW, lapsed_at__isnull=True
+        ).update(lapsed_at=now)
+    finally:
+        mail.close()
+    return result
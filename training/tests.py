@@ -1,3 +1,707 @@
-from django.test import TestCase
+import io
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from quizzes.tests.helpers import ChangelistQueryBudgetMixin
+from quizzes.models import Quiz, QuizAccessGrant
+from .analytics import batch_attendance, missed_streaks
+from .coupons import CouponCSVError, issue_coupons, read_student_csv, send_coupon_emails
+from .attendance import flush_attendance, record_join
+from .entitlements import get_entitlements
+from .ics import feed_token
+from .recurrence import create_series, expand_weekly, find_conflicts
+from .renewals import sweep_enrollments
+from .models import Workshop, Batch, ClassSchedule, Coupon, Enrollment, Attendance
+
+
+class ChangelistQueryBudgetTest(ChangelistQueryBudgetMixin, TestCase):
+    """A changelist page costs the same number of queries for 1 row or many."""
+    def add_rows(self, n):
+        for _ in range(n):
+            self.count += 1
+            workshop = Workshop.objects.create(title=f"Workshop {self.count}")
+            batch = Batch.objects.create(workshop=workshop, name=f"Batch {self.count}",
+                                         start_date=timezone.now().date(), end_date=timezone.now().date())
+            user = User.objects.create(username=f"student{self.count}", email=f"s{self.count}@example.com")
+            schedule = ClassSchedule.objects.create(batch=batch, topic="Intro", start_time=timezone.now())
+            Coupon.objects.create(batch=batch, assigned_to=user)
+            Enrollment.objects.create(user=user, batch=batch, expires_at=timezone.now() + timedelta(days=30))
+            Attendance.objects.create(user=user, class_schedule=schedule)
+
+    def test_coupon_changelist(self):
+        self.assert_constant('admin:training_coupon_changelist')
+
+    def test_enrollment_changelist(self):
+        self.assert_constant('admin:training_enrollment_changelist')
+
+    def test_attendance_changelist(self):
+        self.assert_constant('admin:training_attendance_changelist')
+
+    def test_class_schedule_changelist(self):
+        self.assert_constant('admin:training_classschedule_changelist')
+
+
+class BatchTestCase(TestCase):
+    """Fixture shared by the tests below: an empty cache and a "Python" workshop with one batch, "B1"."""
+    def setUp(self):
+        cache.clear()
+        today = timezone.now().date()
+        self.workshop = Workshop.objects.create(title="Python")
+        self.batch = Batch.objects.create(workshop=self.workshop, name="B1", start_date=today, end_date=today)
+
+    def student(self, username='student'):
+        return User.objects.create_user(username, f'{username}@example.com', 'pass')
+
+    def students(self, n, email='student{}@example.com'):
+        return [User.objects.create_user(f'student{i}', email.format(i), 'pass') for i in range(n)]
+
+    def enroll(self, user, expires_in=timedelta(days=30)):
+        return Enrollment.objects.create(user=user, batch=self.batch, expires_at=timezone.now() + expires_in)
+
+
+class EnrollmentExpirySyncTest(BatchTestCase):
+    """Enrollment.expires_at follows the latest coupon, so the gatekeeper is one query."""
+    def setUp(self):
+        super().setUp()
+        self.user = self.student()
+        self.enrollment = self.enroll(self.user, timedelta(days=1))
+
+    def coupon(self, days):
+        return Coupon.objects.create(batch=self.batch, assigned_to=self.user,
+                                     enrollment_valid_until=timezone.now().date() + timedelta(days=days))
+
+    def expiry(self):
+        self.enrollment.refresh_from_db()
+        return self.enrollment.expires_at.date()
+
+    def test_latest_coupon_wins(self):
+        self.coupon(10)
+        extension = self.coupon(40)
+        self.coupon(20)
+        self.assertEqual(self.expiry(), extension.enrollment_valid_until)
+
+    def test_deleting_a_coupon_recomputes(self):
+        first = self.coupon(10)
+        self.coupon(40).delete()
+        self.assertEqual(self.expiry(), first.enrollment_valid_until)
+
+    def test_deleting_the_last_coupon_ends_access(self):
+        self.coupon(40).delete()
+        self.enrollment.refresh_from_db()
+        self.assertFalse(self.enrollment.is_active())
+
+    def test_sync_many_ends_access_without_coupons(self):
+        other = User.objects.create_user('other', 'o@example.com', 'pass')
+        Enrollment.objects.create(user=other, batch=self.batch, expires_at=timezone.now() + timedelta(days=5))
+        Coupon.objects.create(batch=self.batch, assigned_to=other,
+                              enrollment_valid_until=timezone.now().date() + timedelta(days=30))
+
+        self.assertEqual(Enrollment.sync_expiry_many(self.batch.pk, [self.user.pk, other.pk]), 2)
+        self.enrollment.refresh_from_db()
+        self.assertFalse(self.enrollment.is_active())
+        self.assertEqual(Enrollment.objects.get(user=other).expires_at.date(),
+                         timezone.now().date() + timedelta(days=30))
+
+    def test_gatekeeper_ignores_expired_and_allows_active(self):
+        self.client.force_login(self.user)
+        self.coupon(-5)
+        response = self.client.get(reverse('training_program'))
+        self.assertTemplateUsed(response, 'training/enter_coupon.html')
+
+        self.coupon(30)
+        response = self.client.get(reverse('training_program'))
+        self.assertTemplateUsed(response, 'training/calendar.html')
+        self.assertEqual(len(response.context['enrollments']), 1)
+
+
+class EntitlementCacheTest(BatchTestCase):
+    """Entitlements are computed once, then served from cache until something changes."""
+    def setUp(self):
+        super().setUp()
+        self.user = self.student()
+        self.quiz = Quiz.objects.create(title="Finals", quiz_type=Quiz.HACKATHON)
+
+    def fresh(self):
+        # A new request gets a new user object, so only the shared cache is reused
+        return get_entitlements(User.objects.get(pk=self.user.pk))
+
+    def test_cached_after_first_lookup(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(4):
+            get_entitlements(user)
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            ents = get_entitlements(user)
+        self.assertFalse(ents.is_tutor)
+        self.assertFalse(ents.is_active_student)
+
+    def test_enrollment_and_coupon_invalidate(self):
+        self.assertFalse(self.fresh().is_active_student)
+        enrollment = Enrollment.objects.create(user=self.user, batch=self.batch,
+                                               expires_at=timezone.now() + timedelta(days=1))
+        self.assertEqual(self.fresh().active_batch_ids, [self.batch.id])
+
+        # Coupons move expires_at with a bulk UPDATE; the coupon signal still clears the cache
+        Coupon.objects.create(batch=self.batch, assigned_to=self.user,
+                              enrollment_valid_until=timezone.now().date() - timedelta(days=1))
+        self.assertFalse(self.fresh().is_active_student)
+        enrollment.delete()
+        self.assertEqual(self.fresh().batches, {})
+
+    def test_quiz_grant_invalidates(self):
+        self.assertFalse(self.fresh().can_open(self.quiz))
+        QuizAccessGrant.objects.create(user=self.user, quiz=self.quiz)
+        self.assertTrue(self.fresh().can_open(self.quiz))
+        QuizAccessGrant.objects.filter(user=self.user).delete()
+        self.assertFalse(self.fresh().can_open(self.quiz))
+
+    def test_tutor_group_and_schedule_invalidate(self):
+        self.assertFalse(self.fresh().is_tutor)
+        group = Group.objects.create(name='Tutor')
+        group.user_set.add(self.user)
+        self.assertTrue(self.fresh().is_tutor)
+        self.user.groups.clear()
+        self.assertFalse(self.fresh().is_tutor)
+        ClassSchedule.objects.create(batch=self.batch, topic="Intro", start_time=timezone.now(), tutor=self.user)
+        self.assertTrue(self.fresh().is_tutor)
+
+
+class CalendarEventsFeedTest(BatchTestCase):
+    """The JSON events feed uses range filters and answers 304 when nothing changed."""
+    def setUp(self):
+        super().setUp()
+        today = self.batch.start_date
+        other = Batch.objects.create(workshop=self.workshop, name="B2", start_date=today, end_date=today)
+        self.user = self.student()
+        self.enroll(self.user)
+        now = timezone.now()
+        self.past = ClassSchedule.objects.create(batch=self.batch, topic="Past", start_time=now - timedelta(hours=3),
+                                                 end_time=now - timedelta(hours=2))
+        self.next = ClassSchedule.objects.create(batch=self.batch, topic="Next", start_time=now + timedelta(hours=2),
+                                                 end_time=now + timedelta(hours=3))
+        ClassSchedule.objects.create(batch=other, topic="Other batch", start_time=now, end_time=now)
+        self.client.force_login(self.user)
+        self.url = reverse('calendar_events')
+        self.params = {'start': (today - timedelta(days=1)).isoformat(), 'end': (today + timedelta(days=2)).isoformat()}
+
+    def test_events_and_status(self):
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, 200)
+        events = {e['topic']: e['status'] for e in response.json()['events']}
+        self.assertEqual(events, {'Past': 'missed', 'Next': 'upcoming'})
+        self.assertTrue(response.has_header('ETag'))
+        # Deletions don't move any timestamp, so only the ETag validates
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_not_modified_until_something_changes(self):
+        etag = self.client.get(self.url, self.params)['ETag']
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Attendance.objects.create(user=self.user, class_schedule=self.past)
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({e['topic']: e['status'] for e in response.json()['events']}['Past'], 'joined')
+
+        etag = response['ETag']
+        self.next.delete()
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual([e['topic'] for e in response.json()['events']], ['Past'])
+
+    def test_bad_range(self):
+        self.assertEqual(self.client.get(self.url, {'start': '2025-01-01', 'end': '2026-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': 'soon', 'end': 'later'}).status_code, 400)
+
+    def test_tutor_role_requires_tutor(self):
+        self.assertEqual(self.client.get(self.url, {'role': 'tutor'}).status_code, 403)
+
+
+class CalendarFeedTest(BatchTestCase):
+    """The .ics feed is reachable by signed token only and answers 304 while unchanged."""
+    def setUp(self):
+        super().setUp()
+        self.user = self.student()
+        tutor = User.objects.create_user('tutor', 't@example.com', 'pass', first_name='Ada')
+        self.enroll(self.user)
+        self.schedule = ClassSchedule.objects.create(
+            batch=self.batch, topic="Decorators, closures; and more", tutor=tutor,
+            start_time=timezone.now() + timedelta(days=1), end_time=timezone.now() + timedelta(days=1, hours=1),
+            meeting_link="https://meet.example.com/abc",
+        )
+        self.url = reverse('calendar_feed', args=[feed_token(self.user)])
+
+    def test_feed_contents(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('BEGIN:VEVENT', body)
+        self.assertIn('SUMMARY:Decorators\\, closures\; and more', body)
+        self.assertIn('Tutor: Ada', body)
+        self.assertIn('URL:https://meet.example.com/abc', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+    def test_etag_and_invalidation(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(2):
+            # the user row and the version aggregate; entitlements and the body are cached
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.schedule.topic = "Generators"
+        self.schedule.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('SUMMARY:Generators', response.content.decode())
+
+    def test_times_are_utc(self):
+        body = self.client.get(self.url).content.decode()
+        # TIME_ZONE is Asia/Kolkata (+05:30) and stored times are naive local times
+        start = timezone.make_aware(self.schedule.start_time, timezone.get_default_timezone())
+        self.assertIn(f"DTSTART:{start.astimezone(dt_timezone.utc):%Y%m%dT%H%M%S}Z", body)
+        self.assertNotIn('TZID=', body)
+
+    def test_batch_and_tutor_edits_change_the_feed(self):
+        etag = self.client.get(self.url)['ETag']
+        self.batch.name = "Evening batch"
+        self.batch.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Evening batch', response.content.decode())
+
+        etag = response['ETag']
+        self.client.force_login(self.user)  # a login alone changes nothing
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.schedule.tutor.first_name = 'Grace'
+        self.schedule.tutor.save()
+        self.assertIn('Tutor: Grace', self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).content.decode())
+
+    def test_only_tutor_edits_reach_the_feed(self):
+        etag = self.client.get(self.url)['ETag']
+        other = User.objects.create_user('someone', 'x@example.com', 'pass')
+        other.first_name = 'Alan'
+        other.save()
+        self.user.last_name = 'Student'
+        self.user.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.schedule.tutor.delete()
+        body = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).content.decode()
+        self.assertNotIn('Tutor:', body)
+
+    def test_reset_link(self):
+        self.client.force_login(self.user)
+        self.assertRedirects(self.client.post(reverse('reset_calendar_feed')), reverse('training_program'),
+                             fetch_redirect_response=False)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.user.refresh_from_db()
+        new_url = reverse('calendar_feed', args=[feed_token(self.user)])
+        self.assertNotEqual(new_url, self.url)
+        self.assertEqual(self.client.get(new_url).status_code, 200)
+
+    def test_tampered_token(self):
+        self.assertEqual(self.client.get(reverse('calendar_feed', args=['1:forged'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('calendar_feed', args=['forged'])).status_code, 404)
+
+
+@override_settings(ATTENDANCE_WRITE_BEHIND=True)
+class WriteBehindAttendanceTest(BatchTestCase):
+    """Joins are buffered in the cache and written in bulk by flush_attendance."""
+    def setUp(self):
+        super().setUp()
+        self.schedule = ClassSchedule.objects.create(batch=self.batch, topic="Intro", start_time=timezone.now(),
+                                                     end_time=timezone.now() + timedelta(hours=1),
+                                                     meeting_link="https://meet.example.com/abc")
+        self.users = self.students(3)
+        for user in self.users:
+            self.enroll(user)
+
+    def join(self, user):
+        self.client.force_login(user)
+        return self.client.get(reverse('track_attendance', args=[self.schedule.id]))
+
+    def test_join_writes_nothing_until_flush(self):
+        self.join(self.users[0])  # warms the schedule and entitlement caches
+        self.client.force_login(self.users[1])
+        self.client.get(reverse('training_program'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('track_attendance', args=[self.schedule.id]))
+        self.assertRedirects(response, "https://meet.example.com/abc", fetch_redirect_response=False)
+        self.assertFalse([q for q in queries if 'training_attendance' in q['sql']])
+        self.join(self.users[1])  # double click
+        self.join(self.users[2])
+        self.assertFalse(Attendance.objects.exists())
+
+        self.assertEqual(flush_attendance(), 3)
+        self.assertEqual(Attendance.objects.filter(class_schedule=self.schedule).count(), 3)
+        self.assertEqual(flush_attendance(), 0)
+
+    def test_pending_join_shows_on_calendar(self):
+        self.join(self.users[0])
+        response = self.client.get(reverse('training_program'))
+        statuses = [e['status'] for events in response.context['events_map'].values() for e in events]
+        self.assertEqual(statuses, ['joined'])
+
+    def test_unknown_schedule_and_not_enrolled(self):
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.get(reverse('track_attendance', args=[999])).status_code, 404)
+        outsider = User.objects.create_user('outsider', 'o@example.com', 'pass')
+        self.assertRedirects(self.join(outsider), reverse('training_program'), fetch_redirect_response=False)
+        self.assertEqual(flush_attendance(), 0)
+
+    def test_missing_item_is_retried_then_skipped(self):
+        record_join(self.users[0].pk, self.schedule.id)
+        record_join(self.users[1].pk, self.schedule.id)
+        cache.delete('attendance:item:1')
+        self.assertEqual(flush_attendance(), 0)  # slot 1 may still be in flight
+        self.assertEqual(flush_attendance(), 1)  # gives up on it
+        self.assertEqual(list(Attendance.objects.values_list('user_id', flat=True)), [self.users[1].pk])
+
+    def test_lost_join_can_be_recorded_again(self):
+        record_join(self.users[0].pk, self.schedule.id)
+        record_join(self.users[0].pk, self.schedule.id)  # still buffered: ignored
+        self.assertEqual(cache.get('attendance:seq'), 1)
+        cache.delete('attendance:item:1')  # evicted before the flush got to it
+        flush_attendance()
+        flush_attendance()  # skips the lost slot
+
+        record_join(self.users[0].pk, self.schedule.id)  # the student clicks Join again
+        self.assertEqual(flush_attendance(), 1)
+        self.assertTrue(Attendance.objects.filter(user=self.users[0], class_schedule=self.schedule).exists())
+
+    def test_lost_items_are_skipped_in_one_run(self):
+        for user in self.users:
+            record_join(user.pk, self.schedule.id)
+        self.assertEqual(flush_attendance(batch_size=1), 3)
+        schedules = [ClassSchedule.objects.create(batch=self.batch, topic=f"Extra {i}", start_time=timezone.now())
+                     for i in range(3)]
+        for schedule in schedules:
+            record_join(self.users[0].pk, schedule.id)
+        cache.delete_many(['attendance:item:4', 'attendance:item:5'])
+        self.assertEqual(flush_attendance(), 0)
+        # One pass past every lost slot, not one run per slot
+        self.assertEqual(flush_attendance(), 1)
+        self.assertEqual(cache.get('attendance:flushed'), 6)
+
+    def test_pending_join_changes_feed_etag(self):
+        self.client.force_login(self.users[0])
+        url = reverse('calendar_events')
+        today = timezone.now().date()
+        params = {'start': (today - timedelta(days=1)).isoformat(), 'end': (today + timedelta(days=2)).isoformat()}
+        etag = self.client.get(url, params)['ETag']
+        self.join(self.users[0])
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([e['status'] for e in response.json()['events']], ['joined'])
+
+
+class RecurringScheduleTest(BatchTestCase):
+    """Weekly series expand in memory, check the tutor once and insert in bulk."""
+    def setUp(self):
+        super().setUp()
+        self.batch.start_date, self.batch.end_date = date(2030, 1, 1), date(2030, 3, 31)
+        self.batch.save()
+        self.tutor = User.objects.create_user('tutor', 't@example.com', 'pass')
+
+    def slots(self, **kwargs):
+        options = dict(weekdays=[0, 2, 4], start_time=time(18, 0), duration=timedelta(minutes=90))
+        options.update(kwargs)
+        return expand_weekly(date(2030, 1, 1), date(2030, 1, 31), **options)
+
+    def test_expand_weekly(self):
+        slots = self.slots(exclude_dates={date(2030, 1, 2)})
+        # Jan 2030: Mon/Wed/Fri from Tue 1st = 13 days, minus the excluded Wednesday
+        self.assertEqual(len(slots), 12)
+        self.assertEqual(slots[0], (datetime(2030, 1, 4, 18, 0), datetime(2030, 1, 4, 19, 30)))
+        fortnightly = self.slots(interval=2)
+        self.assertTrue(all(start.isocalendar()[1] % 2 == 1 for start, _ in fortnightly))
+
+    def test_conflicts_with_one_query(self):
+        ClassSchedule.objects.create(batch=self.batch, topic="Busy", tutor=self.tutor,
+                                     start_time=datetime(2030, 1, 9, 19, 0), end_time=datetime(2030, 1, 9, 20, 0))
+        ClassSchedule.objects.create(batch=self.batch, topic="Morning", tutor=self.tutor,
+                                     start_time=datetime(2030, 1, 9, 9, 0), end_time=datetime(2030, 1, 9, 10, 0))
+        ClassSchedule.objects.create(batch=self.batch, topic="Back to back", tutor=self.tutor,
+                                     start_time=datetime(2030, 1, 11, 19, 30), end_time=datetime(2030, 1, 11, 21, 0))
+        with self.assertNumQueries(1):
+            conflicts = find_conflicts(self.tutor, self.slots())
+        self.assertEqual([(slot[0], clash['topic']) for slot, clash in conflicts],
+                         [(datetime(2030, 1, 9, 18, 0), "Busy")])
+
+    def test_create_series_bulk(self):
+        slots = self.slots()
+        with self.assertNumQueries(5):  # savepoint, lock tutor, conflict check, INSERT, release
+            created = create_series(self.batch, "Session {n}", slots, tutor=self.tutor)
+        self.assertEqual(len(created), 13)
+        self.assertEqual(ClassSchedule.objects.filter(batch=self.batch, topic="Session 13").count(), 1)
+        with self.assertRaises(ValueError):
+            create_series(self.batch, "Again", slots[:2], tutor=self.tutor)
+
+    def test_admin_page(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        url = reverse('admin:batch-recurring-classes', args=[self.batch.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        data = {
+            'topic': 'Session {n}', 'tutor': '', 'first_date': '2030-01-01', 'until': '2030-01-14',
+            'weekdays': ['1', '3'], 'start_time': '10:00', 'duration_minutes': '60', 'every_n_weeks': '1',
+            'exclude_dates': '2030-01-08',
+        }
+        response = self.client.post(url, {**data, '_preview': '1'})
+        self.assertEqual(len(response.context['slots']), 3)
+        self.assertFalse(ClassSchedule.objects.exists())
+        response = self.client.post(url, {**data, '_create': '1'})
+        self.assertRedirects(response, reverse('admin:training_batch_change', args=[self.batch.pk]))
+        self.assertEqual(ClassSchedule.objects.filter(batch=self.batch).count(), 3)
+
+
+class BulkCouponTest(BatchTestCase):
+    """A cohort's coupons come from one CSV: one INSERT, bulk expiry sync, one SMTP connection."""
+    def setUp(self):
+        super().setUp()
+        self.users = self.students(3, email='Student{}@example.com')  # CSV emails match case-insensitively
+        # student0 is renewing
+        self.enrollment = self.enroll(self.users[0], timedelta(days=1))
+
+    def csv(self, text):
+        return read_student_csv(io.BytesIO(text.encode()))
+
+    def test_issue_coupons(self):
+        rows = self.csv(
+            "Email,Amount,payment_date\n"
+            "student0@example.com,1500,2030-01-01\n"
+            "STUDENT1@example.com,,\n"
+            "student1@example.com,,\n"
+            "nobody@example.com,,\n"
+            "student2@example.com,abc,\n"
+        )
+        with self.assertNumQueries(8):
+            # savepoint, users, code check, INSERT, expiry MAX, expiry UPDATE, coupon-less UPDATE, release
+            result = issue_coupons(self.batch, rows, valid_days=30)
+        self.assertEqual(len(result.coupons), 2)
+        self.assertEqual([row for row, _ in result.errors], [4, 5, 6])
+        self.assertEqual(result.renewed, 1)
+        self.assertEqual(len({c.code for c in Coupon.objects.all()}), 2)
+
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.expires_at.date(), date(2030, 1, 31))
+
+    def test_emails_share_one_connection(self):
+        result = issue_coupons(self.batch, self.csv("email\n" + "\n".join(u.email for u in self.users)))
+        with self.assertNumQueries(2):  # one emailed_at UPDATE per batch of 2
+            sent, failed = send_coupon_emails(result.coupons, batch_size=2)
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn(result.coupons[0].code, mail.outbox[0].body)
+        self.assertFalse(Coupon.objects.filter(emailed_at__isnull=True).exists())
+
+    @override_settings(EMAIL_BACKEND='training.tests.FlakyEmailBackend')
+    def test_one_failed_email_does_not_fail_its_chunk(self):
+        import smtplib
+        FlakyEmailBackend.opened = 0
+        FlakyEmailBackend.refuse = {'Student1@example.com': smtplib.SMTPServerDisconnected("try later")}
+        self.addCleanup(setattr, FlakyEmailBackend, 'refuse', {})
+        result = issue_coupons(self.batch, self.csv("email\n" + "\n".join(u.email for u in self.users)))
+
+        self.assertEqual(send_coupon_emails(result.coupons, batch_size=10), (2, 1))
+        self.assertEqual(FlakyEmailBackend.opened, 1)
+        self.assertEqual(
+            list(Coupon.objects.filter(emailed_at__isnull=True).values_list('assigned_to__username', flat=True)),
+            ['student1'],
+        )
+
+    def test_missing_email_column(self):
+        with self.assertRaises(CouponCSVError):
+            self.csv("name\nAda\n")
+
+    def test_admin_page(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        upload = SimpleUploadedFile('students.csv', b"email\nstudent1@example.com\nstudent2@example.com\n")
+        response = self.client.post(reverse('admin:batch-bulk-coupons', args=[self.batch.pk]),
+                                    {'file': upload, 'valid_days': 30})
+        self.assertRedirects(response, reverse('admin:training_coupon_changelist'))
+        self.assertEqual(Coupon.objects.filter(batch=self.batch).count(), 2)
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """Refuses one address (temporarily or for good) and counts connections."""
+    opened = 0
+    refuse = {}
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            error = self.refuse.get(message.to[0])
+            if error is not None:
+                raise error
+        return super().send_messages(messages)
+
+
+class EnrollmentSweepTest(BatchTestCase):
+    """Reminders go out once per expiry / due date, and expiry transitions are recorded."""
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        users = self.students(4)
+        enroll = lambda user, delta: Enrollment.objects.create(user=user, batch=self.batch, expires_at=self.now + delta)
+        self.expiring = enroll(users[0], timedelta(days=3))
+        self.later = enroll(users[1], timedelta(days=30))
+        self.just_lapsed = enroll(users[2], -timedelta(hours=2))
+        self.long_lapsed = enroll(users[3], -timedelta(days=60))
+        self.coupon = Coupon.objects.create(batch=self.batch, assigned_to=User.objects.create_user('payer', 'payer@example.com'),
+                                            next_payment_date=self.now.date() + timedelta(days=2))
+
+    def test_sweep(self):
+        result = sweep_enrollments(now=self.now, batch_size=1)
+        self.assertEqual((result.reminded, result.payment_due, result.lapsed, result.failed), (1, 1, 2, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         ['payer@example.com', 'student0@example.com', 'student2@example.com'])
+
+        self.expiring.refresh_from_db()
+        self.assertEqual(self.expiring.renewal_reminder_for, self.expiring.expires_at)
+        self.assertEqual(Enrollment.objects.filter(lapsed_at__isnull=False).count(), 2)
+
+        # Nothing new: no emails, only the range queries
+        mail.outbox.clear()
+        with self.assertNumQueries(5):
+            result = sweep_enrollments(now=self.now)
+        self.assertEqual(mail.outbox, [])
+
+    def test_renewals_are_reminded_again(self):
+        sweep_enrollments(now=self.now)
+        mail.outbox.clear()
+        Enrollment.objects.filter(pk__in=[self.expiring.pk, self.just_lapsed.pk]).update(expires_at=self.now + timedelta(days=5))
+
+        result = sweep_enrollments(now=self.now)
+        self.assertEqual((result.reminded, result.renewed), (2, 1))
+        self.assertFalse(Enrollment.objects.filter(pk=self.just_lapsed.pk, lapsed_at__isnull=False).exists())
+
+
+class AttendanceAnalyticsTest(BatchTestCase):
+    """The matrix comes from flat queries and is cached until attendance changes."""
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.tutor = User.objects.create_user('tutor', 'tutor@example.com', 'pass')
+        self.classes = [
+            ClassSchedule.objects.create(batch=self.batch, topic=f"Session {i}", tutor=self.tutor,
+                                         start_time=now - timedelta(days=5 - i), end_time=now - timedelta(days=5 - i, hours=-1))
+            for i in range(4)
+        ]
+        ClassSchedule.objects.create(batch=self.batch, topic="Upcoming", start_time=now + timedelta(days=1))
+        self.regular, self.dropping = [User.objects.create_user(name, f'{name}@example.com', 'pass') for name in ('regular', 'dropping')]
+        for user in (self.regular, self.dropping):
+            Enrollment.objects.create(user=user, batch=self.batch, expires_at=now + timedelta(days=30))
+        Attendance.objects.bulk_create(
+            [Attendance(user=self.regular, class_schedule=c) for c in self.classes]
+            + [Attendance(user=self.dropping, class_schedule=self.classes[0])]
+        )
+
+    def test_report(self):
+        with self.assertNumQueries(3):  # enrollments, classes, attendances
+            report = batch_attendance(self.batch.pk)
+        self.assertEqual(len(report['classes']), 4)
+        self.assertEqual(report['overall_rate'], 62.5)
+        dropping, regular = report['students']  # at risk first
+        self.assertEqual((dropping['user_id'], dropping['rate'], dropping['missed_streak'], dropping['at_risk']),
+                         (self.dropping.pk, 25.0, 3, True))
+        self.assertEqual((regular['rate'], regular['at_risk'], regular['marks']), (100.0, False, [True] * 4))
+        self.assertEqual([c['rate'] for c in report['classes']], [100.0, 50.0, 50.0, 50.0])
+
+        with self.assertNumQueries(0):
+            batch_attendance(self.batch.pk)
+
+        Attendance.objects.create(user=self.dropping, class_schedule=self.classes[3])
+        report = batch_attendance(self.batch.pk)
+        self.assertEqual(report['students'][0]['missed_streak'], 0)
+
+    def test_new_series_invalidates_report(self):
+        ClassSchedule.objects.filter(topic="Upcoming").delete()
+        self.assertIsNone(batch_attendance(self.batch.pk)['next_class_at'])
+        start = timezone.now() - timedelta(hours=2)
+        create_series(self.batch, "Extra", [(start, start + timedelta(hours=1))])
+        report = batch_attendance(self.batch.pk)
+        self.assertEqual([c['topic'] for c in report['classes']][-1], "Extra")
+
+    def test_missed_streaks(self):
+        import numpy as np
+        matrix = np.array([[1, 0, 0, 1, 0], [0, 0, 0, 0, 0], [1, 1, 1, 1, 1]], dtype=bool)
+        current, longest = missed_streaks(matrix)
+        self.assertEqual(current.tolist(), [1, 5, 0])
+        self.assertEqual(longest.tolist(), [2, 5, 0])
+
+    def test_tutor_page(self):
+        url = reverse('tutor_batch_attendance', args=[self.batch.pk])
+        self.client.force_login(self.regular)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.tutor)
+        response = self.client.get(url)
+        self.assertContains(response, 'dropping@example.com')
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        self.assertContains(self.client.get(reverse('admin:batch-attendance', args=[self.batch.pk])), 'Session 3')
+
+
+@override_settings(EMAIL_BACKEND='training.tests.FlakyEmailBackend')
+class EnrollmentSweepDeliveryTest(BatchTestCase):
+    """A bad address neither blocks its neighbours nor makes them get the reminder again."""
+    def setUp(self):
+        super().setUp()
+        FlakyEmailBackend.opened = 0
+        self.now = timezone.now()
+        for user in self.students(3):
+            Enrollment.objects.create(user=user, batch=self.batch, expires_at=self.now + timedelta(days=2))
+
+    def test_one_failure_does_not_hold_back_the_others(self):
+        import smtplib
+        FlakyEmailBackend.refuse = {
+            'student1@example.com': smtplib.SMTPServerDisconnected("try later"),
+            'student2@example.com': smtplib.SMTPRecipientsRefused({'student2@example.com': (550, b'no such user')}),
+        }
+        self.addCleanup(setattr, FlakyEmailBackend, 'refuse', {})
+
+        result = sweep_enrollments(now=self.now)
+        self.assertEqual((result.reminded, result.refused, result.failed), (1, 1, 1))
+        self.assertEqual([m.to for m in mail.outbox], [['student0@example.com']])
+        # Only the temporary failure is retried
+        self.assertEqual(
+            list(Enrollment.objects.filter(renewal_reminder_for__isnull=True).values_list('user__username', flat=True)),
+            ['student1'],
+        )
+
+        FlakyEmailBackend.refuse = {}
+        result = sweep_enrollments(now=self.now)
+        self.assertEqual(result.reminded, 1)
+        self.assertEqual([m.to for m in mail.outbox], [['student0@example.com'], ['student1@example.com']])
+        self.assertEqual(FlakyEmailBackend.opened, 2)
+
+    def test_command_reports_refused_and_retried_emails_apart(self):
+        import smtplib
+        FlakyEmailBackend.refuse = {
+            'student1@example.com': smtplib.SMTPServerDisconnected("try later"),
+            'student2@example.com': smtplib.SMTPRecipientsRefused({'student2@example.com': (550, b'no such user')}),
+        }
+        self.addCleanup(setattr, FlakyEmailBackend, 'refuse', {})
+        err = io.StringIO()
+        call_command('sweep_enrollments', stdout=io.StringIO(), stderr=err)
+        self.assertIn("1 emails were refused by the mail server; they won't be retried", err.getvalue())
+        self.assertIn("1 emails failed; they will be retried", err.getvalue())
+
+    def test_no_connection_when_nothing_to_send(self):
+        sweep_enrollments(now=self.now)
+        FlakyEmailBackend.opened = 0
+        sweep_enrollments(now=self.now)
+        self.assertEqual(FlakyEmailBackend.opened, 0)
@@ -7,4 +7,8 @@ urlpatterns = [
     path('history/', views.payment_history, name='payment_history'),
     path('explore/', views.training_overview, name='training_overview'),
     path('tutor/', views.tutor_dashboard, name='tutor_dashboard'),
+    path('tutor/batch/<int:batch_id>/attendance/', views.tutor_batch_attendance, name='tutor_batch_attendance'),
+    path('events/', views.calendar_events, name='calendar_events'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('calendar/reset/', views.reset_calendar_feed, name='reset_calendar_feed'),
 ]
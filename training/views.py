@@ -4,21 +4,27 @@ from django.contrib import messages
 from django.utils import timezone
 from datetime import timedelta, date, datetime
 import calendar as py_calendar
-from .models import Coupon, Enrollment, Batch, ClassSchedule, Attendance
+from .models import Coupon, Enrollment, Batch, ClassSchedule
+from .analytics import batch_attendance
+from .attendance import record_join, schedule_brief
+from .entitlements import get_entitlements
+from .ics import feed_token, feed_user, render_feed, reset_feed_token
+from .events import (
+    attended_ids_in, event_payload, event_status, events_by_day, feed_version, month_range, parse_range,
+    schedules_in_range,
+)
 from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 
 def check_is_tutor(user):
     """
     Check if user is a designated tutor.
     Criteria: Belongs to 'Tutor' group OR has assigned schedules OR is superuser.
     """
-    if user.is_superuser:
-        return True
-    if user.groups.filter(name='Tutor').exists():
-        return True
-    if ClassSchedule.objects.filter(tutor=user).exists():
-        return True
-    return False
+    return get_entitlements(user).is_tutor
 
 @login_required
 def training_program(request):
@@ -105,56 +111,17 @@ def training_program(request):
         return render(request, 'training/enter_coupon.html')
 
     # --- 2. CHECK ENROLLMENT ---
-    # --- 2. CHECK ENROLLMENT ---
-    # Fetch potentially active enrollments
-    candidates = Enrollment.objects.filter(
-        user=request.user, 
+    # expires_at is kept in step with the user's coupons (see Enrollment.sync_expiry),
+    # so it already is the effective access window: one indexed query, no per-coupon checks.
+    active_enrollments = list(Enrollment.objects.filter(
+        user=request.user,
         expires_at__gt=timezone.now()
-    ).select_related('batch', 'batch__workshop')
-
-    # STRICT CHECK: Verify against Coupon Limit (Hybrid logic for strictness)
-    valid_enrollment_ids = []
-    for enr in candidates:
-        # Check if stricter logic applies from Coupon
-        # Check ALL coupons for this batch to see if ANY give valid access
-        # This handles cases where user adds past coupons for history, which shouldn't block current access
-        coupons = Coupon.objects.filter(assigned_to=request.user, batch=enr.batch)
-        
-        is_technically_expired = False
-        if coupons.exists():
-            # Assume expired until proven active
-            is_technically_expired = True 
-            max_coupon_expiry = None
-            
-            for c in coupons:
-                # Track max expiry to detect manual extensions later
-                if c.enrollment_valid_until:
-                    if not max_coupon_expiry or c.enrollment_valid_until > max_coupon_expiry:
-                         max_coupon_expiry = c.enrollment_valid_until
-                
-                # If ANY coupon is valid for today (or has no expiry set), we grant access
-                if not c.enrollment_valid_until or timezone.now().date() <= c.enrollment_valid_until:
-                    is_technically_expired = False
-                    break
-            
-            # SAFEGUARD: Manual Extension
-            # If all coupons are expired, BUT the Enrollment extends significantly beyond the active coupons,
-            # we assume the Admin manually extended the user (e.g. by 1 month).
-            if is_technically_expired and max_coupon_expiry:
-                 # Check if Enrollment expires AFTER the latest coupon (with 1 day buffer for timezone checks)
-                 enrollment_expiry_date = enr.expires_at.date()
-                 if enrollment_expiry_date > max_coupon_expiry:
-                     is_technically_expired = False
-        
-        if not is_technically_expired:
-            valid_enrollment_ids.append(enr.id)
+    ).select_related('batch__workshop'))
 
-    active_enrollments = candidates.filter(id__in=valid_enrollment_ids)
-
-    if not active_enrollments.exists():
+    if not active_enrollments:
         # 🚫 GATEKEEPER BLOCKED -> Show Entry Form
         # But first, fetch history to show in modal
-        all_enrollments = Enrollment.objects.filter(user=request.user)
+        all_enrollments = Enrollment.objects.filter(user=request.user).select_related('batch__workshop')
         context = {
             'subscription_info': get_subscription_info(request.user, all_enrollments)
         }
@@ -177,44 +144,13 @@ def training_program(request):
     cal = py_calendar.Calendar(firstweekday=6) # Sunday start
     month_days = cal.monthdayscalendar(current_year, current_month)
 
-    # Fetch Events for this month
-    batch_ids = active_enrollments.values_list('batch_id', flat=True)
-    
-    # Filter schedules for this month
-    schedules = ClassSchedule.objects.filter(
-        batch__id__in=batch_ids,
-        start_time__year=current_year,
-        start_time__month=current_month
-    ).order_by('start_time')
-
-    attended_ids = Attendance.objects.filter(user=request.user).values_list('class_schedule_id', flat=True)
+    # Fetch Events for this month (indexed start_time range)
+    batch_ids = [enr.batch_id for enr in active_enrollments]
+    month_start, month_end = month_range(current_year, current_month)
+    schedules = list(schedules_in_range(month_start, month_end, batch_ids=batch_ids).order_by('start_time'))
 
     # Map Events to Dates: { day_int: [list of events] }
-    events_map = {}
-    for sched in schedules:
-        if not sched.start_time: continue
-        
-        day = sched.start_time.day
-        if day not in events_map: events_map[day] = []
-        
-        # Determine Color Logic
-        now_dt = timezone.now()
-        
-        status = 'upcoming'
-        is_past = sched.end_time and now_dt > sched.end_time
-
-        if sched.id in attended_ids:
-            # If they attended, it is ALWAYS joined (whether past or active)
-            status = 'joined'
-        elif is_past:
-             # Only missed if past AND NOT attended
-            status = 'missed'
-            
-        events_map[day].append({
-            'schedule': sched,
-            'status': status,
-            'is_past': is_past
-        })
+    events_map = events_by_day(schedules, timezone.now(), attended_ids_in(request.user, schedules))
 
     # Prepare Month Name
     month_name = py_calendar.month_name[current_month]
@@ -238,7 +174,8 @@ def training_program(request):
         'next_link': next_link,
         'prev_link': prev_link,
         'today': today,
-        'subscription_info': get_subscription_info(request.user, active_enrollments)
+        'subscription_info': get_subscription_info(request.user, active_enrollments),
+        'ics_url': request.build_absolute_uri(reverse('calendar_feed', args=[feed_token(request.user)])),
     }
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -251,32 +188,31 @@ def get_subscription_info(user, enrollments):
     """
     Helper to extract payment/validity info from Coupons linked to enrollments.
     """
-    info_list = []
+    enrollments = list(enrollments)
+    # Fetch ALL coupons (Payment History) for every batch in one query
+    history = {}
+    coupons = Coupon.objects.filter(
+        assigned_to=user,
+        batch_id__in=[enrollment.batch_id for enrollment in enrollments]
+    ).order_by('-created_at')
+    for coupon in coupons:
+        history.setdefault(coupon.batch_id, []).append({
+            'amount': coupon.payment_amount,
+            'date': coupon.payment_date,
+            'valid_from': coupon.enrollment_valid_from,
+            'valid_until': coupon.enrollment_valid_until,
+            'next_due': coupon.next_payment_date
+        })
+
     info_list = []
     for enrollment in enrollments:
-        # Fetch ALL coupons (Payment History)
-        coupons = Coupon.objects.filter(
-            assigned_to=user, 
-            batch=enrollment.batch
-        ).order_by('-created_at')
-        
-        payment_history = []
-        for coupon in coupons:
-            payment_history.append({
-                'amount': coupon.payment_amount,
-                'date': coupon.payment_date,
-                'valid_from': coupon.enrollment_valid_from,
-                'valid_until': coupon.enrollment_valid_until,
-                'next_due': coupon.next_payment_date
-            })
-
         info = {
             'program': enrollment.batch.workshop.title,
             'batch': enrollment.batch.name,
             'status': 'Active' if enrollment.is_active() else 'Expired',
             'expires_at': enrollment.expires_at,
             'joined_at': enrollment.enrolled_at,
-            'history': payment_history
+            'history': history.get(enrollment.batch_id, [])
         }
         
         info_list.append(info)
@@ -285,30 +221,29 @@ def get_subscription_info(user, enrollments):
 
 @login_required
 def track_attendance(request, schedule_id):
-    schedule = get_object_or_404(ClassSchedule, id=schedule_id)
-    
+    # Burst path at class start: schedule and entitlements come from cache and
+    # the join is buffered (see training/attendance.py), so no DB write here.
+    schedule = schedule_brief(schedule_id)
+    if schedule is None:
+        raise Http404
+
     # Check if user is enrolled
-    is_enrolled = Enrollment.objects.filter(
-        user=request.user, 
-        batch=schedule.batch,
-        expires_at__gt=timezone.now()
-    ).exists()
+    is_enrolled = schedule['batch_id'] in get_entitlements(request.user).active_batch_ids
     
     if not is_enrolled:
         messages.error(request, "Access denied.")
         return redirect('training_program')
         
     # Mark Attendance
-    Attendance.objects.get_or_create(user=request.user, class_schedule=schedule)
+    record_join(request.user.pk, schedule_id)
     
     # Redirect to Meeting
-    if schedule.meeting_link:
-        return redirect(schedule.meeting_link)
+    if schedule['meeting_link']:
+        return redirect(schedule['meeting_link'])
     else:
         messages.warning(request, "Meeting link has not been added yet.")
         return redirect('training_program')
 
-
 @login_required
 def payment_history(request):
     """
@@ -385,36 +320,14 @@ def tutor_dashboard(request):
     cal = py_calendar.Calendar(firstweekday=6)
     month_days = cal.monthdayscalendar(current_year, current_month)
 
-    # Filter events for this month (TUTOR SPECIFIC)
-    schedules = ClassSchedule.objects.filter(
-        tutor=request.user,
-        start_time__year=current_year,
-        start_time__month=current_month
-    ).select_related('batch', 'batch__workshop').order_by('start_time')
-
-    events_map = {}
-    for sched in schedules:
-        if not sched.start_time: continue
-        day = sched.start_time.day
-        if day not in events_map: events_map[day] = []
-        
-        # Color logic
-        # Color logic
-        status = 'upcoming'
-        is_past = sched.end_time and now > sched.end_time
-
-        if is_past:
-            # For Tutor, Past = Completed (visually equivalent to 'joined' for students)
-            # We map it to 'joined' so the partial renders the green Checkmark style
-            status = 'joined' 
-        else:
-             status = 'upcoming'
-        
-        events_map[day].append({
-            'schedule': sched,
-            'status': status,
-            'is_past': is_past
-        })
+    # Filter events for this month (TUTOR SPECIFIC, indexed start_time range)
+    month_start, month_end = month_range(current_year, current_month)
+    schedules = schedules_in_range(month_start, month_end, tutor=request.user).select_related(
+        'batch', 'batch__workshop'
+    ).order_by('start_time')
+
+    # For Tutor, Past = Completed (mapped to 'joined' so the partial renders the green Checkmark style)
+    events_map = events_by_day(schedules, now)
 
     month_name = py_calendar.month_name[current_month]
     
@@ -426,9 +339,13 @@ def tutor_dashboard(request):
     next_link = get_month_link(current_year, current_month + 1)
     prev_link = get_month_link(current_year, current_month - 1)
 
+    # 3. Batches taught (links to their attendance reports)
+    teaching_batches = Batch.objects.filter(classes__tutor=request.user).select_related('workshop').distinct()
+
     context = {
         'upcoming_classes': upcoming_classes,
         'past_classes': past_classes,
+        'teaching_batches': teaching_batches,
         'month_days': month_days,
         'events_map': events_map,
         'current_year': current_year,
@@ -440,3 +357,95 @@ def tutor_dashboard(request):
     }
     
     return render(request, 'training/tutor_dashboard.html', context)
+
+
+@login_required
+def tutor_batch_attendance(request, batch_id):
+    """
+    Attendance matrix of a batch the tutor teaches, with at-risk students first.
+    """
+    batch = get_object_or_404(Batch.objects.select_related('workshop'), pk=batch_id)
+    if not request.user.is_superuser and not ClassSchedule.objects.filter(batch=batch, tutor=request.user).exists():
+        raise PermissionDenied
+
+    context = {
+        'batch': batch,
+        'report': batch_attendance(batch.pk),
+    }
+    return render(request, 'training/batch_attendance.html', context)
+
+
+@login_required
+def calendar_events(request):
+    """
+    JSON feed of class events in [start, end), e.g.
+    /training/events/?start=2025-03-01&end=2025-04-01 (add &role=tutor for the teaching schedule).
+
+    Answers 304 from two aggregate queries when the client's ETag still
+    matches, so the calendar can prefetch neighbouring months cheaply.
+    """
+    now = timezone.now()
+    try:
+        start, end = parse_range(request.GET.get('start'), request.GET.get('end'), now.date())
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    entitlements = get_entitlements(request.user)
+    if request.GET.get('role') == 'tutor':
+        if not entitlements.is_tutor:
+            raise PermissionDenied
+        schedules = schedules_in_range(start, end, tutor=request.user)
+        attendee, scope = None, 'tutor'
+    else:
+        batch_ids = sorted(entitlements.active_batch_ids)
+        schedules = schedules_in_range(start, end, batch_ids=batch_ids)
+        attendee, scope = request.user, f"student:{batch_ids}"
+
+    etag = quote_etag(feed_version(schedules, now, user=attendee, scope=f"{request.user.pk}:{scope}"))
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    schedules = list(schedules.select_related('batch__workshop').order_by('start_time'))
+    attended_ids = attended_ids_in(request.user, schedules) if attendee is not None else None
+    response = JsonResponse({
+        'start': start.date().isoformat(),
+        'end': end.date().isoformat(),
+        'events': [event_payload(s, event_status(s, now, attended_ids)[0]) for s in schedules],
+    })
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def calendar_feed(request, token):
+    """
+    iCalendar feed of the classes in a student's active batches, for
+    subscribing from Google/Apple/Outlook calendar. No login: the signed
+    token in the URL identifies the user.
+    """
+    user = feed_user(token)
+    if user is None:
+        raise Http404
+
+    etag, text = render_feed(get_entitlements(user).active_batch_ids)
+    etag = quote_etag(etag)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    response = HttpResponse(text, content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    response['Content-Disposition'] = 'inline; filename="training.ics"'
+    response['Cache-Control'] = 'private, max-age=300'
+    return response
+
+
+@login_required
+def reset_calendar_feed(request):
+    """Issue a new calendar feed link, e.g. after the old one was shared by mistake."""
+    if request.method != 'POST':
+        return redirect('training_program')
+    reset_feed_token(request.user)
+    messages.success(request, "Your calendar link was reset. Subscribe again with the new link; the old one no longer works.")
+    return redirect('training_program')